@@ -0,0 +1,167 @@
+import gzip
+import time
+from pathlib import Path
+from typing import Callable, List, NamedTuple, Optional, Protocol
+from psycopg2 import sql
+
+
+# A function that checks the rows of a CSV file after they've been copied
+# into the given staging table, raising an exception if they're invalid.
+Validator = Callable[[object, str], None]
+
+
+class Readable(Protocol):
+    """
+    A binary file, or anything else we can read bytes from.
+    """
+
+    def read(self, size: int = ...) -> bytes:
+        ...
+
+
+# How often, in seconds, to report the progress of a load by default.
+PROGRESS_INTERVAL = 10.0
+
+
+class LoadStats(NamedTuple):
+    table: str
+    rows: int
+    bytes: int
+    seconds: float
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows / self.seconds if self.seconds > 0 else float(self.rows)
+
+    def __str__(self) -> str:
+        return (
+            f"{self.table}: {self.rows:,} rows ({self.bytes / 1_000_000:.1f} MB) "
+            f"in {self.seconds:.1f}s, {self.rows_per_second:,.0f} rows/s"
+        )
+
+
+class ProgressReader:
+    """
+    Wraps a binary file to count the bytes and lines read from it, calling
+    `on_progress(bytes, lines)` at most once every `interval` seconds.
+    """
+
+    def __init__(
+        self,
+        file: Readable,
+        on_progress: Optional[Callable[[int, int], None]] = None,
+        interval: float = PROGRESS_INTERVAL,
+    ):
+        self.file = file
+        self.on_progress = on_progress
+        self.interval = interval
+        self.bytes = 0
+        self.lines = 0
+        self._reported_at = time.monotonic()
+
+    def read(self, size: int = -1) -> bytes:
+        data = self.file.read(size)
+        self.bytes += len(data)
+        self.lines += data.count(b"\n")
+        now = time.monotonic()
+        if self.on_progress and now - self._reported_at >= self.interval:
+            self.on_progress(self.bytes, self.lines)
+            self._reported_at = now
+        return data
+
+
+def get_table_columns(cur, table: str) -> List[str]:
+    cur.execute(sql.SQL("SELECT * FROM {} LIMIT 0").format(sql.Identifier(table)))
+    return [column[0] for column in cur.description]
+
+
+def copy_csv(
+    cur,
+    table: str,
+    file: Readable,
+    validate: Optional[Validator] = None,
+    progress_interval: Optional[float] = PROGRESS_INTERVAL,
+) -> LoadStats:
+    """
+    Stream the given CSV file, which has a header row, into the columns of
+    the given table in order with `COPY FROM STDIN`. Like the CSV reader we
+    used to insert rows with, empty values are loaded as empty strings.
+
+    If a `validate` function is given, the rows are first copied into a
+    temporary staging table, which it's called with, and only added to the
+    table if it doesn't raise.
+    """
+
+    started_at = time.monotonic()
+    columns = get_table_columns(cur, table)
+    target = table
+    if validate is not None:
+        target = f"{table}_staging"
+        cur.execute(
+            sql.SQL("CREATE TEMPORARY TABLE {} (LIKE {})").format(
+                sql.Identifier(target), sql.Identifier(table)
+            )
+        )
+
+    def report_progress(nbytes: int, lines: int) -> None:
+        print(f"  {table}: {lines:,} lines ({nbytes / 1_000_000:.1f} MB) so far...")
+
+    reader = ProgressReader(
+        file,
+        on_progress=report_progress if progress_interval is not None else None,
+        interval=progress_interval or 0,
+    )
+    cur.copy_expert(
+        sql.SQL(
+            "COPY {} FROM STDIN WITH (FORMAT csv, HEADER true, FORCE_NOT_NULL ({}))"
+        )
+        .format(
+            sql.Identifier(target),
+            sql.SQL(", ").join(sql.Identifier(column) for column in columns),
+        )
+        .as_string(cur),
+        reader,
+    )
+    rows = cur.rowcount
+
+    if validate is not None:
+        validate(cur, target)
+        cur.execute(
+            sql.SQL("INSERT INTO {} SELECT * FROM {}").format(
+                sql.Identifier(table), sql.Identifier(target)
+            )
+        )
+        cur.execute(sql.SQL("DROP TABLE {}").format(sql.Identifier(target)))
+
+    return LoadStats(
+        table=table,
+        rows=rows,
+        bytes=reader.bytes,
+        seconds=time.monotonic() - started_at,
+    )
+
+
+def copy_csv_file(
+    cur,
+    csv_path: Path,
+    table: Optional[str] = None,
+    validate: Optional[Validator] = None,
+    progress_interval: Optional[float] = PROGRESS_INTERVAL,
+) -> LoadStats:
+    """
+    Like `copy_csv()`, but for a CSV file on disk, which is loaded into the
+    table with the same name as the file by default. Files whose names end
+    with `.gz` are decompressed on the fly.
+    """
+
+    with open(csv_path, "rb") as raw_file:
+        file: Readable = raw_file
+        if csv_path.suffix == ".gz":
+            file = gzip.GzipFile(fileobj=raw_file, mode="rb")
+        return copy_csv(
+            cur,
+            table or csv_path.name.split(".")[0],
+            file,
+            validate=validate,
+            progress_interval=progress_interval,
+        )
@@ -0,0 +1,192 @@
+import gzip
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator, List, Optional, Sequence, Tuple
+import boto3
+from botocore.client import Config
+
+from .csvcopy import PROGRESS_INTERVAL, LoadStats, copy_csv
+
+
+# How many S3 objects to download at once by default.
+S3_CONCURRENCY = 4
+
+# The size of the chunks S3 objects are downloaded in.
+S3_CHUNK_SIZE = 1024 * 1024
+
+# How many downloaded chunks of each S3 object to buffer in memory while
+# waiting for Postgres to read them.
+S3_BUFFERED_CHUNKS = 16
+
+# How long, in seconds, download threads wait for room in their buffer
+# before checking whether they've been cancelled.
+PUT_TIMEOUT = 1.0
+
+# Marks the end of an S3 object's chunks.
+_EOF = b""
+
+
+def get_s3_client(
+    aws_key: Optional[str],
+    aws_secret: Optional[str],
+    endpoint_url: Optional[str] = None,
+):
+    return boto3.client(
+        "s3",
+        aws_access_key_id=aws_key,
+        aws_secret_access_key=aws_secret,
+        endpoint_url=endpoint_url,
+        config=Config(
+            connect_timeout=10, read_timeout=100, retries={"max_attempts": 10}
+        ),
+    )
+
+
+def get_s3_object_table(key: str) -> str:
+    """
+    Return the name of the table an S3 object with a CSV file is loaded
+    into, for example:
+
+        >>> get_s3_object_table("public/oca_addresses_with_bbl.csv.gz")
+        'oca_addresses_with_bbl'
+    """
+
+    return Path(key).name.split(".")[0]
+
+
+def open_s3_object(s3, bucket: str, key: str):
+    """
+    Return a stream of the contents of the given S3 object, which are
+    decompressed on the fly if it's gzipped.
+    """
+
+    response = s3.get_object(Bucket=bucket, Key=key)
+    body = response["Body"]
+    if key.endswith(".gz") or response.get("ContentEncoding") == "gzip":
+        return gzip.GzipFile(fileobj=body, mode="rb")
+    return body
+
+
+class ChunkQueueReader:
+    """
+    A binary file whose contents are the chunks put into a queue by another
+    thread, which puts an empty chunk at the end, or the exception that
+    stopped it.
+    """
+
+    def __init__(self, chunks: "queue.Queue"):
+        self.chunks = chunks
+        self._chunk = b""
+        self._offset = 0
+        self._done = False
+
+    def read(self, size: int = -1) -> bytes:
+        parts = []
+        while size != 0:
+            if self._offset >= len(self._chunk):
+                if self._done:
+                    break
+                chunk = self.chunks.get()
+                if isinstance(chunk, BaseException):
+                    self._done = True
+                    raise chunk
+                if chunk == _EOF:
+                    self._done = True
+                    break
+                self._chunk, self._offset = chunk, 0
+            end = len(self._chunk)
+            if size > 0:
+                end = min(end, self._offset + size)
+                size -= end - self._offset
+            parts.append(self._chunk[self._offset : end])
+            self._offset = end
+        return b"".join(parts)
+
+
+def _download_s3_object(
+    s3,
+    bucket: str,
+    key: str,
+    chunks: "queue.Queue",
+    cancelled: threading.Event,
+    chunk_size: int,
+) -> None:
+    def put(chunk) -> bool:
+        while not cancelled.is_set():
+            try:
+                chunks.put(chunk, timeout=PUT_TIMEOUT)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    if cancelled.is_set():
+        return
+    try:
+        body = open_s3_object(s3, bucket, key)
+        try:
+            while True:
+                chunk = body.read(chunk_size)
+                if not put(chunk) or chunk == _EOF:
+                    return
+        finally:
+            body.close()
+    except BaseException as e:
+        put(e)
+
+
+@contextmanager
+def open_s3_objects(
+    s3,
+    bucket: str,
+    keys: Sequence[str],
+    concurrency: int = S3_CONCURRENCY,
+    chunk_size: int = S3_CHUNK_SIZE,
+    buffered_chunks: int = S3_BUFFERED_CHUNKS,
+) -> Iterator[List[Tuple[str, ChunkQueueReader]]]:
+    """
+    Start downloading the given S3 objects, up to `concurrency` at a time,
+    and return a stream of each one's contents. Downloads only buffer a few
+    chunks in memory, so the streams should be read in order.
+    """
+
+    cancelled = threading.Event()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        try:
+            streams: List[Tuple[str, ChunkQueueReader]] = []
+            for key in keys:
+                chunks: "queue.Queue" = queue.Queue(maxsize=buffered_chunks)
+                executor.submit(
+                    _download_s3_object, s3, bucket, key, chunks, cancelled, chunk_size
+                )
+                streams.append((key, ChunkQueueReader(chunks)))
+            yield streams
+        finally:
+            cancelled.set()
+
+
+def copy_s3_objects(
+    cur,
+    s3,
+    bucket: str,
+    keys: Sequence[str],
+    concurrency: int = S3_CONCURRENCY,
+    progress_interval: Optional[float] = PROGRESS_INTERVAL,
+) -> Iterator[LoadStats]:
+    """
+    Stream the given S3 objects with CSV files straight into their tables
+    with `COPY`, downloading up to `concurrency` of them at once, and
+    yielding the stats of each load once it's done.
+    """
+
+    with open_s3_objects(s3, bucket, keys, concurrency=concurrency) as streams:
+        for key, stream in streams:
+            yield copy_csv(
+                cur,
+                get_s3_object_table(key),
+                stream,
+                progress_interval=progress_interval,
+            )
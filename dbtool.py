@@ -5,17 +5,52 @@ import argparse
 import time
 import yaml
 import copy
+import gzip
+import hashlib
+import threading
+import brotli
 import nycdb.dataset
 from nycdb.utility import list_wrap
 from urllib.parse import urlparse
-from typing import Literal, NamedTuple, Any, Tuple, Dict, List
+from concurrent.futures import FIRST_EXCEPTION, ThreadPoolExecutor, wait
+from typing import (
+    IO,
+    Callable,
+    Literal,
+    NamedTuple,
+    Any,
+    Optional,
+    Set,
+    Tuple,
+    Dict,
+    List,
+)
 from pathlib import Path
 
 from portfoliograph.table import (
     export_portfolios_table_json,
+    populate_bbl_portfolio_table,
     populate_portfolios_table,
 )
-from ocaevictions.table import OcaConfig, populate_oca_tables
+from ocaevictions.table import (
+    OcaConfig,
+    get_oca_source_versions,
+    get_oca_sql,
+    populate_oca_tables,
+)
+from sqlstages.fingerprint import (
+    Fingerprinter,
+    forget_fingerprint,
+    is_stage_up_to_date,
+    store_fingerprint,
+)
+from sqlstages.graph import (
+    ConnectionPerThread,
+    build_graph,
+    format_timing_report,
+    get_sql_scripts,
+    run_graph,
+)
 
 try:
     from dotenv import load_dotenv
@@ -28,8 +63,32 @@ except ModuleNotFoundError:
 
 ROOT_DIR = Path(__file__).parent.resolve()
 SQL_DIR = ROOT_DIR / "sql"
+BUILD_INFO_SQL = SQL_DIR / "update_build_info.sql"
+BUILD_STAGES_SQL = SQL_DIR / "create_build_stages_table.sql"
+PORTFOLIOGRAPH_DIR = ROOT_DIR / "portfoliograph"
 WOW_YML = yaml.full_load((ROOT_DIR / "who-owns-what.yml").read_text())
 TESTS_DIR = ROOT_DIR / "tests"
+NYCDB_LOG_DIR = ROOT_DIR / "nycdb" / "logs"
+
+# How many NYCDB datasets `builddb` downloads and loads, and SQL scripts it
+# runs, at once by default.
+NYCDB_JOBS = 4
+
+# The build stage that creates and fills in the OCA tables, along with the
+# tables it reads and writes.
+OCA_STAGE = "oca"
+OCA_STAGE_READS = ["oca_index"]
+OCA_STAGE_WRITES = [
+    "oca_addresses_with_bbl",
+    "oca_evictions_bldgs",
+    "oca_evictions_monthly",
+]
+
+# The build stage that fills in the portfolio tables with portfoliograph,
+# along with the tables it reads and writes.
+PORTFOLIOS_STAGE = "portfoliograph"
+PORTFOLIOS_STAGE_READS = ["wow_landlords"]
+PORTFOLIOS_STAGE_WRITES = ["wow_portfolios", "wow_bbl_portfolio"]
 
 # Just an alias for our database connection.
 DbConnection = Any
@@ -128,32 +187,61 @@ class NycDbBuilder:
 
         self.conn = db.connection()
 
+        # Datasets can be ensured from several threads at once, so access
+        # to the connection and to the running NYCDB processes is locked.
+        self.conn_lock = threading.Lock()
+        self.nycdb_processes: Set[subprocess.Popen] = set()
+        self.nycdb_processes_lock = threading.Lock()
+        self.nycdb_stopped = threading.Event()
+
         with self.conn.cursor() as cur:
             cur.execute("CREATE EXTENSION IF NOT EXISTS POSTGIS;")
 
-    def call_nycdb(self, *args: str) -> None:
+    def call_nycdb(self, *args: str, log_file: Optional[IO[str]] = None) -> None:
         db = self.db
-        subprocess.check_call(
-            [
-                "nycdb",
-                *args,
-                "-H",
-                db.host,
-                "-U",
-                db.user,
-                "-P",
-                db.password,
-                "-D",
-                db.database,
-                "--port",
-                str(db.port),
-                "--root-dir",
-                str(self.data_dir),
-            ]
+        args = (
+            "nycdb",
+            *args,
+            "-H",
+            db.host,
+            "-U",
+            db.user,
+            "-P",
+            db.password,
+            "-D",
+            db.database,
+            "--port",
+            str(db.port),
+            "--root-dir",
+            str(self.data_dir),
         )
+        with self.nycdb_processes_lock:
+            if self.nycdb_stopped.is_set():
+                raise NycDbStoppedError(f"Not running {' '.join(args[:3])}.")
+            process = subprocess.Popen(
+                args, stdout=log_file, stderr=subprocess.STDOUT if log_file else None
+            )
+            self.nycdb_processes.add(process)
+        try:
+            retcode = process.wait()
+        finally:
+            with self.nycdb_processes_lock:
+                self.nycdb_processes.discard(process)
+        if retcode:
+            raise subprocess.CalledProcessError(retcode, args)
+
+    def stop_nycdb_processes(self) -> None:
+        """
+        Terminate any running NYCDB processes, and don't start any more.
+        """
+
+        with self.nycdb_processes_lock:
+            self.nycdb_stopped.set()
+            for process in self.nycdb_processes:
+                process.terminate()
 
     def do_tables_exist(self, *names: str) -> bool:
-        with self.conn:
+        with self.conn_lock, self.conn:
             for name in names:
                 with self.conn.cursor() as cursor:
                     cursor.execute(f"SELECT to_regclass('public.{name}')")
@@ -162,7 +250,7 @@ class NycDbBuilder:
         return True
 
     def drop_tables(self, *names: str) -> None:
-        with self.conn:
+        with self.conn_lock, self.conn:
             for name in names:
                 with self.conn.cursor() as cursor:
                     cursor.execute(f"DROP TABLE IF EXISTS {name}")
@@ -178,7 +266,12 @@ class NycDbBuilder:
                 print(f"Removing {csv_file.name} so it can be re-downloaded.")
                 csv_file.unlink()
 
-    def ensure_dataset(self, name: str, force_refresh: bool = False) -> None:
+    def ensure_dataset(
+        self,
+        name: str,
+        force_refresh: bool = False,
+        log_file: Optional[IO[str]] = None,
+    ) -> None:
         dataset = nycdb.dataset.datasets()[name]
         tables: List[str] = (
             [schema["table_name"] for schema in list_wrap(dataset["schema"])]
@@ -195,12 +288,49 @@ class NycDbBuilder:
             self.delete_downloaded_data(*tables)
         if not tables or not self.do_tables_exist(*tables):
             print(f"Table {name} not found in the database. Downloading...")
-            self.call_nycdb("--download", name)
+            self.call_nycdb("--download", name, log_file=log_file)
             print(f"Loading {name} into the database...")
-            self.call_nycdb("--load", name)
+            self.call_nycdb("--load", name, log_file=log_file)
         elif not self.is_testing:
             print(f"Table {name} already exists. Verifying row count...")
-            self.call_nycdb("--verify", name)
+            self.call_nycdb("--verify", name, log_file=log_file)
+
+    def ensure_datasets(
+        self, names: List[str], force_refresh: bool = False, jobs: int = 1
+    ) -> None:
+        """
+        Ensure the given NYCDB datasets are loaded, up to `jobs` of them at
+        once. When more than one is loaded at a time, NYCDB's output for
+        each dataset is written to its own log file in NYCDB_LOG_DIR. If a
+        dataset fails to load, the others are stopped.
+        """
+
+        self.nycdb_stopped.clear()
+
+        def ensure(name: str) -> None:
+            if jobs == 1:
+                self.ensure_dataset(name, force_refresh=force_refresh)
+                return
+            NYCDB_LOG_DIR.mkdir(parents=True, exist_ok=True)
+            log_path = NYCDB_LOG_DIR / f"{name}.log"
+            with log_path.open("w") as log_file:
+                try:
+                    self.ensure_dataset(
+                        name, force_refresh=force_refresh, log_file=log_file
+                    )
+                except subprocess.CalledProcessError:
+                    if not self.nycdb_stopped.is_set():
+                        print(f"NYCDB failed on dataset '{name}', see {log_path}.")
+                    raise
+
+        started_at = time.monotonic()
+        timings = run_jobs(
+            names, ensure, jobs=jobs, on_failure=self.stop_nycdb_processes
+        )
+        print(f"Ensured {len(timings)} NYCDB datasets with {jobs} job(s):")
+        for name, seconds in sorted(timings.items(), key=lambda t: -t[1]):
+            print(f"  {name}: {seconds:.1f}s")
+        print(f"  total: {time.monotonic() - started_at:.1f}s")
 
     def run_sql_file(self, sqlpath: Path) -> None:
         sql = sqlpath.read_text()
@@ -208,37 +338,261 @@ class NycDbBuilder:
             with self.conn.cursor() as cursor:
                 cursor.execute(sql)
 
-    def build(self, force_refresh: bool) -> None:
+    def run_sql_files(
+        self,
+        sqlpaths: List[Path],
+        fingerprinter: Fingerprinter,
+        jobs: int = 1,
+        incremental: bool = True,
+    ) -> None:
+        """
+        Run the given SQL scripts once the scripts they depend on according
+        to `sql_dependencies` in who-owns-what.yml have finished, up to
+        `jobs` of them at once on separate connections.
+
+        If `incremental` is true, scripts whose inputs haven't changed since
+        they last ran are skipped. Only scripts that declare what they read
+        and write, and whose dependencies do too, can be skipped.
+        """
+
+        scripts = {
+            script.name: script
+            for script in get_sql_scripts(sqlpaths, WOW_YML["sql_dependencies"])
+        }
+        graph = build_graph(list(scripts.values()))
+        connections = ConnectionPerThread(self.db.connection)
+        skipped: List[str] = []
+
+        def run(name: str) -> None:
+            script = scripts[name]
+            sql = script.path.read_text()
+            conn = self.conn if jobs == 1 else connections.get()
+            with conn:
+                with conn.cursor() as cur:
+                    fingerprint: Optional[str] = None
+                    if script.is_declared and all(
+                        scripts[dep].is_declared for dep in graph[name]
+                    ):
+                        fingerprint = fingerprinter.get_stage_fingerprint(
+                            cur, name, code=[sql], reads=script.reads or []
+                        )
+                        if incremental and is_stage_up_to_date(
+                            cur, name, fingerprint, script.writes or []
+                        ):
+                            print(f"Skipping {name}, its inputs haven't changed.")
+                            skipped.append(name)
+                            return
+                    print(f"Running {name}...")
+                    cur.execute(sql)
+                    if fingerprint is None:
+                        forget_fingerprint(cur, name)
+                    else:
+                        store_fingerprint(cur, name, fingerprint, script.writes or [])
+
+        try:
+            timings = run_graph(
+                graph, run, jobs=jobs, on_failure=connections.cancel_all
+            )
+        finally:
+            connections.close_all()
+        print(format_timing_report(graph, timings))
+        if skipped:
+            print(f"Skipped {len(skipped)} of {len(timings)} scripts.")
+
+    def populate_oca(
+        self, fingerprinter: Fingerprinter, incremental: bool = True
+    ) -> None:
+        """
+        Create and fill in the OCA tables, unless their inputs, including
+        the versions of the OCA files, haven't changed since they were last
+        filled in.
+        """
+
+        # The OCA tables need to be committed before the SQL scripts that
+        # read them run on other connections.
+        with self.conn:
+            with self.conn.cursor() as cur:
+                fingerprint = fingerprinter.get_stage_fingerprint(
+                    cur,
+                    OCA_STAGE,
+                    code=get_oca_sql(self.oca_config),
+                    reads=OCA_STAGE_READS,
+                    sources=get_oca_source_versions(self.oca_config),
+                )
+                if incremental and is_stage_up_to_date(
+                    cur, OCA_STAGE, fingerprint, OCA_STAGE_WRITES
+                ):
+                    print("Skipping OCA tables, their inputs haven't changed.")
+                    return
+                populate_oca_tables(cur, self.oca_config)
+                store_fingerprint(cur, OCA_STAGE, fingerprint, OCA_STAGE_WRITES)
+
+    def populate_portfolios(
+        self, fingerprinter: Fingerprinter, incremental: bool = True
+    ) -> None:
+        """
+        Fill in the portfolio tables created by `create_portfolios_table.sql`,
+        unless their inputs haven't changed since they were last filled in.
+        """
+
+        with self.conn:
+            with self.conn.cursor() as cur:
+                fingerprint = fingerprinter.get_stage_fingerprint(
+                    cur,
+                    PORTFOLIOS_STAGE,
+                    code=get_portfoliograph_code(),
+                    reads=PORTFOLIOS_STAGE_READS,
+                    populates=PORTFOLIOS_STAGE_WRITES,
+                )
+                if incremental and is_stage_up_to_date(
+                    cur, PORTFOLIOS_STAGE, fingerprint, PORTFOLIOS_STAGE_WRITES
+                ):
+                    print("Skipping portfolios, their inputs haven't changed.")
+                    return
+                print("Populating portfolios...")
+                cur.execute("TRUNCATE wow_portfolios")
+            populate_portfolios_table(self.conn)
+            with self.conn.cursor() as cur:
+                store_fingerprint(
+                    cur, PORTFOLIOS_STAGE, fingerprint, PORTFOLIOS_STAGE_WRITES
+                )
+
+    def build(
+        self, force_refresh: bool, jobs: int = 1, incremental: bool = True
+    ) -> None:
         if self.is_testing:
             print("Loading the database with test data.")
         else:
             print("Loading the database with real data (this could take a while).")
 
-        for dataset in get_dataset_dependencies(for_api=True):
-            self.ensure_dataset(dataset, force_refresh=force_refresh)
+        self.ensure_datasets(
+            get_dataset_dependencies(for_api=True),
+            force_refresh=force_refresh,
+            jobs=jobs,
+        )
 
-        with self.conn.cursor() as cur:
-            populate_oca_tables(cur, self.oca_config)
+        self.run_sql_file(BUILD_STAGES_SQL)
+        fingerprinter = Fingerprinter(
+            get_nycdb_table_datasets(), build_outputs=get_build_outputs()
+        )
+
+        self.populate_oca(fingerprinter, incremental=incremental)
 
-        for sqlpath in get_sqlfile_paths("pre"):
-            print(f"Running {sqlpath.name}...")
-            self.run_sql_file(sqlpath)
+        self.run_sql_files(
+            get_sqlfile_paths("pre"), fingerprinter, jobs=jobs, incremental=incremental
+        )
 
+        self.populate_portfolios(fingerprinter, incremental=incremental)
+
+        self.run_sql_files(
+            get_sqlfile_paths("post"), fingerprinter, jobs=jobs, incremental=incremental
+        )
+
+        print("Encoding district geojson...")
         with self.conn:
-            populate_portfolios_table(self.conn)
+            with self.conn.cursor() as cur:
+                populate_districts_geojson_encoded_table(cur)
+
+        self.run_sql_file(BUILD_INFO_SQL)
+
+
+class NycDbStoppedError(Exception):
+    """
+    Raised when NYCDB is about to be run after the build was stopped
+    because another dataset failed to load.
+    """
+
+    pass
+
 
-        for sqlpath in get_sqlfile_paths("post"):
-            print(f"Running {sqlpath.name}...")
-            self.run_sql_file(sqlpath)
+def run_jobs(
+    names: List[str],
+    job: Callable[[str], None],
+    jobs: int = 1,
+    on_failure: Optional[Callable[[], None]] = None,
+) -> Dict[str, float]:
+    """
+    Call `job` with each of the given (deduplicated) names, up to `jobs`
+    at a time, returning how many seconds each call took.
+
+    If a call raises, no more calls are started, `on_failure` is called
+    so that the running ones can be stopped, and once they're finished
+    the first exception is re-raised.
+    """
+
+    names = list(dict.fromkeys(names))
+    timings: Dict[str, float] = {}
+    failed = threading.Event()
+
+    def timed_job(name: str) -> None:
+        if failed.is_set():
+            return
+        started_at = time.monotonic()
+        try:
+            job(name)
+        except BaseException:
+            failed.set()
+            raise
+        timings[name] = time.monotonic() - started_at
+        print(f"Finished '{name}' in {timings[name]:.1f}s.")
+
+    executor = ThreadPoolExecutor(max_workers=max(jobs, 1))
+    try:
+        futures = [executor.submit(timed_job, name) for name in names]
+        wait(futures, return_when=FIRST_EXCEPTION)
+        errors: List[BaseException] = []
+        for future in futures:
+            if future.done() and not future.cancelled() and future.exception():
+                errors.append(future.exception())  # type: ignore
+        if errors:
+            executor.shutdown(wait=False, cancel_futures=True)
+            if on_failure is not None:
+                on_failure()
+            wait([future for future in futures if not future.cancelled()])
+            raise errors[0]
+    finally:
+        executor.shutdown(wait=True)
+    return timings
 
 
 def get_dataset_dependencies(for_api: bool) -> List[str]:
-    result = WOW_YML["dependencies"]
+    result = list(WOW_YML["dependencies"])
     if for_api:
         result += WOW_YML["api_dependencies"]
     return result
 
 
+def get_nycdb_table_datasets() -> Dict[str, str]:
+    """
+    Return the name of the NYCDB dataset each NYCDB table belongs to.
+    """
+
+    return {
+        schema["table_name"]: name
+        for name, dataset in nycdb.dataset.datasets().items()
+        for schema in list_wrap(dataset.get("schema", []))
+    }
+
+
+def get_build_outputs() -> Set[str]:
+    """
+    Return the tables (and functions) that the stages of the build write.
+    """
+
+    outputs = set(OCA_STAGE_WRITES + PORTFOLIOS_STAGE_WRITES)
+    for deps in WOW_YML["sql_dependencies"].values():
+        outputs.update(deps.get("writes") or [])
+    return outputs
+
+
+def get_portfoliograph_code() -> List[str]:
+    return [
+        path.read_text()
+        for path in sorted(PORTFOLIOGRAPH_DIR.rglob("*"))
+        if path.suffix in (".py", ".sql")
+    ]
+
+
 def get_sqlfile_paths(type: Literal["pre", "post", "all"]) -> List[Path]:
     pre_sql = [SQL_DIR / sqlfile for sqlfile in WOW_YML["wow_pre_sql"]]
     post_sql = [SQL_DIR / sqlfile for sqlfile in WOW_YML["wow_post_sql"]]
@@ -250,6 +604,35 @@ def get_sqlfile_paths(type: Literal["pre", "post", "all"]) -> List[Path]:
         return pre_sql + post_sql
 
 
+def populate_districts_geojson_encoded_table(cur) -> None:
+    """
+    Fill in the content hashes and compressed copies of the district
+    geojson response bodies rendered by
+    `create_districts_geojson_encoded_table.sql`, unless they already
+    have been.
+    """
+
+    cur.execute(
+        "SELECT district_type, identity FROM wow_districts_geojson_encoded "
+        "WHERE content_hash IS NULL"
+    )
+    for district_type, identity in cur.fetchall():
+        identity = bytes(identity)
+        cur.execute(
+            """
+            UPDATE wow_districts_geojson_encoded
+            SET content_hash = %s, gzip = %s, br = %s
+            WHERE district_type = %s
+            """,
+            (
+                hashlib.sha256(identity).hexdigest()[:16],
+                gzip.compress(identity, compresslevel=9, mtime=0),
+                brotli.compress(identity, mode=brotli.MODE_TEXT),
+                district_type,
+            ),
+        )
+
+
 def dbshell(db: DbContext):
     env, args = db.get_pg_env_and_args()
     retval = subprocess.call(["psql", *args], env=env)
@@ -268,12 +651,23 @@ def loadtestdata(db: DbContext, oca_config: OcaConfig):
     sqlfile = ROOT_DIR / "tests" / "exported_test_data.sql"
     sql = sqlfile.read_text()
 
-    NycDbBuilder(db, oca_config_testing, is_testing=True).build(force_refresh=False)
+    NycDbBuilder(db, oca_config_testing, is_testing=True).build(
+        force_refresh=False, incremental=False
+    )
 
     print(f"Loading test data from {sqlfile}...")
     with db.connection() as conn:
         cur = conn.cursor()
         cur.execute(sql)
+        # The test data replaces wow_bldgs, wow_portfolios and some of the
+        # HPD tables, so we need to update the tables derived from them.
+        populate_bbl_portfolio_table(conn)
+        for sqlfile in WOW_YML["wow_test_data_sql"]:
+            cur.execute((SQL_DIR / sqlfile).read_text())
+        # The stages that wrote the replaced tables didn't write what's in
+        # them now, so the next build shouldn't skip any of them.
+        cur.execute("TRUNCATE wow_build_stages")
+        cur.execute(BUILD_INFO_SQL.read_text())
     print("Loaded test data into database.")
 
 
@@ -412,6 +806,14 @@ if __name__ == "__main__":
         help="AWS Secret for OCA S3 files. Defaults to AWS_SECRET_KEY environment variable.",
         default=os.environ.get("AWS_SECRET_KEY", ""),
     )
+    parser.add_argument(
+        "--oca_s3_download",
+        action="store_true",
+        help=(
+            "Download the OCA files from S3 to the data directory before loading "
+            "them, instead of streaming them straight into the database."
+        ),
+    )
 
     parser_exportgraph = subparsers.add_parser("exportgraph")
     parser_exportgraph.set_defaults(cmd="exportgraph")
@@ -434,6 +836,25 @@ if __name__ == "__main__":
             "data sets so they can be re-downloaded and re-installed."
         ),
     )
+    parser_builddb.add_argument(
+        "-j",
+        "--jobs",
+        type=int,
+        default=int(os.environ.get("NYCDB_JOBS", NYCDB_JOBS)),
+        help=(
+            "How many NYCDB datasets to download and load, and SQL scripts to "
+            "run, at once. Defaults to the NYCDB_JOBS environment variable, "
+            f"or {NYCDB_JOBS}."
+        ),
+    )
+    parser_builddb.add_argument(
+        "--full",
+        action="store_true",
+        help=(
+            "Run every SQL script, even the ones whose inputs haven't changed "
+            "since they last ran."
+        ),
+    )
     parser_builddb.set_defaults(cmd="builddb")
 
     parser_dbshell = subparsers.add_parser("dbshell")
@@ -491,6 +912,7 @@ if __name__ == "__main__":
             s3_bucket=args.oca_s3_bucket,
             s3_objects=WOW_YML["oca_s3_objects"],
             is_testing=True if cmd == "loadtestdata" else False,
+            stream_from_s3=not args.oca_s3_download,
         )
 
     if cmd == "exporttestdata":
@@ -500,7 +922,9 @@ if __name__ == "__main__":
     elif cmd == "dbshell":
         dbshell(db)
     elif cmd == "builddb":
-        NycDbBuilder(db, oca_config, is_testing=False).build(force_refresh=args.update)
+        NycDbBuilder(db, oca_config, is_testing=False).build(
+            force_refresh=args.update, jobs=args.jobs, incremental=not args.full
+        )
     elif cmd == "exportgraph":
         with open(args.outfile, "w") as f:
             with db.connection() as conn:
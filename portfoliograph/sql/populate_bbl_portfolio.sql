@@ -0,0 +1,21 @@
+-- Once the wow_portfolios table has been populated, break each portfolio's
+-- BBLs out into their own rows. We identify portfolios the same way as the
+-- wow_indicators and Good Cause tables do, by their order of BBLs, and
+-- precompute each portfolio's size so the API doesn't have to.
+
+TRUNCATE wow_bbl_portfolio;
+
+INSERT INTO wow_bbl_portfolio (bbl, portfolio_id, portfolio_size)
+	SELECT
+		unnest(bbls) AS bbl,
+		portfolio_id,
+		array_length(bbls, 1) AS portfolio_size
+	FROM (
+		SELECT
+			bbls,
+			row_number() OVER (ORDER BY bbls) AS portfolio_id
+		FROM wow_portfolios
+	) AS portfolios
+	ON CONFLICT DO NOTHING;
+
+ANALYZE wow_bbl_portfolio;
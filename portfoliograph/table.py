@@ -101,3 +101,11 @@ def populate_portfolios_table(conn, batch_size=5000, table="wow_portfolios"):
 
         update_sql = (SQL_DIR / "update_related_portfolios.sql").read_text()
         cursor.execute(update_sql)
+
+    if table == "wow_portfolios":
+        populate_bbl_portfolio_table(conn)
+
+
+def populate_bbl_portfolio_table(conn):
+    with conn.cursor() as cursor:
+        cursor.execute((SQL_DIR / "populate_bbl_portfolio.sql").read_text())
@@ -0,0 +1,50 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from wow.districtutil import DISTRICT_TYPES
+from wow.tileutil import (
+    MAX_TILE_ZOOM,
+    WARM_TILE_ZOOMS,
+    get_tile_cache_dir,
+    prune_district_tile_cache,
+    warm_district_tile_cache,
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Cache the District Alerts map's vector tiles for the current database "
+        "build, and delete those of previous builds."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--min-zoom",
+            type=int,
+            default=WARM_TILE_ZOOMS.start,
+            help="the lowest zoom level to cache tiles at",
+        )
+        parser.add_argument(
+            "--max-zoom",
+            type=int,
+            default=WARM_TILE_ZOOMS.stop - 1,
+            help="the highest zoom level to cache tiles at",
+        )
+        parser.add_argument(
+            "district_types",
+            nargs="*",
+            help="types of districts to cache tiles of (defaults to all of them)",
+        )
+
+    def handle(self, *args, **options):
+        if get_tile_cache_dir() is None:
+            raise CommandError("WOW_DISTRICT_TILE_CACHE_DIR isn't set.")
+        min_zoom, max_zoom = options["min_zoom"], options["max_zoom"]
+        if not 0 <= min_zoom <= max_zoom <= MAX_TILE_ZOOM:
+            raise CommandError(f"Zoom levels must be from 0 to {MAX_TILE_ZOOM}.")
+        district_types = options["district_types"] or DISTRICT_TYPES
+        invalid = set(district_types) - set(DISTRICT_TYPES)
+        if invalid:
+            raise CommandError(f"Invalid district types: {', '.join(sorted(invalid))}")
+        prune_district_tile_cache()
+        count = warm_district_tile_cache(district_types, range(min_zoom, max_zoom + 1))
+        self.stdout.write(f"Cached {count} district tiles.")
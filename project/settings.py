@@ -86,8 +86,85 @@ DATABASES = {
         "ENGINE": "django.db.backends.sqlite3",
         "NAME": str(BASE_DIR / "db.sqlite3"),
     },
-    "wow": dj_database_url.parse(get_required_env("DATABASE_URL")),
+    "wow": dj_database_url.parse(
+        get_required_env("DATABASE_URL"),
+        conn_max_age=int(os.environ.get("WOW_DB_CONN_MAX_AGE") or 600),
+    ),
 }
+
+# How often, in seconds, to make sure a persistent connection to the WoW
+# database still works before reusing it.
+WOW_DB_HEALTH_CHECK_INTERVAL = int(os.environ.get("WOW_DB_HEALTH_CHECK_INTERVAL") or 30)
+
+# How often, in seconds, each server process logs how it has used its
+# connections to the WoW database. 0 disables this logging.
+WOW_DB_STATS_LOG_INTERVAL = int(os.environ.get("WOW_DB_STATS_LOG_INTERVAL") or 300)
+
+# The maximum time, in milliseconds, any statement on the WoW database
+# may run before it's cancelled. 0 means there is no limit.
+WOW_DB_STATEMENT_TIMEOUT = int(os.environ.get("WOW_DB_STATEMENT_TIMEOUT") or 60000)
+
+# The name our connections to the WoW database identify themselves with,
+# e.g. in pg_stat_activity.
+WOW_DB_APPLICATION_NAME = os.environ.get("WOW_DB_APPLICATION_NAME", "wow-django")
+
+# Whether to run the queries in wow/sql as server-side prepared statements.
+# This should be disabled if the database is behind a connection pooler
+# that doesn't keep a client on the same server session (e.g. pgbouncer
+# in transaction pooling mode).
+WOW_USE_PREPARED_STATEMENTS = os.environ.get("WOW_USE_PREPARED_STATEMENTS") != "false"
+
+# The maximum total size, in bytes, of API responses cached in each server
+# process. Cached responses are only reused until the next database build,
+# and setting this to 0 disables response caching entirely.
+WOW_RESPONSE_CACHE_MAX_BYTES = int(
+    os.environ.get("WOW_RESPONSE_CACHE_MAX_BYTES") or 64 * 1024 * 1024
+)
+
+# The alias of an optional Django cache (see the CACHES setting) to share
+# cached API responses between server processes.
+WOW_RESPONSE_CACHE_ALIAS: Optional[str] = (
+    os.environ.get("WOW_RESPONSE_CACHE_ALIAS") or None
+)
+
+# How often, in seconds, each server process checks whether the database
+# has been rebuilt.
+WOW_BUILD_VERSION_TTL = int(os.environ.get("WOW_BUILD_VERSION_TTL") or 60)
+
+# Whether endpoints that support it should have Postgres render their
+# results as JSON, instead of building and serializing them in Python.
+WOW_RENDER_JSON_IN_DATABASE = os.environ.get("WOW_RENDER_JSON_IN_DATABASE") == "true"
+
+# The maximum number of database queries each server process runs
+# concurrently on behalf of endpoints that combine several of them, like
+# the address page bundle. Each of these threads keeps its own database
+# connection.
+WOW_QUERY_THREADS = int(os.environ.get("WOW_QUERY_THREADS") or 8)
+
+# The maximum number of BBLs that can be looked up in a single request to
+# one of the batch endpoints.
+WOW_MAX_BATCH_BBLS = int(os.environ.get("WOW_MAX_BATCH_BBLS") or 1000)
+
+# The maximum number of different selections of districts that can be
+# requested at once from the batch Area Alerts endpoint. Each one is
+# ranked with its own query.
+WOW_MAX_BATCH_DISTRICT_SELECTIONS = int(
+    os.environ.get("WOW_MAX_BATCH_DISTRICT_SELECTIONS") or 100
+)
+
+# How long, in seconds, browsers and CDNs may reuse public API responses
+# before revalidating them, unless an endpoint sets its own policy.
+WOW_API_CACHE_MAX_AGE = int(os.environ.get("WOW_API_CACHE_MAX_AGE") or 300)
+
+# The version of the deployed code, which is part of the ETags of our API
+# responses so that a deploy which changes their format invalidates them.
+WOW_CODE_VERSION = os.environ.get("HEROKU_SLUG_COMMIT", "")
+
+# A directory to cache the District Alerts map's vector tiles in, which
+# can be filled ahead of time with `manage.py warmdistricttiles`. Tiles
+# aren't cached if this is empty.
+WOW_DISTRICT_TILE_CACHE_DIR = os.environ.get("WOW_DISTRICT_TILE_CACHE_DIR", "")
+
 CORS_ALLOW_HEADERS = default_headers + ("Access-Control-Allow-Origin", "Set-Cookie")
 CORS_ALLOW_ALL_ORIGINS = False
 CORS_ALLOW_CREDENTIALS = True
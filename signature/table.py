@@ -1,9 +1,8 @@
-import csv
-import itertools
-import boto3
-from botocore.client import Config
 from pathlib import Path
-from typing import Iterable, Iterator, List, Optional
+from typing import List, Optional
+
+from bulkload.csvcopy import copy_csv_file
+from bulkload.s3stream import copy_s3_objects, get_s3_client
 
 
 class SignatureConfig:
@@ -19,6 +18,7 @@ class SignatureConfig:
         s3_bucket: Optional[str],
         s3_objects: List[str],
         is_testing: bool = False,
+        stream_from_s3: bool = True,
     ):
         self.sql_pre_files = [sql_dir / f for f in sql_pre_files]
         self.sql_post_files = [sql_dir / f for f in sql_post_files]
@@ -30,6 +30,7 @@ class SignatureConfig:
         self.s3_bucket = s3_bucket
         self.s3_objects = s3_objects
         self.is_testing = is_testing
+        self.stream_from_s3 = stream_from_s3
 
     @property
     def has_s3_creds(self) -> bool:
@@ -37,14 +38,7 @@ class SignatureConfig:
 
 
 def download_s3_objects(config: SignatureConfig):
-    s3 = boto3.client(
-        "s3",
-        aws_access_key_id=config.aws_key,
-        aws_secret_access_key=config.aws_secret,
-        config=Config(
-            connect_timeout=10, read_timeout=100, retries={"max_attempts": 10}
-        ),
-    )
+    s3 = get_s3_client(config.aws_key, config.aws_secret)
     for object in config.s3_objects:
         csv_path = config.data_dir / Path(object).name
         s3.download_file(config.s3_bucket, object, csv_path)
@@ -56,32 +50,6 @@ def create_s3_tables(wow_cur, config: SignatureConfig):
         wow_cur.execute(sql)
 
 
-def read_iter_rows(csv_path) -> Iterator[tuple]:
-    with open(csv_path, "r") as file:
-        reader = csv.reader(file)
-        next(reader, None)  # skip header
-        for row in reader:
-            yield tuple(row)
-
-
-def grouper(n: int, iterator: Iterator[Iterable]) -> Iterator[List[Iterable]]:
-    while True:
-        chunk = list(itertools.islice(iterator, n))
-        if not chunk:
-            return
-        yield chunk
-
-
-def populate_table_from_csv(wow_cur, csv_path: Path, batch_size: int = 5000):
-    iter_rows = read_iter_rows(csv_path)
-    for chunk in grouper(batch_size, iter_rows):
-        args_str = b",".join(
-            wow_cur.mogrify("(" + ", ".join(["%s"] * len(tuple(row))) + ")", row)
-            for row in chunk
-        ).decode()
-        wow_cur.execute(f"INSERT INTO {csv_path.stem} VALUES {args_str}")
-
-
 def create_derived_tables(wow_cur, config: SignatureConfig):
     for f in config.sql_post_files:
         print(f"- {f.stem}")
@@ -100,15 +68,20 @@ def populate_tables(wow_cur, config: SignatureConfig):
         print("No AWS keys to access Signature files in S3. Leaving tables empty")
         return
 
-    if not config.is_testing:
-        download_s3_objects(config)
-
     print(f"Populating Signature tables")
 
-    for object in config.s3_objects:
+    if config.is_testing or not config.stream_from_s3:
+        if not config.is_testing:
+            download_s3_objects(config)
         csv_dir = config.test_dir if config.is_testing else config.data_dir
-        csv_path = csv_dir / Path(object).name
-        print(f"- {csv_path.stem}")
-        populate_table_from_csv(wow_cur, csv_path)
+        for object in config.s3_objects:
+            print(f"- {copy_csv_file(wow_cur, csv_dir / Path(object).name)}")
+    else:
+        # Stream the files straight from S3 into their tables, instead of
+        # downloading them first.
+        assert config.s3_bucket
+        s3 = get_s3_client(config.aws_key, config.aws_secret)
+        for stats in copy_s3_objects(wow_cur, s3, config.s3_bucket, config.s3_objects):
+            print(f"- {stats}")
 
     create_derived_tables(wow_cur, config)
@@ -0,0 +1,44 @@
+-- For every registration, precompute the registrations that
+-- get_regids_from_regid_by_bisaddr() and get_regids_from_regid_by_owners()
+-- associate with it, so that get_assoc_addrs_from_bbl() can look them up
+-- with an index instead of running a trigram name search for each owner
+-- contact on every request.
+--
+-- Like those functions, this association isn't necessarily symmetric
+-- (or transitive): registrationid is the one we start from and assocregid
+-- is one of the registrations associated with it.
+
+DROP TABLE IF EXISTS wow_assoc_regids_temporary;
+
+CREATE TABLE wow_assoc_regids_temporary AS
+  WITH owner_contacts AS (
+    SELECT DISTINCT registrationid, firstname, lastname
+    FROM hpd_contacts
+    WHERE firstname IS NOT NULL AND lastname IS NOT NULL AND
+      (type = 'CorporateOwner' OR type = 'HeadOfficer' OR type = 'IndividualOwner')
+  ),
+  -- Run the (expensive) name search only once for each distinct name,
+  -- no matter how many registrations it appears in.
+  name_regids AS (
+    SELECT names.firstname, names.lastname, unnest(f.uniqregids) AS assocregid
+    FROM (SELECT DISTINCT firstname, lastname FROM owner_contacts) AS names,
+    LATERAL get_regids_from_name(names.firstname, names.lastname) f
+  )
+  SELECT c.registrationid, n.assocregid
+  FROM owner_contacts AS c
+  INNER JOIN name_regids AS n USING (firstname, lastname)
+  UNION
+  SELECT regid AS registrationid, assocregid
+  FROM hpd_business_addresses AS rbas,
+  unnest(rbas.uniqregids) AS regid,
+  unnest(rbas.uniqregids) AS assocregid;
+
+DELETE FROM wow_assoc_regids_temporary
+  WHERE registrationid IS NULL OR assocregid IS NULL;
+
+DROP TABLE IF EXISTS wow_assoc_regids;
+ALTER TABLE wow_assoc_regids_temporary RENAME TO wow_assoc_regids;
+
+ALTER TABLE wow_assoc_regids ADD PRIMARY KEY (registrationid, assocregid);
+
+ANALYZE wow_assoc_regids;
@@ -0,0 +1,9 @@
+-- Records the fingerprint of the inputs each stage of the database build
+-- last ran with, so that `dbtool.py builddb` can skip the stages whose
+-- inputs haven't changed since. See sqlstages/fingerprint.py.
+CREATE TABLE IF NOT EXISTS wow_build_stages (
+    name TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    writes TEXT[] NOT NULL,
+    finished_at TIMESTAMPTZ NOT NULL
+);
@@ -0,0 +1,109 @@
+-- Per-building priority scores used to rank buildings in Area Alerts emails
+-- (see wow/sql/alerts_district.sql). None of these depend on which districts
+-- an alert covers, so they're computed once per build instead of on every
+-- request, which only has to normalize and rank the scores of the buildings
+-- in its districts.
+--
+-- Like the Area Alerts ranking, this only includes buildings with residential
+-- units, since the scores are weighed by the log of their number.
+
+DROP TABLE IF EXISTS wow_district_alert_scores_temporary;
+
+CREATE TABLE wow_district_alert_scores_temporary AS
+	WITH portfolio_counts AS (
+		SELECT
+			portfolio_id,
+			COUNT(*) AS all_bbls_shared_portfolio
+		FROM wow_indicators
+		WHERE portfolio_id IS NOT NULL
+		GROUP BY portfolio_id
+	)
+	SELECT 
+		bbl, 
+		bin,
+		housenumber, 
+		streetname,
+		boro,
+		unitsres,
+		rsunitslatest, 
+		CASE 
+			WHEN unitsres < 6 THEN 0
+			WHEN unitsres < 10 THEN 0.5
+			WHEN unitsres < 200 THEN 1
+			WHEN unitsres < 300 THEN 0.5
+			WHEN unitsres >= 300 THEN .25
+			ELSE 0
+		END AS size_metric,
+		portfolio_id,
+		coalesce(pc.all_bbls_shared_portfolio, 0) AS all_bbls_shared_portfolio,
+		hpd_link,
+
+		coun_dist,
+		nta,
+		census_tract,
+		community_dist,
+		assem_dist,
+		stsen_dist,
+		zipcode,
+		
+		-- priority values
+		coalesce(hpd_comp__week , 0) * ln(unitsres) as priority_comp__week,
+		coalesce(hpd_comp__1mo , 0) * ln(unitsres) as priority_comp__1mo,
+		coalesce(hpd_comp__6mo , 0) * ln(unitsres) as priority_comp__6mo,
+		coalesce(hpd_comp_per_unit__week, 0) * ln(unitsres) as priority_comp_per_unit__week,
+		coalesce(hpd_comp_per_unit__1mo, 0) * ln(unitsres) as priority_comp_per_unit__1mo,
+		
+		coalesce(hpd_viol_bc__week , 0) * ln(unitsres) as priority_viol__week,
+		coalesce(hpd_viol_bc__1mo, 0) * ln(unitsres) as priority_viol__1mo,
+		coalesce(hpd_viol_bc__6mo, 0) * ln(unitsres) as priority_viol__6mo,
+		coalesce(hpd_viol_per_unit_bc__week, 0) * ln(unitsres) as priority_viol_per_unit__week,
+		coalesce(hpd_viol_per_unit_bc__1mo, 0) * ln(unitsres) as priority_viol_per_unit__1mo,
+		
+		coalesce(dob_ecb_viol__week, 0) * ln(unitsres) as priority_dob_ecb_viol__week,
+		coalesce(dob_ecb_viol__1mo, 0) * ln(unitsres) as priority_dob_ecb_viol__1mo,
+		coalesce(dob_ecb_viol__6mo, 0) * ln(unitsres) as priority_dob_ecb_viol__6mo,
+		coalesce(dob_comp__week, 0) * ln(unitsres) as priority_dob_comp__week,
+		coalesce(dob_comp__1mo, 0) * ln(unitsres) as priority_dob_comp__1mo,
+		coalesce(dob_comp__6mo, 0) * ln(unitsres) as priority_dob_comp__6mo,
+
+		-- raw values 
+		hpd_comp_per_unit__week,
+		coalesce(hpd_comp__week , 0) as hpd_comp__week,
+		coalesce(hpd_comp__1mo , 0) as hpd_comp__1mo,
+		coalesce(hpd_comp__6mo , 0) as hpd_comp__6mo,
+		
+		hpd_viol_per_unit_bc__week as hpd_viol_per_unit__week,
+		coalesce(hpd_viol_bc__week , 0) as hpd_viol__week,
+		coalesce(hpd_viol_bc__1mo , 0) as hpd_viol__1mo,
+		coalesce(hpd_viol_bc__6mo , 0) as hpd_viol__6mo,
+
+		coalesce(evictions_filed__week, 0) as evictions_filed__week,
+		coalesce(evictions_filed__1mo, 0) as evictions_filed__1mo,
+		coalesce(evictions_filed__6mo, 0) as evictions_filed__6mo,
+		
+		dob_ecb_viol_bin,
+		coalesce(dob_ecb_viol__week, 0) as dob_ecb_viol__week,
+		coalesce(dob_ecb_viol__1mo, 0) as dob_ecb_viol__1mo,
+		coalesce(dob_ecb_viol__6mo, 0) as dob_ecb_viol__6mo,
+		
+		dob_comp_bin,
+		coalesce(dob_comp__week, 0) as dob_comp__week,
+		coalesce(dob_comp__1mo, 0) as dob_comp__1mo,
+		coalesce(dob_comp__6mo, 0) as dob_comp__6mo
+	FROM wow_indicators
+	LEFT JOIN portfolio_counts pc USING(portfolio_id)
+	WHERE bbl IS NOT NULL
+		AND hpd_comp_per_unit__week IS NOT NULL
+		AND hpd_viol_per_unit_bc__week IS NOT NULL;
+
+DROP TABLE IF EXISTS wow_district_alert_scores;
+ALTER TABLE wow_district_alert_scores_temporary RENAME TO wow_district_alert_scores;
+
+CREATE UNIQUE INDEX ON wow_district_alert_scores (bbl);
+CREATE INDEX ON wow_district_alert_scores (coun_dist);
+CREATE INDEX ON wow_district_alert_scores (nta);
+CREATE INDEX ON wow_district_alert_scores (census_tract);
+CREATE INDEX ON wow_district_alert_scores (community_dist);
+CREATE INDEX ON wow_district_alert_scores (assem_dist);
+CREATE INDEX ON wow_district_alert_scores (stsen_dist);
+CREATE INDEX ON wow_district_alert_scores (zipcode);
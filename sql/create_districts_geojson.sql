@@ -1,7 +1,7 @@
 -- This generates all the geojson used for the district selection map, both the
 -- district shapes and the labels. This table can be built once and doesn't need
--- updates. We still need to figure out the system for that, since all other
--- tables are always rebuilt with the relevant job (wow, signature, etc.).
+-- updates, so `dbtool.py builddb` only rebuilds it when this file or the
+-- district boundaries change.
 
 -- Note: It's important that this is generated all at once like this so that the
 -- feature IDs are unique across all district types, and that match between the
@@ -9,6 +9,8 @@
 -- separate source with user selections and may want to link actions on
 -- districts to the labels using id. 
 
+DROP TABLE IF EXISTS wow_districts_geojson;
+
 CREATE TABLE wow_districts_geojson AS (
     WITH all_districts AS (
         SELECT
@@ -0,0 +1,31 @@
+-- The response bodies of the API's district geojson endpoint for each type
+-- of district, rendered here once so the API never has to re-serialize the
+-- (multi-megabyte) geojson. Postgres can't compress them, so after all the
+-- SQL has run dbtool.py fills in each body's content hash, along with
+-- gzip and brotli encoded copies of it for the API to serve as-is.
+
+DROP TABLE IF EXISTS wow_districts_geojson_encoded;
+
+CREATE TABLE wow_districts_geojson_encoded AS (
+    SELECT
+        "typeValue" AS district_type,
+        convert_to(
+            json_build_object(
+                'result', json_build_array(
+                    json_build_object(
+                        'value', "typeValue",
+                        'label', "typeLabel",
+                        'districtsData', districts_geojson,
+                        'labelsData', labels_geojson
+                    )
+                )
+            )::TEXT,
+            'UTF8'
+        ) AS identity,
+        NULL::TEXT AS content_hash,
+        NULL::BYTEA AS gzip,
+        NULL::BYTEA AS br
+    FROM wow_districts_geojson
+);
+
+CREATE UNIQUE INDEX ON wow_districts_geojson_encoded (district_type);
@@ -1,3 +1,5 @@
+DROP TABLE IF EXISTS wow_districts_geom;
+
 CREATE TABLE wow_districts_geom AS (
 	WITH city_council AS (
 		SELECT 
@@ -89,3 +91,10 @@ CREATE TABLE wow_districts_geom AS (
 );
 
 CREATE INDEX ON wow_districts_geom (typevalue, areavalue);
+
+-- The district shapes in web mercator, for the API's vector tiles.
+ALTER TABLE wow_districts_geom ADD COLUMN geom_3857 geometry;
+
+UPDATE wow_districts_geom SET geom_3857 = ST_Transform(geom, 3857);
+
+CREATE INDEX ON wow_districts_geom USING GIST (geom_3857);
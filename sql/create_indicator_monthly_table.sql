@@ -0,0 +1,127 @@
+-- Monthly totals of every indicator on the building timeline, for each BBL
+-- and month that has any. The API fills in the missing months with zeroes,
+-- so timelines for a single building only need a range scan of the primary
+-- key, and timelines for whole portfolios or districts can be summed from
+-- this instead of the raw tables.
+
+DROP TABLE IF EXISTS wow_indicator_monthly_temporary;
+
+CREATE TABLE wow_indicator_monthly_temporary AS
+  WITH hpdviolations AS (
+    SELECT
+      bbl,
+      TO_CHAR(COALESCE(inspectiondate, novissueddate), 'YYYY-MM') AS month,
+      COUNT(*) FILTER (WHERE class = 'A') AS hpdviolations_class_a,
+      COUNT(*) FILTER (WHERE class = 'B') AS hpdviolations_class_b,
+      COUNT(*) FILTER (WHERE class = 'C') AS hpdviolations_class_c,
+      COUNT(*) FILTER (WHERE class = 'I') AS hpdviolations_class_i,
+      COUNT(*) FILTER (WHERE class IS NOT NULL) AS hpdviolations_total
+    FROM hpd_violations
+    WHERE COALESCE(inspectiondate, novissueddate) >= '2010-01-01'
+    GROUP BY bbl, month
+  ),
+
+  hpdcomplaints AS (
+    SELECT
+      bbl,
+      TO_CHAR(receiveddate, 'YYYY-MM') AS month,
+      COUNT(*) FILTER (WHERE type = ANY('{IMMEDIATE EMERGENCY,HAZARDOUS,EMERGENCY}')) AS hpdcomplaints_emergency,
+      COUNT(*) FILTER (WHERE type = ANY('{REFERRAL,NON EMERGENCY}')) AS hpdcomplaints_nonemergency,
+      COUNT(*) FILTER (WHERE type IS NOT NULL) AS hpdcomplaints_total
+    FROM hpd_complaints_and_problems
+    WHERE receiveddate >= '2010-01-01'
+    GROUP BY bbl, month
+  ),
+
+  dobpermits AS (
+    SELECT
+      bbl,
+      TO_CHAR(prefilingdate, 'YYYY-MM') AS month,
+      COUNT(*) FILTER (WHERE jobtype IS NOT NULL) AS dobpermits_total
+    FROM dobjobs
+    WHERE prefilingdate >= '2010-01-01'
+    GROUP BY bbl, month
+  ),
+
+  regulardobviolations AS (
+    SELECT
+      bbl,
+      TO_CHAR(issuedate, 'YYYY-MM') AS month,
+      COUNT(*) FILTER (WHERE violationtypecode IS NOT NULL) AS dobviolations_regular
+    FROM dob_violations
+    WHERE issuedate >= '2010-01-01'
+    GROUP BY bbl, month
+  ),
+
+  ecbviolations AS (
+    SELECT
+      bbl,
+      TO_CHAR(issuedate, 'YYYY-MM') AS month,
+      COUNT(*) FILTER (WHERE severity IS NOT NULL) AS dobviolations_ecb
+    FROM ecb_violations
+    WHERE issuedate >= '2010-01-01'
+    GROUP BY bbl, month
+  ),
+
+  ocaevictions AS (
+    SELECT
+      bbl,
+      month,
+      SUM(evictionfilings) AS evictionfilings_total
+    FROM oca_evictions_monthly
+    WHERE month >= '2017-01'
+    GROUP BY bbl, month
+  ),
+
+  rentstabunits AS (
+    SELECT
+      ucbbl AS bbl,
+      rs.month,
+      MAX(rs.units) AS rentstabilizedunits_total
+    FROM rentstab
+    FULL JOIN rentstab_v2 USING(ucbbl),
+    LATERAL (
+      VALUES
+        ('2007-01', uc2007), ('2008-01', uc2008), ('2009-01', uc2009),
+        ('2010-01', uc2010), ('2011-01', uc2011), ('2012-01', uc2012),
+        ('2013-01', uc2013), ('2014-01', uc2014), ('2015-01', uc2015),
+        ('2016-01', uc2016), ('2017-01', uc2017), ('2018-01', uc2018),
+        ('2019-01', uc2019), ('2020-01', uc2020), ('2021-01', uc2021),
+        ('2022-01', uc2022), ('2023-01', uc2023), ('2024-01', uc2024)
+    ) AS rs(month, units)
+    WHERE ucbbl IS NOT NULL AND rs.units IS NOT NULL
+    GROUP BY ucbbl, rs.month
+  )
+
+  SELECT
+    bbl::char(10) AS bbl,
+    month::text AS month,
+    COALESCE(hpdviolations_class_a, 0)::int AS hpdviolations_class_a,
+    COALESCE(hpdviolations_class_b, 0)::int AS hpdviolations_class_b,
+    COALESCE(hpdviolations_class_c, 0)::int AS hpdviolations_class_c,
+    COALESCE(hpdviolations_class_i, 0)::int AS hpdviolations_class_i,
+    COALESCE(hpdviolations_total, 0)::int AS hpdviolations_total,
+    COALESCE(hpdcomplaints_emergency, 0)::int AS hpdcomplaints_emergency,
+    COALESCE(hpdcomplaints_nonemergency, 0)::int AS hpdcomplaints_nonemergency,
+    COALESCE(hpdcomplaints_total, 0)::int AS hpdcomplaints_total,
+    COALESCE(dobpermits_total, 0)::int AS dobpermits_total,
+    COALESCE(dobviolations_regular, 0)::int AS dobviolations_regular,
+    COALESCE(dobviolations_ecb, 0)::int AS dobviolations_ecb,
+    (COALESCE(dobviolations_regular, 0) + COALESCE(dobviolations_ecb, 0))::int AS dobviolations_total,
+    COALESCE(evictionfilings_total, 0)::int AS evictionfilings_total,
+    COALESCE(rentstabilizedunits_total, 0)::int AS rentstabilizedunits_total
+  FROM hpdviolations
+  FULL JOIN hpdcomplaints USING (bbl, month)
+  FULL JOIN dobpermits USING (bbl, month)
+  FULL JOIN regulardobviolations USING (bbl, month)
+  FULL JOIN ecbviolations USING (bbl, month)
+  FULL JOIN ocaevictions USING (bbl, month)
+  FULL JOIN rentstabunits USING (bbl, month)
+  WHERE bbl IS NOT NULL AND month IS NOT NULL;
+
+DROP TABLE IF EXISTS wow_indicator_monthly;
+ALTER TABLE wow_indicator_monthly_temporary RENAME TO wow_indicator_monthly;
+
+ALTER TABLE wow_indicator_monthly ADD PRIMARY KEY (bbl, month);
+
+ANALYZE wow_indicator_monthly;
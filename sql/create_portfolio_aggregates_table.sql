@@ -0,0 +1,44 @@
+-- Precompute the results of get_agg_info_from_bbl() for every registration, so
+-- that the aggregate API endpoints can look them up instead of re-running the
+-- association search and aggregation on every request.
+--
+-- get_agg_info_from_bbl() aggregates over the buildings of the registrations
+-- that wow_assoc_regids associates with the BBL's registration. Registrations
+-- that are associated with the same set of registrations therefore have the
+-- same aggregates, so we only run it once for each distinct set, rather than
+-- once for every registration in a large portfolio.
+
+DROP TABLE IF EXISTS wow_portfolio_aggregates_temporary;
+
+CREATE TABLE wow_portfolio_aggregates_temporary AS
+  WITH regs AS (
+    SELECT registrationid, min(bbl) AS bbl
+    FROM wow_bldgs
+    WHERE registrationid IS NOT NULL
+    GROUP BY registrationid
+  ),
+  assoc_sets AS (
+    SELECT
+      regs.registrationid,
+      regs.bbl,
+      array_agg(assoc.assocregid ORDER BY assoc.assocregid) AS assocregids
+    FROM regs
+    LEFT JOIN wow_assoc_regids AS assoc USING (registrationid)
+    GROUP BY regs.registrationid, regs.bbl
+  ),
+  groups AS (
+    SELECT assocregids, min(bbl) AS bbl
+    FROM assoc_sets
+    GROUP BY assocregids
+  )
+  SELECT
+    assoc_sets.registrationid,
+    agg.*
+  FROM groups
+  CROSS JOIN LATERAL get_agg_info_from_bbl(groups.bbl) AS agg
+  INNER JOIN assoc_sets ON assoc_sets.assocregids = groups.assocregids;
+
+DROP TABLE IF EXISTS wow_portfolio_aggregates;
+ALTER TABLE wow_portfolio_aggregates_temporary RENAME TO wow_portfolio_aggregates;
+
+CREATE UNIQUE INDEX ON wow_portfolio_aggregates (registrationid);
@@ -9,3 +9,16 @@ CREATE TABLE wow_portfolios (
 CREATE INDEX ON wow_portfolios (orig_id);
 CREATE INDEX ON wow_portfolios USING GIN(bbls);
 CREATE INDEX ON wow_portfolios USING GIN(landlord_names);
+
+-- One row per BBL in each portfolio, so that the portfolio a BBL belongs
+-- to (and its size) can be found with a single index lookup instead of
+-- scanning every portfolio's array of BBLs. This is populated along with
+-- wow_portfolios by portfoliograph/table.py.
+DROP TABLE if exists wow_bbl_portfolio;
+CREATE TABLE wow_bbl_portfolio (
+    bbl char(10) NOT NULL,
+    portfolio_id int NOT NULL,
+    portfolio_size int NOT NULL,
+    PRIMARY KEY (bbl, portfolio_id)
+);
+CREATE INDEX ON wow_bbl_portfolio (portfolio_id);
@@ -0,0 +1,9 @@
+-- Records that a database build has finished. The API server uses the
+-- latest version here to know when its cached responses are stale.
+CREATE TABLE IF NOT EXISTS wow_build_info (
+    version TEXT PRIMARY KEY,
+    finished_at TIMESTAMPTZ NOT NULL
+);
+
+INSERT INTO wow_build_info (version, finished_at)
+VALUES (to_char(clock_timestamp(), 'YYYYMMDDHH24MISSUS'), clock_timestamp());
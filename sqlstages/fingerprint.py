@@ -0,0 +1,237 @@
+import hashlib
+import json
+import re
+import threading
+from typing import Any, Dict, Iterable, Mapping, Optional, Sequence, Set
+from psycopg2 import sql
+
+
+# The table that records the fingerprint of the inputs each stage of the
+# database build last ran with. It's created by
+# `sql/create_build_stages_table.sql`.
+BUILD_STAGES_TABLE = "wow_build_stages"
+
+
+# Matches the SQL functions whose results depend on when they're run.
+# Stages whose code uses them have to be run again on a new day even if
+# nothing they read has changed.
+DATE_FUNCTIONS_RE = re.compile(
+    r"\b(current_date|current_timestamp|localtimestamp|"
+    r"(clock|statement|transaction)_timestamp)\b|\bnow\s*\(",
+    re.IGNORECASE,
+)
+
+
+def does_code_use_date(code: Sequence[str]) -> bool:
+    return any(DATE_FUNCTIONS_RE.search(text) for text in code)
+
+
+def hash_text(*texts: str) -> str:
+    sha = hashlib.sha256()
+    for text in texts:
+        sha.update(hashlib.sha256(text.encode("utf-8")).digest())
+    return sha.hexdigest()
+
+
+class Fingerprinter:
+    """
+    Computes fingerprints of the inputs of the stages of a database build:
+    the text of the code each stage runs, and the row counts, `pg_class`
+    oids and relfilenodes, and `dataset_tracker` update times of the tables
+    it reads, along with the fingerprints of the stages that wrote them.
+
+    The oids and relfilenodes change whenever a table is dropped and
+    re-created or truncated, so reloading a table is noticed even if it
+    ends up with as many rows as before. Changes made to a table's rows in
+    place aren't, though, so anything that does that outside of the build
+    should be a stage of its own.
+
+    The fingerprints of stages whose code depends on the current date,
+    e.g. to count the violations issued in the last week, also include the
+    date of the build.
+
+    `table_datasets` maps the names of NYCDB tables to their datasets, and
+    `build_outputs` is the set of tables (and functions) written during the
+    build, which can't be fingerprinted until the stages that write them
+    have finished. Everything else is only fingerprinted once. `build_date`
+    defaults to the database's current date.
+    """
+
+    def __init__(
+        self,
+        table_datasets: Mapping[str, str],
+        build_outputs: Set[str],
+        build_date: Optional[str] = None,
+    ):
+        self.table_datasets = table_datasets
+        self.build_outputs = build_outputs
+        self._build_date = build_date
+        self._dataset_updates: Optional[Dict[str, str]] = None
+        self._table_fingerprints: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+
+    def get_dataset_updates(self, cur) -> Dict[str, str]:
+        with self._lock:
+            if self._dataset_updates is not None:
+                return self._dataset_updates
+        updates: Dict[str, str] = {}
+        cur.execute("SELECT to_regclass('public.dataset_tracker')")
+        if cur.fetchone()[0] is not None:
+            cur.execute("SELECT key, value::text FROM dataset_tracker")
+            updates = dict(cur.fetchall())
+        with self._lock:
+            self._dataset_updates = updates
+        return updates
+
+    def get_build_date(self, cur) -> str:
+        with self._lock:
+            if self._build_date is not None:
+                return self._build_date
+        cur.execute("SELECT CURRENT_DATE::text")
+        build_date = cur.fetchone()[0]
+        with self._lock:
+            # Every stage of a build that runs past midnight should still
+            # agree on its date.
+            if self._build_date is None:
+                self._build_date = build_date
+            return self._build_date
+
+    def get_table_fingerprint(self, cur, name: str, stage: str) -> Dict[str, Any]:
+        """
+        Return a fingerprint of the given table (or function) read by the
+        given stage.
+        """
+
+        with self._lock:
+            if name in self._table_fingerprints:
+                return self._table_fingerprints[name]
+
+        rows: Optional[int] = None
+        cur.execute(
+            "SELECT oid, relfilenode FROM pg_class WHERE oid = to_regclass(%s)",
+            [f"public.{name}"],
+        )
+        relation = cur.fetchone()
+        if relation is not None:
+            cur.execute(sql.SQL("SELECT count(*) FROM {}").format(sql.Identifier(name)))
+            rows = cur.fetchone()[0]
+        cur.execute(
+            sql.SQL(
+                "SELECT fingerprint FROM {} WHERE %s = ANY(writes) AND name <> %s "
+                "ORDER BY name"
+            ).format(sql.Identifier(BUILD_STAGES_TABLE)),
+            [name, stage],
+        )
+        dataset = self.table_datasets.get(name)
+        fingerprint = {
+            "rows": rows,
+            "relation": list(relation) if relation is not None else None,
+            "dataset_updated": self.get_dataset_updates(cur).get(dataset or ""),
+            "stages": [row[0] for row in cur.fetchall()],
+        }
+        if name not in self.build_outputs:
+            with self._lock:
+                self._table_fingerprints[name] = fingerprint
+        return fingerprint
+
+    def get_stage_fingerprint(
+        self,
+        cur,
+        stage: str,
+        code: Sequence[str],
+        reads: Iterable[str],
+        populates: Iterable[str] = (),
+        sources: Sequence[str] = (),
+    ) -> str:
+        """
+        Return a fingerprint of the inputs of the given stage, which runs
+        the given code and reads the given tables.
+
+        Stages that fill in tables created by another stage should pass
+        them as `populates`, so that they're run again if the tables are
+        re-created. Stages that load data from outside the database should
+        pass strings identifying the versions of it as `sources`, e.g. the
+        ETags of S3 objects.
+        """
+
+        inputs = {
+            "code": hash_text(*code),
+            "sources": list(sources),
+            "date": self.get_build_date(cur) if does_code_use_date(code) else None,
+            "reads": {
+                name: self.get_table_fingerprint(cur, name, stage)
+                for name in sorted(reads)
+            },
+            "populates": {name: get_table_oid(cur, name) for name in sorted(populates)},
+        }
+        return hash_text(json.dumps(inputs, sort_keys=True))
+
+
+def get_table_oid(cur, name: str) -> Optional[int]:
+    cur.execute("SELECT to_regclass(%s)::oid", [f"public.{name}"])
+    return cur.fetchone()[0]
+
+
+def do_outputs_exist(cur, names: Iterable[str]) -> bool:
+    """
+    Return whether all the given tables or functions exist.
+    """
+
+    for name in names:
+        cur.execute(
+            "SELECT to_regclass(%s) IS NOT NULL "
+            "OR EXISTS (SELECT 1 FROM pg_proc WHERE proname = %s)",
+            [f"public.{name}", name],
+        )
+        if not cur.fetchone()[0]:
+            return False
+    return True
+
+
+def get_stored_fingerprint(cur, stage: str) -> Optional[str]:
+    cur.execute(
+        sql.SQL("SELECT fingerprint FROM {} WHERE name = %s").format(
+            sql.Identifier(BUILD_STAGES_TABLE)
+        ),
+        [stage],
+    )
+    row = cur.fetchone()
+    return row[0] if row else None
+
+
+def is_stage_up_to_date(
+    cur, stage: str, fingerprint: str, writes: Iterable[str]
+) -> bool:
+    """
+    Return whether the given stage last ran with inputs that have the given
+    fingerprint, and everything it writes still exists.
+    """
+
+    return get_stored_fingerprint(cur, stage) == fingerprint and do_outputs_exist(
+        cur, writes
+    )
+
+
+def store_fingerprint(cur, stage: str, fingerprint: str, writes: Iterable[str]) -> None:
+    cur.execute(
+        sql.SQL(
+            """
+            INSERT INTO {} (name, fingerprint, writes, finished_at)
+            VALUES (%s, %s, %s, clock_timestamp())
+            ON CONFLICT (name) DO UPDATE SET
+                fingerprint = EXCLUDED.fingerprint,
+                writes = EXCLUDED.writes,
+                finished_at = EXCLUDED.finished_at
+            """
+        ).format(sql.Identifier(BUILD_STAGES_TABLE)),
+        [stage, fingerprint, sorted(writes)],
+    )
+
+
+def forget_fingerprint(cur, stage: str) -> None:
+    cur.execute(
+        sql.SQL("DELETE FROM {} WHERE name = %s").format(
+            sql.Identifier(BUILD_STAGES_TABLE)
+        ),
+        [stage],
+    )
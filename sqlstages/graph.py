@@ -0,0 +1,269 @@
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    FrozenSet,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Set,
+)
+
+
+# A map from the name of each SQL script to the names of the scripts it
+# depends on.
+Graph = Dict[str, Set[str]]
+
+
+class CycleError(Exception):
+    pass
+
+
+class SqlScript(NamedTuple):
+    path: Path
+
+    # The tables (and functions) the script reads and writes, or None if
+    # they haven't been declared.
+    reads: Optional[FrozenSet[str]]
+    writes: Optional[FrozenSet[str]]
+
+    @property
+    def name(self) -> str:
+        return self.path.name
+
+    @property
+    def is_declared(self) -> bool:
+        return self.reads is not None and self.writes is not None
+
+
+class Timing(NamedTuple):
+    # When the script started and finished, in seconds since the graph
+    # started running.
+    started_at: float
+    finished_at: float
+
+    @property
+    def seconds(self) -> float:
+        return self.finished_at - self.started_at
+
+
+def get_sql_scripts(
+    paths: Sequence[Path], dependencies: Mapping[str, Mapping[str, List[str]]]
+) -> List[SqlScript]:
+    """
+    Return the given SQL scripts, along with the tables each reads and
+    writes according to the given `sql_dependencies` section of
+    who-owns-what.yml.
+    """
+
+    scripts: List[SqlScript] = []
+    for path in paths:
+        deps = dependencies.get(path.name)
+        if deps is None:
+            scripts.append(SqlScript(path, None, None))
+        else:
+            scripts.append(
+                SqlScript(
+                    path,
+                    reads=frozenset(deps.get("reads") or []),
+                    writes=frozenset(deps.get("writes") or []),
+                )
+            )
+    return scripts
+
+
+def build_graph(scripts: Sequence[SqlScript]) -> Graph:
+    """
+    Return the graph of which of the given scripts depend on which: a
+    script depends on the scripts that write the tables it reads. Scripts
+    that haven't declared their tables depend on every script before them,
+    and every script after them depends on them.
+
+    Raises a ValueError if two scripts write the same table, and a
+    CycleError if the scripts depend on each other in a cycle.
+    """
+
+    writers: Dict[str, str] = {}
+    for script in scripts:
+        for table in script.writes or []:
+            if table in writers:
+                raise ValueError(
+                    f"{table} is written by both {writers[table]} and {script.name}"
+                )
+            writers[table] = script.name
+
+    graph: Graph = {}
+    for i, script in enumerate(scripts):
+        deps = graph[script.name] = set()
+        for earlier in scripts[:i]:
+            if not (script.is_declared and earlier.is_declared):
+                deps.add(earlier.name)
+        for table in script.reads or []:
+            if table in writers and writers[table] != script.name:
+                deps.add(writers[table])
+
+    get_topological_order(graph)
+    return graph
+
+
+def get_topological_order(graph: Graph) -> List[str]:
+    """
+    Return the scripts in the given graph in an order that they can be run
+    one at a time in, keeping them in their original order where possible.
+
+    Raises a CycleError if the scripts depend on each other in a cycle.
+    """
+
+    order: List[str] = []
+    visited: Set[str] = set()
+    path: List[str] = []
+
+    def visit(name: str) -> None:
+        if name in path:
+            cycle = path[path.index(name) :] + [name]
+            raise CycleError(f"SQL scripts depend on each other: {' -> '.join(cycle)}")
+        if name in visited:
+            return
+        path.append(name)
+        for dep in sorted(graph[name], key=list(graph).index):
+            visit(dep)
+        path.pop()
+        visited.add(name)
+        order.append(name)
+
+    for name in graph:
+        visit(name)
+    return order
+
+
+def run_graph(
+    graph: Graph,
+    run: Callable[[str], None],
+    jobs: int = 1,
+    on_failure: Optional[Callable[[], None]] = None,
+) -> Dict[str, Timing]:
+    """
+    Call `run` with the name of each script in the given graph once all
+    the scripts it depends on have finished, running up to `jobs` at a
+    time, and return when each one started and finished.
+
+    If a script fails, no more scripts are started, `on_failure` is called
+    so that the running ones can be stopped, and once they're finished the
+    first exception is re-raised.
+    """
+
+    order = get_topological_order(graph)
+    timings: Dict[str, Timing] = {}
+    started_at = time.monotonic()
+
+    def timed_run(name: str) -> None:
+        script_started_at = time.monotonic() - started_at
+        run(name)
+        timings[name] = Timing(script_started_at, time.monotonic() - started_at)
+
+    pending = list(order)
+    running: Dict[Future, str] = {}
+    error: Optional[BaseException] = None
+    with ThreadPoolExecutor(max_workers=max(jobs, 1)) as executor:
+        while pending or running:
+            if error is None:
+                for name in [n for n in pending if graph[n].issubset(timings)]:
+                    if len(running) >= max(jobs, 1):
+                        break
+                    pending.remove(name)
+                    running[executor.submit(timed_run, name)] = name
+            if not running:
+                break
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                del running[future]
+                if future.exception() is not None and error is None:
+                    error = future.exception()
+                    if on_failure is not None:
+                        on_failure()
+    if error is not None:
+        raise error
+    return timings
+
+
+def get_critical_path(graph: Graph, timings: Mapping[str, Timing]) -> List[str]:
+    """
+    Return the chain of scripts that determined how long the given run of
+    the graph took: the last script to finish, the dependency it waited
+    for the longest, and so on.
+    """
+
+    if not timings:
+        return []
+    name = max(timings, key=lambda n: timings[n].finished_at)
+    path = [name]
+    while graph[name]:
+        name = max(graph[name], key=lambda n: timings[n].finished_at)
+        path.append(name)
+    return path[::-1]
+
+
+def format_timing_report(graph: Graph, timings: Mapping[str, Timing]) -> str:
+    """
+    Return a report of how long each script in the given run of the graph
+    took, marking the ones on its critical path with a `*`.
+    """
+
+    critical_path = get_critical_path(graph, timings)
+    wall_seconds = max((t.finished_at for t in timings.values()), default=0.0)
+    total_seconds = sum(t.seconds for t in timings.values())
+    lines = []
+    for name in sorted(timings, key=lambda n: timings[n].started_at):
+        timing = timings[name]
+        mark = "*" if name in critical_path else " "
+        lines.append(
+            f" {mark} {name}: {timing.seconds:.1f}s "
+            f"(started at {timing.started_at:.1f}s)"
+        )
+    lines.append(
+        f"Ran {len(timings)} scripts in {wall_seconds:.1f}s "
+        f"({total_seconds:.1f}s of work). Critical path: " + " -> ".join(critical_path)
+    )
+    return "\n".join(lines)
+
+
+class ConnectionPerThread:
+    """
+    Lazily opens a database connection for each thread that asks for one,
+    so that scripts running at the same time don't share a connection.
+    """
+
+    def __init__(self, connect: Callable[[], Any]):
+        self.connect = connect
+        self.connections: List[Any] = []
+        self._local = threading.local()
+        self._lock = threading.Lock()
+
+    def get(self) -> Any:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self.connect()
+            with self._lock:
+                self.connections.append(conn)
+        return conn
+
+    def cancel_all(self) -> None:
+        """
+        Cancel whatever the connections are running.
+        """
+
+        with self._lock:
+            for conn in self.connections:
+                conn.cancel()
+
+    def close_all(self) -> None:
+        with self._lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections = []
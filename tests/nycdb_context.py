@@ -104,6 +104,7 @@ class NycdbContext:
         with self.get_cursor() as cur:
             for sqlpath in all_sql:
                 cur.execute(sqlpath)
+            dbtool.populate_districts_geojson_encoded_table(cur)
 
 
 def nycdb_ctx(get_cursor):
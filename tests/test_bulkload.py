@@ -0,0 +1,115 @@
+from io import BytesIO
+import gzip
+from moto import mock_aws
+import pytest
+
+from bulkload.csvcopy import LoadStats, ProgressReader, copy_csv
+from bulkload.s3stream import copy_s3_objects, get_s3_client, open_s3_objects
+
+
+CSV = b'"bbl","name"\n1234567890,"Boop"\n1098765432,\n'
+
+BIG_CSV = CSV + b'1234567890,"Boop"\n' * 1000
+
+
+class TestProgressReader:
+    def test_it_counts_bytes_and_lines(self):
+        reports = []
+        reader = ProgressReader(BytesIO(CSV), lambda *args: reports.append(args), 0)
+        while reader.read(10):
+            pass
+        assert (reader.bytes, reader.lines) == (len(CSV), 3)
+        assert reports[-1] == (len(CSV), 3)
+
+
+def test_load_stats_report_rows_per_second():
+    stats = LoadStats(table="boop", rows=1000, bytes=2_000_000, seconds=2.0)
+    assert stats.rows_per_second == 500
+    assert str(stats) == "boop: 1,000 rows (2.0 MB) in 2.0s, 500 rows/s"
+
+
+class TestCopyCsv:
+    @pytest.fixture(autouse=True)
+    def setup_fixture(self, db):
+        with db.cursor() as cur:
+            cur.execute(
+                "DROP TABLE IF EXISTS bulkload_test;"
+                "CREATE TABLE bulkload_test (bbl char(10), name text);"
+            )
+        self.db = db
+
+    def query_all(self):
+        with self.db.cursor() as cur:
+            cur.execute("SELECT * FROM bulkload_test ORDER BY bbl")
+            return [tuple(row) for row in cur.fetchall()]
+
+    def test_it_loads_empty_values_as_empty_strings(self):
+        with self.db.cursor() as cur:
+            stats = copy_csv(cur, "bulkload_test", BytesIO(CSV))
+        assert stats.rows == 2
+        assert stats.bytes == len(CSV)
+        assert self.query_all() == [
+            ("1098765432", ""),
+            ("1234567890", "Boop"),
+        ]
+
+    def test_it_validates_staged_rows(self):
+        def validate(cur, table):
+            cur.execute(f"SELECT COUNT(*) FROM {table} WHERE name = ''")
+            if cur.fetchone()[0]:
+                raise ValueError("Rows without names!")
+
+        with pytest.raises(ValueError, match="Rows without names"):
+            with self.db.cursor() as cur:
+                copy_csv(cur, "bulkload_test", BytesIO(CSV), validate=validate)
+        assert self.query_all() == []
+
+        with self.db.cursor() as cur:
+            copy_csv(cur, "bulkload_test", BytesIO(CSV[:-12]), validate=validate)
+        assert self.query_all() == [("1234567890", "Boop")]
+
+
+class TestS3Streaming:
+    @pytest.fixture(autouse=True)
+    def setup_fixture(self, monkeypatch):
+        monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+        with mock_aws():
+            self.s3 = get_s3_client("key", "secret")
+            self.s3.create_bucket(Bucket="boop")
+            self.s3.put_object(Bucket="boop", Key="public/a.csv", Body=CSV)
+            self.s3.put_object(
+                Bucket="boop", Key="public/b.csv.gz", Body=gzip.compress(BIG_CSV)
+            )
+            yield
+
+    def test_it_streams_objects_concurrently(self):
+        keys = ["public/a.csv", "public/b.csv.gz"]
+        with open_s3_objects(self.s3, "boop", keys, chunk_size=100) as streams:
+            contents = {key: stream.read(-1) for key, stream in streams}
+        assert contents == {"public/a.csv": CSV, "public/b.csv.gz": BIG_CSV}
+
+    def test_it_reads_streams_in_any_size(self):
+        with open_s3_objects(self.s3, "boop", ["public/b.csv.gz"], chunk_size=7) as [
+            (_, stream)
+        ]:
+            chunks = iter(lambda: stream.read(10), b"")
+            assert b"".join(chunks) == BIG_CSV
+
+    def test_it_reraises_download_errors(self):
+        with open_s3_objects(self.s3, "boop", ["nope.csv"]) as [(_, stream)]:
+            with pytest.raises(self.s3.exceptions.NoSuchKey):
+                stream.read(10)
+
+    def test_it_stops_downloads_when_closed_early(self):
+        keys = ["public/b.csv.gz"] * 3
+        with open_s3_objects(
+            self.s3, "boop", keys, chunk_size=1, buffered_chunks=1
+        ) as streams:
+            streams[0][1].read(10)
+
+    def test_it_copies_objects_into_tables(self, db):
+        with db.cursor() as cur:
+            cur.execute("DROP TABLE IF EXISTS b; CREATE TABLE b (bbl text, name text);")
+            [stats] = copy_s3_objects(cur, self.s3, "boop", ["public/b.csv.gz"])
+            assert stats.table == "b"
+            assert stats.rows == 1002
@@ -0,0 +1,62 @@
+import threading
+import time
+from typing import List
+import pytest
+
+import dbtool
+
+
+class TestRunJobs:
+    def test_it_runs_each_job_once_and_times_it(self):
+        calls: List[str] = []
+        timings = dbtool.run_jobs(["a", "b", "a", "c"], calls.append, jobs=2)
+        assert sorted(calls) == ["a", "b", "c"]
+        assert sorted(timings) == ["a", "b", "c"]
+        assert all(seconds >= 0 for seconds in timings.values())
+
+    def test_it_runs_jobs_concurrently(self):
+        barrier = threading.Barrier(3, timeout=5)
+
+        def job(name):
+            barrier.wait()
+
+        dbtool.run_jobs(["a", "b", "c"], job, jobs=3)
+
+    def test_it_limits_concurrency(self):
+        lock = threading.Lock()
+        running = []
+        max_running = []
+
+        def job(name):
+            with lock:
+                running.append(name)
+                max_running.append(len(running))
+            time.sleep(0.01)
+            with lock:
+                running.remove(name)
+
+        dbtool.run_jobs([str(i) for i in range(8)], job, jobs=2)
+        assert max(max_running) == 2
+
+    def test_it_fails_fast(self):
+        stopped = threading.Event()
+        calls = []
+
+        def job(name):
+            calls.append(name)
+            if name == "bad":
+                raise ValueError("boop")
+            assert stopped.wait(timeout=5)
+
+        with pytest.raises(ValueError, match="boop"):
+            dbtool.run_jobs(
+                ["slow", "bad", "never"], job, jobs=2, on_failure=stopped.set
+            )
+        assert stopped.is_set()
+        assert "never" not in calls
+
+
+def test_get_dataset_dependencies_does_not_change_the_config():
+    deps = dbtool.get_dataset_dependencies(for_api=False)
+    dbtool.get_dataset_dependencies(for_api=True)
+    assert dbtool.get_dataset_dependencies(for_api=False) == deps
@@ -1,4 +1,6 @@
 from io import StringIO
+import gzip
+import hashlib
 import json
 import multiprocessing
 import os
@@ -6,6 +8,7 @@ from typing import List
 import networkx as nx
 from psycopg2.extras import DictCursor
 from unittest.mock import patch
+import brotli
 import freezegun
 import pytest
 import dbtool
@@ -51,7 +54,7 @@ from portfoliograph.table import (
     populate_portfolios_table,
     export_portfolios_table_json,
 )
-from ocaevictions.table import OcaConfig, populate_oca_tables
+from ocaevictions.table import OcaConfig, get_oca_source_versions, populate_oca_tables
 
 # This test suite defines two landlords:
 #
@@ -156,6 +159,28 @@ UNRELATED_CONTACT = HpdContacts(
 
 
 class TestOcaTableBuild:
+    def make_config(self, is_testing: bool) -> OcaConfig:
+        return OcaConfig(
+            sql_pre_files=dbtool.WOW_YML["oca_pre_sql"],
+            sql_post_files=dbtool.WOW_YML["oca_post_sql"],
+            sql_dir=dbtool.SQL_DIR,
+            data_dir=dbtool.ROOT_DIR / "tests" / "data",
+            test_dir=dbtool.ROOT_DIR / "tests" / "data",
+            aws_key=None,
+            aws_secret=None,
+            s3_bucket=None,
+            s3_objects=dbtool.WOW_YML["oca_s3_objects"],
+            is_testing=is_testing,
+        )
+
+    def test_source_versions_hash_the_test_files(self):
+        versions = get_oca_source_versions(self.make_config(is_testing=True))
+        assert len(versions) == len(dbtool.WOW_YML["oca_s3_objects"])
+        assert versions == get_oca_source_versions(self.make_config(is_testing=True))
+
+    def test_there_are_no_source_versions_without_creds(self):
+        assert get_oca_source_versions(self.make_config(is_testing=False)) == []
+
     def test_oca_tables_empty_if_no_creds(self, db, capsys):
 
         config = OcaConfig(
@@ -318,6 +343,64 @@ class TestSQL:
         assert funky["streetname"] == "FUNKY STREET"
         assert funky["businessaddrs"] == ["5 BESPIN AVENUE 11231"]
 
+    def test_assoc_regids_table_works(self):
+        r = self.query_all(
+            f"""SELECT assocbldgs.bbl FROM wow_assoc_regids AS assoc
+                INNER JOIN wow_bldgs AS bldgs USING (registrationid)
+                INNER JOIN wow_bldgs AS assocbldgs
+                    ON assocbldgs.registrationid = assoc.assocregid
+                WHERE bldgs.bbl = '{MONKEY_BBL}'"""
+        )
+        assert {row["bbl"] for row in r} == {FUNKY_BBL, MONKEY_BBL, SPUNKY_BBL}
+
+    def test_portfolio_aggregates_table_matches_agg_function(self):
+        for bbl in [FUNKY_BBL, MONKEY_BBL, SPUNKY_BBL, UNRELATED_BBL]:
+            expected = self.query_one(f"SELECT * FROM get_agg_info_from_bbl('{bbl}')")
+            actual = self.query_one(
+                f"""SELECT agg.* FROM wow_portfolio_aggregates AS agg
+                    INNER JOIN wow_bldgs USING (registrationid)
+                    WHERE bbl = '{bbl}'"""
+            )
+            assert actual.pop("registrationid") is not None
+            assert actual == expected
+
+    def test_portfolio_aggregates_table_has_every_registration(self):
+        r = self.query_one(
+            """SELECT
+                (SELECT COUNT(DISTINCT registrationid) FROM wow_bldgs) AS regs,
+                (SELECT COUNT(*) FROM wow_portfolio_aggregates) AS aggs"""
+        )
+        assert r["aggs"] == r["regs"]
+
+    def test_districts_geojson_encoded_table_matches_geojson(self):
+        for row in self.query_all("SELECT * FROM wow_districts_geojson_encoded"):
+            identity = bytes(row["identity"])
+            assert gzip.decompress(bytes(row["gzip"])) == identity
+            assert brotli.decompress(bytes(row["br"])) == identity
+            assert row["content_hash"] == hashlib.sha256(identity).hexdigest()[:16]
+            [result] = json.loads(identity)["result"]
+            assert result["value"] == row["district_type"]
+
+    def test_indicator_monthly_table_matches_raw_tables(self):
+        r = self.query_one(
+            """SELECT
+                (SELECT COUNT(*) FROM hpd_violations
+                 WHERE class IS NOT NULL
+                 AND COALESCE(inspectiondate, novissueddate) >= '2010-01-01'
+                ) AS hpdviolations,
+                (SELECT COUNT(*) FROM dobjobs
+                 WHERE jobtype IS NOT NULL AND prefilingdate >= '2010-01-01'
+                ) AS dobpermits,
+                (SELECT COALESCE(SUM(hpdviolations_total), 0)
+                 FROM wow_indicator_monthly
+                ) AS monthly_hpdviolations,
+                (SELECT COALESCE(SUM(dobpermits_total), 0)
+                 FROM wow_indicator_monthly
+                ) AS monthly_dobpermits"""
+        )
+        assert r["monthly_hpdviolations"] == r["hpdviolations"]
+        assert r["monthly_dobpermits"] == r["dobpermits"]
+
     def test_hpd_registrations_with_contacts_is_populated(self):
         r = self.query_one(
             f"SELECT * FROM hpd_registrations_with_contacts WHERE bbl='{FUNKY_BBL}'"
@@ -457,6 +540,18 @@ class TestSQL:
         )
         assert set(r[0]) == {"LANDLORDO CALRISSIAN", "LOBOT JONES"}
 
+    def test_bbl_portfolio_table_works(self):
+        # This relies on the side effect of test_portfolio_graph_works
+        funky = self.query_one(
+            f"SELECT * FROM wow_bbl_portfolio WHERE bbl = '{FUNKY_BBL}'"
+        )
+        assert funky["portfolio_size"] == 2
+        r = self.query_all(
+            f"""SELECT bbl FROM wow_bbl_portfolio
+                WHERE portfolio_id = {funky['portfolio_id']}"""
+        )
+        assert {row["bbl"] for row in r} == {FUNKY_BBL, MONKEY_BBL}
+
     def test_getting_landlord_names_for_algolia_index(self):
         with self.db.connect() as conn:
             with freezegun.freeze_time("2018-01-01"):
@@ -0,0 +1,286 @@
+from pathlib import Path
+import threading
+from typing import List
+import pytest
+
+import dbtool
+from sqlstages.fingerprint import (
+    Fingerprinter,
+    does_code_use_date,
+    hash_text,
+    is_stage_up_to_date,
+    store_fingerprint,
+)
+from sqlstages.graph import (
+    CycleError,
+    Graph,
+    SqlScript,
+    Timing,
+    build_graph,
+    format_timing_report,
+    get_critical_path,
+    get_sql_scripts,
+    get_topological_order,
+    run_graph,
+)
+
+
+def script(name, reads=(), writes=()):
+    return SqlScript(Path(name), frozenset(reads), frozenset(writes))
+
+
+def undeclared(name):
+    return SqlScript(Path(name), None, None)
+
+
+class TestBuildGraph:
+    def test_scripts_depend_on_the_writers_of_what_they_read(self):
+        graph = build_graph(
+            [
+                script("a.sql", reads=["nycdb_table"], writes=["a"]),
+                script("b.sql", reads=["nycdb_table"], writes=["b"]),
+                script("c.sql", reads=["a", "b"], writes=["c"]),
+            ]
+        )
+        assert graph == {"a.sql": set(), "b.sql": set(), "c.sql": {"a.sql", "b.sql"}}
+
+    def test_order_only_matters_for_undeclared_scripts(self):
+        graph = build_graph(
+            [
+                undeclared("x.sql"),
+                script("b.sql", reads=["a"]),
+                script("a.sql", writes=["a"]),
+                undeclared("y.sql"),
+            ]
+        )
+        assert graph == {
+            "x.sql": set(),
+            "b.sql": {"x.sql", "a.sql"},
+            "a.sql": {"x.sql"},
+            "y.sql": {"x.sql", "b.sql", "a.sql"},
+        }
+
+    def test_it_raises_on_cycles(self):
+        with pytest.raises(CycleError, match="a.sql -> b.sql -> a.sql"):
+            build_graph(
+                [
+                    script("a.sql", reads=["b"], writes=["a"]),
+                    script("b.sql", reads=["a"], writes=["b"]),
+                ]
+            )
+
+    def test_it_raises_on_tables_with_two_writers(self):
+        with pytest.raises(ValueError, match="a is written by both a.sql and b.sql"):
+            build_graph([script("a.sql", writes=["a"]), script("b.sql", writes=["a"])])
+
+
+def test_get_sql_scripts_works():
+    scripts = get_sql_scripts(
+        [Path("a.sql"), Path("b.sql")], {"a.sql": {"reads": ["x"], "writes": []}}
+    )
+    assert scripts == [script("a.sql", reads=["x"]), undeclared("b.sql")]
+
+
+def test_get_topological_order_keeps_the_original_order_where_possible():
+    graph: Graph = {"c": {"b"}, "a": set(), "b": set(), "d": set()}
+    assert get_topological_order(graph) == ["b", "c", "a", "d"]
+
+
+class TestRunGraph:
+    def test_it_runs_scripts_after_their_dependencies(self):
+        graph: Graph = {"a": set(), "b": {"a"}, "c": {"a"}, "d": {"b", "c"}}
+        order: List[str] = []
+        timings = run_graph(graph, order.append, jobs=4)
+        assert order[0] == "a"
+        assert set(order[1:3]) == {"b", "c"}
+        assert order[3] == "d"
+        assert timings["d"].started_at >= timings["b"].finished_at
+
+    def test_it_runs_independent_scripts_concurrently(self):
+        barrier = threading.Barrier(2, timeout=5)
+
+        def run(name):
+            if name != "c":
+                barrier.wait()
+
+        run_graph({"a": set(), "b": set(), "c": {"a", "b"}}, run, jobs=2)
+
+    def test_it_fails_fast(self):
+        stopped = threading.Event()
+        calls: List[str] = []
+
+        def run(name):
+            calls.append(name)
+            if name == "bad":
+                raise ValueError("boop")
+            assert stopped.wait(timeout=5)
+
+        with pytest.raises(ValueError, match="boop"):
+            run_graph(
+                {"slow": set(), "bad": set(), "after_bad": {"bad"}, "later": set()},
+                run,
+                jobs=2,
+                on_failure=stopped.set,
+            )
+        assert sorted(calls) == ["bad", "slow"]
+
+
+def test_critical_path_follows_the_slowest_dependencies():
+    graph: Graph = {"a": set(), "b": set(), "c": {"a", "b"}, "d": set()}
+    timings = {
+        "a": Timing(0, 1),
+        "b": Timing(0, 3),
+        "c": Timing(3, 4),
+        "d": Timing(0, 2),
+    }
+    assert get_critical_path(graph, timings) == ["b", "c"]
+    report = format_timing_report(graph, timings)
+    assert " * b: 3.0s (started at 0.0s)" in report
+    assert "   a: 1.0s (started at 0.0s)" in report
+    assert report.endswith(
+        "Ran 4 scripts in 4.0s (7.0s of work). Critical path: b -> c"
+    )
+
+
+@pytest.mark.parametrize("stage", ["pre", "post"])
+def test_wow_sql_dependencies_are_declared(stage):
+    paths = dbtool.get_sqlfile_paths(stage)
+    scripts = get_sql_scripts(paths, dbtool.WOW_YML["sql_dependencies"])
+    build_graph(scripts)
+    for s in scripts:
+        assert s.reads is not None and s.writes is not None, s.name
+        sql = s.path.read_text().lower()
+        for name in s.reads | s.writes:
+            assert name in sql, f"{s.name} doesn't mention {name}"
+
+
+def test_independent_wow_post_sql_does_not_wait():
+    scripts = get_sql_scripts(
+        dbtool.get_sqlfile_paths("post"), dbtool.WOW_YML["sql_dependencies"]
+    )
+    graph = build_graph(scripts)
+    assert graph["create_districts_geom.sql"] == set()
+    assert graph["create_indicators_table.sql"] == set()
+    assert graph["create_district_alert_scores_table.sql"] == {
+        "create_indicators_table.sql"
+    }
+
+
+def test_hash_text_works():
+    assert hash_text("a", "b") == hash_text("a", "b")
+    assert hash_text("a", "b") != hash_text("ab")
+
+
+def test_does_code_use_date_works():
+    assert does_code_use_date(["SELECT 1", "WHERE d > current_date - 7"])
+    assert does_code_use_date(["SELECT NOW ()"])
+    assert not does_code_use_date(["SELECT current_dates FROM boop"])
+
+
+def test_only_date_dependent_stages_change_with_the_build_date():
+    def fingerprint(code, build_date):
+        fingerprinter = Fingerprinter({}, set(), build_date=build_date)
+        return fingerprinter.get_stage_fingerprint(None, "stage.sql", [code], [])
+
+    code = "SELECT date_trunc('week', CURRENT_DATE)"
+    assert fingerprint(code, "2024-01-01") == fingerprint(code, "2024-01-01")
+    assert fingerprint(code, "2024-01-01") != fingerprint(code, "2024-01-08")
+    assert fingerprint("SELECT 1", "2024-01-01") == fingerprint(
+        "SELECT 1", "2024-01-08"
+    )
+
+
+class TestFingerprinter:
+    @pytest.fixture(autouse=True)
+    def setup_fixture(self, db):
+        with db.cursor() as cur:
+            cur.execute(dbtool.BUILD_STAGES_SQL.read_text())
+            cur.execute("TRUNCATE wow_build_stages")
+            cur.execute("DROP TABLE IF EXISTS boop, dataset_tracker")
+            cur.execute("CREATE TABLE boop (x int)")
+        self.db = db
+
+    def execute(self, sql: str) -> None:
+        with self.db.cursor() as cur:
+            cur.execute(sql)
+
+    def fingerprint(self, code="SELECT 1", **kwargs) -> str:
+        fingerprinter = Fingerprinter({"boop": "boops"}, build_outputs=set())
+        with self.db.cursor() as cur:
+            return fingerprinter.get_stage_fingerprint(
+                cur, "stage.sql", code=[code], reads=["boop"], **kwargs
+            )
+
+    def test_it_is_stable(self):
+        assert self.fingerprint() == self.fingerprint()
+
+    def test_it_changes_with_the_code(self):
+        assert self.fingerprint("SELECT 1") != self.fingerprint("SELECT 2")
+
+    def test_it_changes_with_row_counts(self):
+        before = self.fingerprint()
+        self.execute("INSERT INTO boop VALUES (1)")
+        assert self.fingerprint() != before
+
+    def test_it_changes_when_tables_are_reloaded_with_as_many_rows(self):
+        self.execute("INSERT INTO boop VALUES (1)")
+        before = self.fingerprint()
+        self.execute("DROP TABLE boop; CREATE TABLE boop (x int)")
+        self.execute("INSERT INTO boop VALUES (2)")
+        reloaded = self.fingerprint()
+        assert reloaded != before
+        self.execute("TRUNCATE boop; INSERT INTO boop VALUES (3)")
+        assert self.fingerprint() != reloaded
+
+    def test_it_changes_with_sources(self):
+        assert self.fingerprint(sources=["etag1"]) != self.fingerprint(
+            sources=["etag2"]
+        )
+
+    def test_it_changes_with_dataset_updates(self):
+        self.execute("CREATE TABLE dataset_tracker (key text, value text)")
+        self.execute("INSERT INTO dataset_tracker VALUES ('other', '2024-01-01')")
+        before = self.fingerprint()
+        self.execute("INSERT INTO dataset_tracker VALUES ('boops', '2024-01-01')")
+        assert self.fingerprint() != before
+
+    def test_it_changes_with_the_stages_that_wrote_its_reads(self):
+        before = self.fingerprint()
+        with self.db.cursor() as cur:
+            store_fingerprint(cur, "upstream.sql", "abc", ["boop"])
+            store_fingerprint(cur, "stage.sql", "def", ["boop"])
+        assert self.fingerprint() != before
+
+    def test_it_changes_when_populated_tables_are_recreated(self):
+        self.execute("CREATE TABLE IF NOT EXISTS blarg (x int)")
+        before = self.fingerprint(populates=["blarg"])
+        self.execute("INSERT INTO blarg VALUES (1)")
+        assert self.fingerprint(populates=["blarg"]) == before
+        self.execute("DROP TABLE blarg; CREATE TABLE blarg (x int)")
+        assert self.fingerprint(populates=["blarg"]) != before
+
+    def test_date_dependent_stages_are_not_skipped_on_a_new_day(self):
+        def fingerprint(build_date):
+            fingerprinter = Fingerprinter({}, set(), build_date=build_date)
+            with self.db.cursor() as cur:
+                return fingerprinter.get_stage_fingerprint(
+                    cur, "stage.sql", code=["SELECT CURRENT_DATE"], reads=["boop"]
+                )
+
+        with self.db.cursor() as cur:
+            store_fingerprint(cur, "stage.sql", fingerprint("2024-01-01"), ["boop"])
+            assert is_stage_up_to_date(
+                cur, "stage.sql", fingerprint("2024-01-01"), ["boop"]
+            )
+            assert not is_stage_up_to_date(
+                cur, "stage.sql", fingerprint("2024-01-02"), ["boop"]
+            )
+
+    def test_stages_are_up_to_date_if_their_outputs_exist(self):
+        with self.db.cursor() as cur:
+            assert not is_stage_up_to_date(cur, "stage.sql", "abc", ["boop"])
+            store_fingerprint(cur, "stage.sql", "abc", ["boop", "count"])
+            assert is_stage_up_to_date(cur, "stage.sql", "abc", ["boop", "count"])
+            assert not is_stage_up_to_date(cur, "stage.sql", "def", ["boop"])
+            cur.execute("DROP TABLE boop")
+            assert not is_stage_up_to_date(cur, "stage.sql", "abc", ["boop"])
@@ -1,7 +1,21 @@
-from typing import Dict, Any
+from datetime import datetime
+from typing import Dict, Any, Optional, Sequence, Set, Tuple
 import functools
+import hashlib
 from django.http import JsonResponse
 from django.conf import settings
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+
+from .cache import get_build_info, get_dataset_updates
+
+
+# The methods of requests whose responses can be cached and revalidated.
+CACHEABLE_METHODS = ("GET", "HEAD")
+
+# The `datasets` of an endpoint whose responses depend on every dataset in
+# the `dataset_tracker` table.
+ALL_DATASETS = "*"
 
 
 class InvalidFormError(Exception):
@@ -37,18 +51,117 @@ def apply_cors_policy(request, response):
     return response
 
 
-def api(fn):
+def get_response_validators(
+    datasets: Sequence[str] = (),
+) -> Tuple[Optional[str], Optional[datetime]]:
     """
-    Decorator for an API endpoint.
+    Return the ETag and last modification time of the responses of an
+    endpoint whose results only change when the database is rebuilt, or
+    when the given datasets in the `dataset_tracker` table are updated.
+    Returns `(None, None)` if the database doesn't record its builds.
     """
 
+    build_info = get_build_info()
+    if build_info is None:
+        return None, None
+    parts = [settings.WOW_CODE_VERSION, build_info.version]
+    last_modified = build_info.finished_at
+    if datasets:
+        updates = get_dataset_updates()
+        keys = sorted(updates.keys()) if ALL_DATASETS in datasets else datasets
+        for key in keys:
+            updated_at = updates.get(key)
+            parts.append(f"{key}={updated_at and updated_at.isoformat()}")
+            if updated_at is not None:
+                last_modified = max(last_modified, updated_at)
+    etag = hashlib.sha1(":".join(parts).encode("utf-8")).hexdigest()[:20]
+    # The ETag is weak because the same response may be sent with different
+    # content encodings.
+    return "W/" + quote_etag(etag), last_modified
+
+
+def apply_cache_policy(
+    response,
+    max_age: int,
+    immutable: bool = False,
+    etag: Optional[str] = None,
+    last_modified: Optional[datetime] = None,
+):
+    if response.status_code == 304 or 200 <= response.status_code < 300:
+        response["Cache-Control"] = f"public, max-age={max_age}" + (
+            ", immutable" if immutable else ""
+        )
+        if etag is not None:
+            response["ETag"] = etag
+        if last_modified is not None:
+            response["Last-Modified"] = http_date(last_modified.timestamp())
+    return response
+
+
+def api(
+    fn=None,
+    *,
+    max_age: Optional[int] = None,
+    datasets: Sequence[str] = (),
+    cacheable: bool = True,
+    immutable: bool = False,
+):
+    """
+    Decorator for an API endpoint, which can be used either as `@api` or
+    with options, e.g. `@api(max_age=3600)`.
+
+    GET requests to cacheable endpoints are answered with ETag and
+    Last-Modified headers that change when the database is rebuilt (or
+    when any of the endpoint's `datasets` in `dataset_tracker` are
+    updated), and requests whose validators are still current get an
+    HTTP 304 without the endpoint being called at all. Their successful
+    responses may be reused by browsers and CDNs for `max_age` seconds,
+    which defaults to the WOW_API_CACHE_MAX_AGE setting, and endpoints whose
+    URLs identify a single version of their content can be marked
+    `immutable` so browsers don't revalidate them at all.
+
+    Endpoints whose responses aren't the same for everyone, e.g. because
+    they need authorization, should pass `cacheable=False`.
+    """
+
+    if fn is None:
+        return functools.partial(
+            api,
+            max_age=max_age,
+            datasets=datasets,
+            cacheable=cacheable,
+            immutable=immutable,
+        )
+
     @functools.wraps(fn)
     def wrapper(request, *args, **kwargs):
         request.is_api_request = True
-        try:
-            response = fn(request, *args, **kwargs)
-        except (InvalidFormError, AuthorizationError) as e:
-            response = e.as_json_response()
+        is_cacheable = cacheable and request.method in CACHEABLE_METHODS
+        etag, last_modified = None, None
+        response = None
+        if is_cacheable:
+            etag, last_modified = get_response_validators(datasets)
+            if etag is not None:
+                response = get_conditional_response(
+                    request,
+                    etag=etag,
+                    last_modified=last_modified and int(last_modified.timestamp()),
+                )
+        if response is None:
+            try:
+                response = fn(request, *args, **kwargs)
+            except (InvalidFormError, AuthorizationError) as e:
+                response = e.as_json_response()
+        if is_cacheable:
+            apply_cache_policy(
+                response,
+                settings.WOW_API_CACHE_MAX_AGE if max_age is None else max_age,
+                immutable,
+                etag,
+                last_modified,
+            )
+        elif not cacheable:
+            response["Cache-Control"] = "private, no-store"
         return apply_cors_policy(request, response)
 
     return wrapper
@@ -90,6 +203,31 @@ def authorize_for_gce(request):
     authorize_with_token(request, "bearer", settings.GCE_API_TOKEN)
 
 
+def parse_accept_encoding(header: str) -> Set[str]:
+    """
+    Return the content codings a client accepts, given its Accept-Encoding
+    header, for example:
+
+        >>> sorted(parse_accept_encoding("gzip, deflate, br;q=0"))
+        ['deflate', 'gzip']
+    """
+
+    encodings: Set[str] = set()
+    for part in header.split(","):
+        coding, *params = [item.strip() for item in part.split(";")]
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if coding and quality > 0:
+            encodings.add(coding.lower())
+    return encodings
+
+
 def get_validated_form_data(form_class, data) -> Dict[str, Any]:
     form = form_class(data)
     if not form.is_valid():
@@ -3,3 +3,12 @@ from django.apps import AppConfig
 
 class WowConfig(AppConfig):
     name = "wow"
+
+    def ready(self):
+        from django.db.backends.signals import connection_created
+        from .dbutil import get_query_registry, init_wow_connection
+
+        # Read all our SQL files up-front, rather than on every request.
+        get_query_registry()
+
+        connection_created.connect(init_wow_connection)
@@ -0,0 +1,135 @@
+"""
+A microbenchmark comparing the ways we can turn the rows of a large
+portfolio into the dicts our API returns.
+
+Run it with:
+
+    python -m wow.benchmarks.row_mapping
+"""
+
+import argparse
+import datetime
+import timeit
+from decimal import Decimal
+from typing import Any, Dict, List, Sequence, Tuple
+
+from wow.datautil import int_or_none
+from wow.dbutil import RowMapper
+from wow.views import ADDR_CONVERTERS
+
+
+# The columns returned by get_assoc_addrs_from_bbl() and address_portfolio.sql.
+COLUMNS = [
+    "housenumber",
+    "streetname",
+    "zip",
+    "boro",
+    "registrationid",
+    "lastregistrationdate",
+    "registrationenddate",
+    "bbl",
+    "bin",
+    "hpdbuildingid",
+    "hpdbuildings",
+    "corpnames",
+    "businessaddrs",
+    "ownernames",
+    "allcontacts",
+    "totalviolations",
+    "openviolations",
+    "totalcomplaints",
+    "recentcomplaints",
+    "recentcomplaintsbytype",
+    "unitsres",
+    "yearbuilt",
+    "council",
+    "lat",
+    "lng",
+    "evictions",
+    "rsunits2007",
+    "rsunitslatest",
+    "rsunitslatestyear",
+    "rsdiff",
+    "yearstartedj51",
+    "yearstarted421a",
+    "lastsaleacrisid",
+    "lastsaledate",
+    "lastsaleamount",
+    "evictionfilings",
+]
+
+
+def make_rows(count: int) -> Tuple[List[Tuple[str]], List[Tuple[Any, ...]]]:
+    """
+    Return a cursor description and rows that look like a portfolio
+    with the given number of buildings.
+    """
+
+    description = [(column,) for column in COLUMNS]
+    rows = []
+    for i in range(count):
+        values: Dict[str, Any] = {column: None for column in COLUMNS}
+        values.update(
+            housenumber=str(i),
+            streetname="FUNKY STREET",
+            zip="11231",
+            boro="BROOKLYN",
+            registrationid=100000 + i,
+            lastregistrationdate=datetime.date(2023, 1, 1),
+            bbl=f"3{i:09d}",
+            bin=3000000 + i,
+            corpnames=["FUNKY LLC"],
+            ownernames=[{"title": "HeadOfficer", "value": "LOBOT JONES"}],
+            totalviolations=i % 50,
+            unitsres=i % 100,
+            lat=40.68,
+            lng=-73.99,
+            lastsaleamount=Decimal(1000000 + i),
+        )
+        rows.append(tuple(values[column] for column in COLUMNS))
+    return description, rows
+
+
+def map_with_dicts(description: Sequence[Tuple[str]], rows) -> List[Dict[str, Any]]:
+    """
+    How we used to do it: `dictfetchall()` followed by a copy of each
+    row made by `clean_addr_dict()`.
+    """
+
+    columns = [col[0] for col in description]
+    dicts = [dict(zip(columns, row)) for row in rows]
+    return [
+        {
+            **addr,
+            "bin": str(addr["bin"]),
+            "lastsaleamount": int_or_none(addr["lastsaleamount"]),
+            "registrationid": str(addr["registrationid"]),
+        }
+        for addr in dicts
+    ]
+
+
+def map_with_row_mapper(
+    description: Sequence[Tuple[str]], rows
+) -> List[Dict[str, Any]]:
+    return RowMapper.from_description(description, ADDR_CONVERTERS).map_rows(rows)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=10_000)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    description, rows = make_rows(args.rows)
+    assert map_with_dicts(description, rows) == map_with_row_mapper(description, rows)
+
+    for fn in [map_with_dicts, map_with_row_mapper]:
+        best = min(
+            timeit.repeat(lambda: fn(description, rows), number=1, repeat=args.repeat)
+        )
+        print(f"{fn.__name__}: {best * 1000:.2f} ms per {args.rows} rows")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,315 @@
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    TypeVar,
+    cast,
+)
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse, JsonResponse
+
+from .dbutil import get_wow_cursor
+
+
+T = TypeVar("T")
+
+
+class LruResponseCache:
+    """
+    An in-process least-recently-used cache of response bodies, which
+    evicts the oldest entries once their total size exceeds `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[str, bytes]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[bytes]:
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: bytes) -> None:
+        entry_size = len(key) + len(value)
+        if entry_size > self.max_bytes:
+            return
+        with self._lock:
+            old_value = self._entries.pop(key, None)
+            if old_value is not None:
+                self.size -= len(key) + len(old_value)
+            self._entries[key] = value
+            self.size += entry_size
+            while self.size > self.max_bytes:
+                old_key, old_value = self._entries.popitem(last=False)
+                self.size -= len(old_key) + len(old_value)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.size = 0
+
+
+class ResponseCache:
+    """
+    A two-level cache of response bodies: an in-process LRU cache in front
+    of an optional shared cache configured through Django's cache framework
+    (e.g. memcached or redis), so that all our server processes can benefit
+    from each other's work.
+    """
+
+    def __init__(self, max_bytes: int, shared_alias: Optional[str] = None):
+        self.local = LruResponseCache(max_bytes)
+        self.shared_alias = shared_alias
+
+    def get(self, key: str) -> Optional[bytes]:
+        value = self.local.get(key)
+        if value is None and self.shared_alias:
+            value = caches[self.shared_alias].get(key)
+            if value is not None:
+                self.local.set(key, value)
+        return value
+
+    def set(self, key: str, value: bytes) -> None:
+        self.local.set(key, value)
+        if self.shared_alias:
+            caches[self.shared_alias].set(key, value)
+
+    def clear(self) -> None:
+        self.local.clear()
+
+
+class PeriodicallyFetchedValue(Generic[T]):
+    """
+    A value that's fetched from the database at most once every
+    `WOW_BUILD_VERSION_TTL` seconds, e.g. information about the latest
+    database build.
+    """
+
+    def __init__(self, fetch: Callable[[], T]):
+        self.fetch = fetch
+        self._value: Optional[T] = None
+        self._checked_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> T:
+        now = time.monotonic()
+        with self._lock:
+            if (
+                self._checked_at is None
+                or now - self._checked_at >= settings.WOW_BUILD_VERSION_TTL
+            ):
+                self._value = self.fetch()
+                self._checked_at = now
+            return cast(T, self._value)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._value = None
+            self._checked_at = None
+
+
+class BuildInfo(NamedTuple):
+    version: str
+    finished_at: datetime
+
+
+_response_cache: Optional[ResponseCache] = None
+
+
+def get_response_cache() -> ResponseCache:
+    global _response_cache
+
+    if _response_cache is None:
+        _response_cache = ResponseCache(
+            max_bytes=settings.WOW_RESPONSE_CACHE_MAX_BYTES,
+            shared_alias=settings.WOW_RESPONSE_CACHE_ALIAS,
+        )
+    return _response_cache
+
+
+def fetch_build_info() -> Optional[BuildInfo]:
+    """
+    Return the version and finish time of the most recent database build,
+    as recorded by `dbtool.py builddb`, or None if the database doesn't
+    record its builds.
+    """
+
+    with get_wow_cursor() as cursor:
+        cursor.execute("SELECT to_regclass('public.wow_build_info')")
+        if cursor.fetchone()[0] is None:
+            return None
+        cursor.execute(
+            "SELECT version, finished_at FROM wow_build_info "
+            "ORDER BY finished_at DESC LIMIT 1"
+        )
+        row = cursor.fetchone()
+        return BuildInfo(*row) if row else None
+
+
+def fetch_build_version() -> Optional[str]:
+    """
+    Return the version of the most recent database build, or None if the
+    database doesn't record its builds.
+    """
+
+    info = fetch_build_info()
+    return info.version if info else None
+
+
+def fetch_dataset_updates() -> Dict[str, datetime]:
+    """
+    Return when each dataset in the `dataset_tracker` table maintained by
+    our nycdb-k8s-loader was last updated, or nothing if the database
+    doesn't have that table (e.g. in development).
+    """
+
+    with get_wow_cursor() as cursor:
+        cursor.execute("SELECT to_regclass('public.dataset_tracker')")
+        if cursor.fetchone()[0] is None:
+            return {}
+        cursor.execute(
+            "SELECT key, value::timestamp AT TIME ZONE 'UTC' FROM dataset_tracker"
+        )
+        return {key: value for key, value in cursor.fetchall() if value is not None}
+
+
+_build_info = PeriodicallyFetchedValue(lambda: fetch_build_info())
+
+_dataset_updates = PeriodicallyFetchedValue(lambda: fetch_dataset_updates())
+
+
+def get_build_info() -> Optional[BuildInfo]:
+    """
+    Like `fetch_build_info()`, but only asks the database once every
+    `WOW_BUILD_VERSION_TTL` seconds.
+    """
+
+    return _build_info.get()
+
+
+def get_build_version() -> Optional[str]:
+    """
+    Like `fetch_build_version()`, but only asks the database once every
+    `WOW_BUILD_VERSION_TTL` seconds.
+    """
+
+    info = get_build_info()
+    return info.version if info else None
+
+
+def get_dataset_updates() -> Dict[str, datetime]:
+    """
+    Like `fetch_dataset_updates()`, but only asks the database once every
+    `WOW_BUILD_VERSION_TTL` seconds.
+    """
+
+    return _dataset_updates.get()
+
+
+def reset_build_version() -> None:
+    _build_info.reset()
+    _dataset_updates.reset()
+
+
+def get_dataset_versions(datasets: Sequence[str]) -> List[str]:
+    """
+    Return strings identifying when each of the given datasets in the
+    `dataset_tracker` table was last updated.
+    """
+
+    if not datasets:
+        return []
+    updates = get_dataset_updates()
+    versions = []
+    for dataset in datasets:
+        updated_at = updates.get(dataset)
+        versions.append(f"{dataset}={updated_at and updated_at.isoformat()}")
+    return versions
+
+
+def get_response_cache_key(
+    endpoint: str, params: Dict[str, Any], datasets: Sequence[str] = ()
+) -> Optional[str]:
+    """
+    Return the cache key for the given endpoint and (already validated)
+    request parameters, or None if responses shouldn't be cached. Keys
+    change whenever any of the given datasets, which the endpoint reads
+    directly, are updated.
+    """
+
+    if not settings.WOW_RESPONSE_CACHE_MAX_BYTES:
+        return None
+    version = get_build_version()
+    if version is None:
+        return None
+    normalized_params = "&".join(
+        [f"{name}={params[name]}" for name in sorted(params.keys())]
+        + get_dataset_versions(sorted(datasets))
+    )
+    params_hash = hashlib.sha1(normalized_params.encode("utf-8")).hexdigest()
+    return f"wow:{version}:{endpoint}:{params_hash}"
+
+
+def cached_json_response(
+    endpoint: str,
+    params: Dict[str, Any],
+    get_data: Callable[[], Dict[str, Any]],
+    datasets: Sequence[str] = (),
+) -> HttpResponse:
+    """
+    Return a JSON response for the given endpoint and parameters, only
+    calling `get_data()` to build it if it isn't already cached for the
+    current database build and versions of the given datasets.
+    """
+
+    return cached_json_content_response(
+        endpoint, params, lambda: JsonResponse(get_data()).content, datasets
+    )
+
+
+def cached_json_content_response(
+    endpoint: str,
+    params: Dict[str, Any],
+    get_content: Callable[[], bytes],
+    datasets: Sequence[str] = (),
+) -> HttpResponse:
+    """
+    Like `cached_json_response()`, but `get_content()` returns the
+    already-serialized JSON body of the response.
+    """
+
+    key = get_response_cache_key(endpoint, params, datasets)
+    if key is None:
+        content = get_content()
+    else:
+        cache = get_response_cache()
+        cached_content = cache.get(key)
+        if cached_content is None:
+            content = get_content()
+            cache.set(key, content)
+        else:
+            content = cached_content
+    return HttpResponse(content, content_type="application/json")
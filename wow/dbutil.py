@@ -1,37 +1,634 @@
+import logging
+import re
+import time
+import threading
+import weakref
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Any
-from django.db import connections
+from typing import (
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Dict,
+    Any,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+from django.conf import settings
+from django.db import close_old_connections, connections, transaction, DatabaseError
 from contextlib import contextmanager
+import psycopg2.errors
 import psycopg2.extras
 
 
-def dictfetchall(cursor):
+MY_DIR = Path(__file__).parent.resolve()
+
+SQL_DIR = MY_DIR / "sql"
+
+# Matches the psycopg2-style named parameters used by our SQL files,
+# e.g. "%(bbl)s".
+NAMED_PARAM_RE = re.compile(r"%\((\w+)\)s")
+
+# The suffix of the names of the variants of our queries that render
+# their results as JSON in Postgres (see `NamedQuery.as_json()`).
+JSON_QUERY_SUFFIX = "__json"
+
+# Errors that mean a prepared statement needs to be prepared again.
+STALE_STATEMENT_ERRORS = (
+    psycopg2.errors.InvalidSqlStatementName,
+    psycopg2.errors.FeatureNotSupported,
+)
+
+
+# A function that converts a value from the database into the value
+# our API returns, e.g. `datautil.int_or_none`.
+Converter = Callable[[Any], Any]
+
+
+class RowMapper:
+    """
+    Converts rows, as returned by a cursor, into dicts keyed by column
+    name, applying converters to the values of some columns along the
+    way. The columns to convert are looked up once, when the mapper is
+    created, so each row is mapped in a single pass.
+
+    For example:
+
+        >>> mapper = RowMapper(["bbl", "bin"], {"bin": str})
+        >>> mapper.map_rows([("3012380016", 3029470)])
+        [{'bbl': '3012380016', 'bin': '3029470'}]
+    """
+
+    def __init__(
+        self, columns: Sequence[str], converters: Mapping[str, Converter] = {}
+    ):
+        self.columns = tuple(columns)
+        self.conversions = tuple(
+            (i, column, converters[column])
+            for i, column in enumerate(self.columns)
+            if column in converters
+        )
+
+    @staticmethod
+    def from_description(
+        description, converters: Mapping[str, Converter] = {}
+    ) -> "RowMapper":
+        return RowMapper([col[0] for col in description], converters)
+
+    def map_row(self, row: Sequence[Any]) -> Dict[str, Any]:
+        result = dict(zip(self.columns, row))
+        for i, column, convert in self.conversions:
+            result[column] = convert(row[i])
+        return result
+
+    def map_rows(self, rows: Iterable[Sequence[Any]]) -> List[Dict[str, Any]]:
+        map_row = self.map_row
+        return [map_row(row) for row in rows]
+
+
+def dictfetchall(cursor, converters: Mapping[str, Converter] = {}):
     # https://docs.djangoproject.com/en/3.0/topics/db/sql/#executing-custom-sql-directly
     "Return all rows from a cursor as a dict"
-    columns = [col[0] for col in cursor.description]
-    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+    mapper = RowMapper.from_description(cursor.description, converters)
+    return mapper.map_rows(cursor.fetchall())
+
+
+class ConnectionStats:
+    """
+    Running counters for our use of the "wow" database connections,
+    across every thread in this process. All times are in seconds.
+
+    `connect_time` is the time spent opening new connections, which is
+    what requests pay whenever their thread doesn't have an open one to
+    reuse. Each thread keeps its own connection rather than borrowing one
+    from a bounded pool, so requests never wait for another request to
+    give a connection back.
+    """
+
+    def __init__(self):
+        self.checkouts = 0
+        self.connects = 0
+        self.connect_time = 0.0
+        self.health_checks = 0
+        self.discards = 0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "checkouts": self.checkouts,
+            "connects": self.connects,
+            "connect_time": self.connect_time,
+            "avg_connect_time": (
+                self.connect_time / self.connects if self.connects else None
+            ),
+            "health_checks": self.health_checks,
+            "discards": self.discards,
+        }
+
+
+_connection_stats = ConnectionStats()
+
+_connection_stats_lock = threading.Lock()
+
+# When we last logged our connection stats.
+_connection_stats_logged_at = time.monotonic()
+
+logger = logging.getLogger(__name__)
+
+# Maps each raw psycopg2 connection to when we last made sure it works.
+_health_checked_at: "weakref.WeakKeyDictionary[Any, float]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def init_wow_connection(sender, connection, **kwargs):
+    """
+    Set up each new connection to the WoW database, once. This is a
+    receiver for Django's `connection_created` signal.
+    """
+
+    if connection.alias != "wow":
+        return
+    raw_conn = connection.connection
+
+    # This is a workaround for https://code.djangoproject.com/ticket/31991.
+    psycopg2.extras.register_default_jsonb(raw_conn)
+
+    with raw_conn.cursor() as cursor:
+        cursor.execute(
+            "SELECT set_config('statement_timeout', %s, false), "
+            "set_config('application_name', %s, false)",
+            [str(settings.WOW_DB_STATEMENT_TIMEOUT), settings.WOW_DB_APPLICATION_NAME],
+        )
+
+
+def checkout_wow_connection():
+    """
+    Return this thread's connection to the WoW database, making sure
+    that it works if we haven't done so in a while, and connecting if
+    needed.
+    """
+
+    conn = connections["wow"]
+    now = time.monotonic()
+    health_checks = 0
+    discards = 0
+    if conn.connection is not None and not conn.in_atomic_block:
+        checked_at = _health_checked_at.get(conn.connection)
+        if (
+            checked_at is None
+            or now - checked_at >= settings.WOW_DB_HEALTH_CHECK_INTERVAL
+        ):
+            health_checks += 1
+            if conn.is_usable():
+                _health_checked_at[conn.connection] = now
+            else:
+                discards += 1
+                conn.close()
+    connects = 0
+    connect_time = 0.0
+    if conn.connection is None:
+        start = time.perf_counter()
+        conn.ensure_connection()
+        connect_time = time.perf_counter() - start
+        connects += 1
+        _health_checked_at[conn.connection] = time.monotonic()
+    with _connection_stats_lock:
+        _connection_stats.checkouts += 1
+        _connection_stats.connects += connects
+        _connection_stats.connect_time += connect_time
+        _connection_stats.health_checks += health_checks
+        _connection_stats.discards += discards
+    log_connection_stats_periodically(now)
+    return conn
+
+
+def log_connection_stats_periodically(now: float) -> None:
+    """
+    Log our connection stats if we haven't done so in the last
+    `WOW_DB_STATS_LOG_INTERVAL` seconds.
+    """
+
+    global _connection_stats_logged_at
+
+    interval = settings.WOW_DB_STATS_LOG_INTERVAL
+    with _connection_stats_lock:
+        if not interval or now - _connection_stats_logged_at < interval:
+            return
+        _connection_stats_logged_at = now
+        stats = _connection_stats.as_dict()
+    logger.info(f"WoW database connection stats: {stats}")
+
+
+def get_connection_stats() -> Dict[str, Any]:
+    with _connection_stats_lock:
+        return _connection_stats.as_dict()
 
 
 @contextmanager
 def get_wow_cursor():
-    with connections["wow"].cursor() as cursor:
-        # This is a workaround for https://code.djangoproject.com/ticket/31991.
-        psycopg2.extras.register_default_jsonb(cursor.cursor)
-
+    with checkout_wow_connection().cursor() as cursor:
         yield cursor
 
 
-def call_db_func(name: str, params: List[Any]) -> List[Dict[str, Any]]:
+@contextmanager
+def get_wow_server_side_cursor():
+    """
+    Like `get_wow_cursor()`, but the cursor is a named (server-side) one,
+    so results are only sent to us as we fetch them.
+
+    The cursor is used in a transaction that lasts until it's closed.
+    Outside of one, Django declares it WITH HOLD, which makes Postgres
+    run the whole query and store its result before we fetch anything.
+    """
+
+    conn = checkout_wow_connection()
+    with transaction.atomic(using=conn.alias):
+        with conn.chunked_cursor() as cursor:
+            yield cursor
+
+
+def iter_db_func_batches(
+    name: str, params: List[Any], batch_size: int = 1000
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Call the given database function and yield its rows as dicts, in
+    batches of up to `batch_size` rows, without ever loading its whole
+    result into memory.
+    """
+
+    placeholders = ", ".join(["%s"] * len(params))
+    with get_wow_server_side_cursor() as cursor:
+        cursor.execute(f"SELECT * FROM {name}({placeholders})", params)
+        yield from _iter_cursor_batches(cursor, batch_size)
+
+
+def iter_db_query_batches(
+    sql_file: Path, params: Dict[str, Any] = {}, batch_size: int = 1000
+) -> Iterator[List[Dict[str, Any]]]:
+    """
+    Like `iter_db_func_batches()`, but runs the query in the given SQL
+    file.
+    """
+
+    if sql_file.parent == SQL_DIR:
+        sql = get_query_registry().get(sql_file.stem).sql
+    else:
+        sql = sql_file.read_text()
+    with get_wow_server_side_cursor() as cursor:
+        cursor.execute(sql, params)
+        yield from _iter_cursor_batches(cursor, batch_size)
+
+
+def _iter_cursor_batches(cursor, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    mapper: Optional[RowMapper] = None
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        if mapper is None:
+            mapper = RowMapper.from_description(cursor.description)
+        yield mapper.map_rows(rows)
+
+
+def call_db_func(
+    name: str, params: List[Any], converters: Mapping[str, Converter] = {}
+) -> List[Dict[str, Any]]:
     with get_wow_cursor() as cursor:
         cursor.callproc(name, params)
-        return dictfetchall(cursor)
+        return dictfetchall(cursor, converters)
 
 
-def exec_sql(sql: str, params: Dict[str, Any] = {}) -> List[Dict[str, Any]]:
+def exec_sql(
+    sql: str, params: Dict[str, Any] = {}, converters: Mapping[str, Converter] = {}
+) -> List[Dict[str, Any]]:
     with get_wow_cursor() as cursor:
         cursor.execute(sql, params)
-        return dictfetchall(cursor)
+        return dictfetchall(cursor, converters)
+
+
+def does_table_exist(name: str) -> bool:
+    """
+    Return whether the given table exists in the WoW database, e.g. so that
+    endpoints can still work on databases built before it was added.
+    """
+
+    with get_wow_cursor() as cursor:
+        cursor.execute("SELECT to_regclass(%s)", [f"public.{name}"])
+        return cursor.fetchone()[0] is not None
+
+
+class QueryStats:
+    """
+    Running timing counters for a single named query, across every
+    connection in this process. All times are in seconds.
+    """
+
+    def __init__(self):
+        self.calls = 0
+        self.prepares = 0
+        self.prepare_time = 0.0
+        self.exec_time = 0.0
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "calls": self.calls,
+            "prepares": self.prepares,
+            "prepare_time": self.prepare_time,
+            "exec_time": self.exec_time,
+            "avg_exec_time": self.exec_time / self.calls if self.calls else None,
+        }
+
+
+class NamedQuery(NamedTuple):
+    """
+    A SQL query loaded from a file in our SQL directory.
+
+    `sql` is the original text, with psycopg2-style named parameters,
+    while `prepared_sql` is the same query rewritten with positional
+    Postgres parameters (`$1`, `$2`, ...) that are bound in the order
+    given by `param_names`.
+    """
+
+    name: str
+    sql: str
+    prepared_sql: str
+    param_names: List[str]
+
+    @property
+    def statement_name(self) -> str:
+        return f"wow_{self.name}"
+
+    @property
+    def is_preparable(self) -> bool:
+        # Postgres can only PREPARE a single statement, so queries that
+        # e.g. create temporary tables before selecting from them need
+        # to be sent the old-fashioned way.
+        return ";" not in self.prepared_sql
+
+    def as_json(self) -> "NamedQuery":
+        """
+        Return a variant of this query that returns a single row with a
+        single "json" column, containing all of this query's rows
+        rendered as a JSON array of objects by Postgres.
+        """
+
+        # The newline keeps a trailing comment in our SQL from swallowing
+        # the rest of the query.
+        sql = (
+            "SELECT COALESCE(json_agg(q), '[]'::json)::text AS json FROM (\n"
+            + self.sql.strip().rstrip(";")
+            + "\n) AS q"
+        )
+        return NamedQuery.from_sql(self.name + JSON_QUERY_SUFFIX, sql)
+
+    @staticmethod
+    def from_sql(name: str, sql: str) -> "NamedQuery":
+        param_names: List[str] = []
+
+        def replace_param(match) -> str:
+            param_name = match.group(1)
+            if param_name not in param_names:
+                param_names.append(param_name)
+            return f"${param_names.index(param_name) + 1}"
+
+        prepared_sql = NAMED_PARAM_RE.sub(replace_param, sql)
+        prepared_sql = prepared_sql.replace("%%", "%").strip().rstrip(";").strip()
+        return NamedQuery(
+            name=name,
+            sql=sql,
+            prepared_sql=prepared_sql,
+            param_names=param_names,
+        )
+
+
+class QueryRegistry:
+    """
+    All the SQL queries in a directory, read from disk once and executed
+    as server-side prepared statements on each connection that uses them.
+    """
+
+    def __init__(self, sql_dir: Path):
+        self.sql_dir = sql_dir
+        self.queries: Dict[str, NamedQuery] = {
+            path.stem: NamedQuery.from_sql(path.stem, path.read_text())
+            for path in sorted(sql_dir.glob("*.sql"))
+        }
+        for query in list(self.queries.values()):
+            if query.is_preparable:
+                json_query = query.as_json()
+                self.queries[json_query.name] = json_query
+        self.stats: Dict[str, QueryStats] = {
+            name: QueryStats() for name in self.queries
+        }
+        self._lock = threading.Lock()
+
+        # Maps each raw psycopg2 connection to the names of the statements
+        # we've prepared on it, so they're forgotten along with the
+        # connection when Django closes it.
+        self._prepared: "weakref.WeakKeyDictionary[Any, set]" = (
+            weakref.WeakKeyDictionary()
+        )
+
+    def get(self, name: str) -> NamedQuery:
+        return self.queries[name]
+
+    def _prepared_on(self, conn) -> set:
+        with self._lock:
+            return self._prepared.setdefault(conn, set())
+
+    def _prepare(self, cursor, query: NamedQuery) -> float:
+        start = time.perf_counter()
+        cursor.execute(f"PREPARE {query.statement_name} AS {query.prepared_sql}")
+        elapsed = time.perf_counter() - start
+        with self._lock:
+            stats = self.stats[query.name]
+            stats.prepares += 1
+            stats.prepare_time += elapsed
+        return elapsed
+
+    def _execute_prepared(
+        self, cursor, query: NamedQuery, params: Dict[str, Any]
+    ) -> float:
+        """
+        Execute the given query's prepared statement, preparing it first
+        if needed, and return the time spent preparing it.
+        """
+
+        prepared = self._prepared_on(cursor.cursor.connection)
+        prepare_time = 0.0
+        if query.name not in prepared:
+            prepare_time = self._prepare(cursor, query)
+            prepared.add(query.name)
+        args = [params[name] for name in query.param_names]
+        placeholders = ", ".join(["%s"] * len(args))
+        execute_sql = f"EXECUTE {query.statement_name}"
+        if args:
+            execute_sql += f" ({placeholders})"
+        cursor.execute(execute_sql, args)
+        return prepare_time
+
+    def execute(
+        self,
+        name: str,
+        params: Dict[str, Any] = {},
+        converters: Mapping[str, Converter] = {},
+    ) -> List[Dict[str, Any]]:
+        query = self.get(name)
+        prepare_time = 0.0
+        with get_wow_cursor() as cursor:
+            start = time.perf_counter()
+            if query.is_preparable and settings.WOW_USE_PREPARED_STATEMENTS:
+                try:
+                    prepare_time = self._execute_prepared(cursor, query, params)
+                except DatabaseError as e:
+                    # The statement may have been deallocated out from under
+                    # us, or its cached plan may have gone stale because
+                    # `dbtool.py builddb` recreated a table it uses. If we're
+                    # not inside a transaction, we can safely prepare it again.
+                    conn = cursor.cursor.connection
+                    if not isinstance(e.__cause__, STALE_STATEMENT_ERRORS):
+                        raise
+                    if not conn.autocommit:
+                        raise
+                    cursor.execute("DEALLOCATE PREPARE ALL")
+                    self._prepared_on(conn).clear()
+                    prepare_time = self._execute_prepared(cursor, query, params)
+            else:
+                cursor.execute(query.sql, params)
+            result = dictfetchall(cursor, converters)
+            if not query.is_preparable:
+                # Our connections outlive requests, so any temporary tables
+                # a multi-statement query created would still be around the
+                # next time it's run on this connection.
+                cursor.execute("DISCARD TEMP")
+            elapsed = time.perf_counter() - start
+        with self._lock:
+            stats = self.stats[name]
+            stats.calls += 1
+            stats.exec_time += elapsed - prepare_time
+        return result
+
+    def execute_json(self, name: str, params: Dict[str, Any] = {}) -> bytes:
+        """
+        Execute the given query and return its rows as a UTF-8 encoded
+        JSON array of objects, rendered by Postgres without ever turning
+        them into Python objects.
+        """
+
+        result = self.execute(name + JSON_QUERY_SUFFIX, params)
+        return result[0]["json"].encode("utf-8")
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {name: stats.as_dict() for name, stats in self.stats.items()}
+
+
+_registry: Optional[QueryRegistry] = None
+
+
+def get_query_registry() -> QueryRegistry:
+    global _registry
+
+    if _registry is None:
+        _registry = QueryRegistry(SQL_DIR)
+    return _registry
+
+
+def exec_named_query(
+    name: str, params: Dict[str, Any] = {}, converters: Mapping[str, Converter] = {}
+) -> List[Dict[str, Any]]:
+    return get_query_registry().execute(name, params, converters)
+
+
+def get_query_stats() -> Dict[str, Dict[str, Any]]:
+    """
+    Return the timing counters for every named query that's been run
+    in this process, e.g. to compare prepared vs. unprepared execution.
+    """
+
+    return get_query_registry().get_stats()
+
+
+def exec_db_query(
+    sql_file: Path,
+    params: Dict[str, Any] = {},
+    converters: Mapping[str, Converter] = {},
+) -> List[Dict[str, Any]]:
+    """
+    Run the query in the given SQL file and return its rows as dicts,
+    converting the values of any columns in `converters` along the way.
+    """
+
+    if sql_file.parent == SQL_DIR:
+        return exec_named_query(sql_file.stem, params, converters)
+    return exec_sql(sql_file.read_text(), params, converters)
+
+
+def exec_db_query_json(sql_file: Path, params: Dict[str, Any] = {}) -> bytes:
+    """
+    Like `exec_db_query()`, but the rows are returned as a UTF-8 encoded
+    JSON array rendered by Postgres, which is much cheaper for large
+    results than building and serializing Python dicts. Any values that
+    need cleaning up for our API must be cast in the SQL itself.
+    """
+
+    if sql_file.parent == SQL_DIR:
+        return get_query_registry().execute_json(sql_file.stem, params)
+    query = NamedQuery.from_sql(sql_file.stem, sql_file.read_text()).as_json()
+    return exec_sql(query.sql, params)[0]["json"].encode("utf-8")
+
+
+_query_executor: Optional[ThreadPoolExecutor] = None
+
+_query_executor_lock = threading.Lock()
+
+
+def get_query_executor() -> ThreadPoolExecutor:
+    global _query_executor
+
+    with _query_executor_lock:
+        if _query_executor is None:
+            _query_executor = ThreadPoolExecutor(
+                max_workers=settings.WOW_QUERY_THREADS,
+                thread_name_prefix="wow-query",
+            )
+        return _query_executor
+
+
+def _timed_db_task(task: Callable[[], Any]) -> Tuple[Any, float]:
+    # Django only cleans up database connections at the start and end of
+    # requests, which never happen on our worker threads, so we need to
+    # do it ourselves.
+    close_old_connections()
+    try:
+        start = time.perf_counter()
+        result = task()
+        return result, time.perf_counter() - start
+    finally:
+        close_old_connections()
+
+
+def run_db_tasks_concurrently(
+    tasks: Dict[str, Callable[[], Any]]
+) -> Tuple[Dict[str, Any], Dict[str, float]]:
+    """
+    Run the given functions, which may query the database, concurrently
+    on our query threads. Return dicts mapping the name of each function
+    to its result and to how many seconds it took to run.
 
+    If any of the functions raises an exception, it's re-raised here.
+    """
 
-def exec_db_query(sql_file: Path, params: Dict[str, Any] = {}) -> List[Dict[str, Any]]:
-    return exec_sql(sql_file.read_text(), params)
+    executor = get_query_executor()
+    futures = {
+        name: executor.submit(_timed_db_task, task) for name, task in tasks.items()
+    }
+    results: Dict[str, Any] = {}
+    timings: Dict[str, float] = {}
+    for name, future in futures.items():
+        results[name], timings[name] = future.result()
+    return results, timings
@@ -0,0 +1,168 @@
+import json
+import threading
+from typing import Any, Dict, FrozenSet, Iterable, List, Mapping, Optional, Set, Tuple
+
+from .cache import get_build_version
+from .dbutil import SQL_DIR, exec_db_query
+
+
+# The types of districts Area Alerts subscribers can select, which are also
+# the names of the columns of wow_indicators that buildings' districts are in.
+DISTRICT_TYPES = [
+    "coun_dist",
+    "nta",
+    "community_dist",
+    "assem_dist",
+    "stsen_dist",
+    "zipcode",
+    "census_tract",
+]
+
+# A subscriber's selection of districts, as sorted (district type, district
+# values) pairs, so that identical selections are equal and can be evaluated
+# once.
+DistrictSelection = Tuple[Tuple[str, Tuple[str, ...]], ...]
+
+
+_valid_districts: Optional[Dict[str, FrozenSet[str]]] = None
+
+_valid_districts_version: Optional[str] = None
+
+_valid_districts_lock = threading.Lock()
+
+
+def parse_district_values(value: Any) -> List[str]:
+    """
+    Parse the districts of one type in a request, which are either a list,
+    e.g. from a JSON body, or a string. Strings can be a JSON array, or the
+    single-quoted lists our Area Alerts emails have always sent, or just a
+    comma-separated list, for example:
+
+        >>> parse_district_values('["101", "102"]')
+        ['101', '102']
+        >>> parse_district_values("['101', '102']")
+        ['101', '102']
+        >>> parse_district_values("101,102")
+        ['101', '102']
+        >>> parse_district_values([101])
+        ['101']
+
+    Raises ValueError if the districts can't be parsed.
+    """
+
+    if isinstance(value, str):
+        value = value.strip()
+        if not value:
+            return []
+        if value.startswith("["):
+            # District values never contain quotes, so a list of strings
+            # in single quotes can be parsed as JSON once they're swapped.
+            value = json.loads(value.replace("'", '"'))
+        else:
+            value = [part.strip() for part in value.split(",") if part.strip()]
+    if not isinstance(value, list) or not all(
+        isinstance(item, (str, int)) and not isinstance(item, bool) for item in value
+    ):
+        raise ValueError(f"Expected a list of districts, got {value!r}")
+    return [str(item) for item in value]
+
+
+def get_valid_districts() -> Dict[str, FrozenSet[str]]:
+    """
+    Return the values of every district of each type that subscribers can
+    select. They're loaded from the database on first use, and again after
+    every database build.
+    """
+
+    global _valid_districts, _valid_districts_version
+
+    version = get_build_version()
+    with _valid_districts_lock:
+        if _valid_districts is None or version != _valid_districts_version:
+            rows = exec_db_query(SQL_DIR / "districts_valid_values.sql")
+            valid_districts: Dict[str, FrozenSet[str]] = {
+                district_type: frozenset() for district_type in DISTRICT_TYPES
+            }
+            for row in rows:
+                valid_districts[row["typevalue"]] = frozenset(row["areavalues"])
+            _valid_districts = valid_districts
+            _valid_districts_version = version
+        return _valid_districts
+
+
+def normalize_district_selection(
+    districts: Mapping[str, Iterable[Any]]
+) -> DistrictSelection:
+    """
+    Convert a mapping from district types to district values into a
+    `DistrictSelection`, for example:
+
+        >>> normalize_district_selection({"zipcode": ["11201", 11201], "nta": []})
+        (('zipcode', ('11201',)),)
+    """
+
+    return tuple(
+        (district_type, tuple(sorted(set(str(value) for value in values))))
+        for district_type, values in sorted(districts.items())
+        if values
+    )
+
+
+def get_selection_query_params(
+    selections: Iterable[DistrictSelection],
+) -> Dict[str, List[str]]:
+    """
+    Return the parameters of our district alert queries for the union of
+    the given district selections, for example:
+
+        >>> get_selection_query_params([
+        ...     (("zipcode", ("11201",)),),
+        ...     (("coun_dist", ("33",)), ("zipcode", ("11201", "11217"))),
+        ... ])["zipcode"]
+        ['11201', '11217']
+    """
+
+    values: Dict[str, Set[str]] = {
+        district_type: set() for district_type in DISTRICT_TYPES
+    }
+    for selection in selections:
+        for district_type, district_values in selection:
+            values[district_type].update(district_values)
+    return {
+        district_type: sorted(district_values)
+        for district_type, district_values in values.items()
+    }
+
+
+def group_rows_by_selection(
+    rows: Iterable[Dict[str, Any]], selections: Iterable[DistrictSelection]
+) -> Dict[DistrictSelection, List[Dict[str, Any]]]:
+    """
+    Given rows with a column for each district type, return the rows that are
+    in each of the given district selections, in their original order. The
+    district columns are removed from the rows, which are shared between the
+    selections they're in.
+    """
+
+    selections_by_district: Dict[Tuple[str, str], List[DistrictSelection]] = {}
+    result: Dict[DistrictSelection, List[Dict[str, Any]]] = {}
+    for selection in selections:
+        result[selection] = []
+        for district_type, district_values in selection:
+            for value in district_values:
+                selections_by_district.setdefault((district_type, value), []).append(
+                    selection
+                )
+
+    for row in rows:
+        row_selections: Dict[DistrictSelection, None] = {}
+        for district_type in DISTRICT_TYPES:
+            value = row.pop(district_type)
+            if value is not None:
+                for selection in selections_by_district.get(
+                    (district_type, str(value)), []
+                ):
+                    row_selections[selection] = None
+        for selection in row_selections:
+            result[selection].append(row)
+    return result
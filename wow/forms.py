@@ -1,14 +1,27 @@
 import re
+from typing import List
 from django import forms
+from django.conf import settings
 from django.core.validators import RegexValidator
 from django.core.exceptions import ValidationError
 
+from .districtutil import (
+    DISTRICT_TYPES,
+    get_valid_districts,
+    normalize_district_selection,
+    parse_district_values,
+)
+from .tileutil import MAX_TILE_ZOOM
+
 
 class CommaSeparatedField(forms.CharField):
     def to_python(self, value):
         if value in self.empty_values:
             return self.empty_value
-        value = str(value).split(",")
+        if isinstance(value, (list, tuple)):
+            value = [str(s) for s in value]
+        else:
+            value = str(value).split(",")
         if self.strip:
             value = [s.strip() for s in value]
         return value
@@ -71,6 +84,23 @@ class PaddedBBLListForm(forms.Form):
         return data
 
 
+class BatchBBLListForm(PaddedBBLListForm):
+    def clean(self):
+        data = super().clean()
+        if "bbls" not in data:
+            return data
+        if len(data["bbls"]) > settings.WOW_MAX_BATCH_BBLS:
+            raise ValidationError(
+                f"Too many BBLs. At most {settings.WOW_MAX_BATCH_BBLS} can be "
+                f"requested at once."
+            )
+        return data
+
+
+class AlertsBuildingFeedForm(PaddedBBLListForm):
+    nonzero_only = forms.BooleanField(required=False)
+
+
 class SignatureCollectionForm(forms.Form):
     collection = forms.CharField()
 
@@ -80,18 +110,9 @@ class DatasetLastUpdatedForm(forms.Form):
 
 
 def validate_district_types(value):
-    VALID_DISTRICTS = [
-        "coun_dist",
-        "nta",
-        "community_dist",
-        "assem_dist",
-        "stsen_dist",
-        "zipcode",
-        "census_tract",
-    ]
-    if value not in VALID_DISTRICTS:
+    if value not in DISTRICT_TYPES:
         raise ValidationError(
-            f"{value} is not a valid district type. Must be on of {', '.join(VALID_DISTRICTS)}",
+            f"{value} is not a valid district type. Must be on of {', '.join(DISTRICT_TYPES)}",
         )
 
 
@@ -99,11 +120,88 @@ class DistrictTypeForm(forms.Form):
     district_type = forms.CharField(validators=[validate_district_types])
 
 
+class DistrictTileForm(DistrictTypeForm):
+    z = forms.IntegerField(min_value=0, max_value=MAX_TILE_ZOOM)
+    x = forms.IntegerField(min_value=0)
+    y = forms.IntegerField(min_value=0)
+
+    def clean(self):
+        cleaned_data = super().clean()
+        z, x, y = (cleaned_data.get(name) for name in ["z", "x", "y"])
+        if z is not None and x is not None and y is not None:
+            if x >= 2**z or y >= 2**z:
+                raise ValidationError(f"Tile {x}/{y} doesn't exist at zoom level {z}.")
+        return cleaned_data
+
+
+def validate_districts(district_type: str, values: List[str]):
+    invalid = [
+        value for value in values if value not in get_valid_districts()[district_type]
+    ]
+    if invalid:
+        raise ValidationError(
+            f"Invalid {district_type} districts: {', '.join(invalid)}",
+        )
+
+
+class DistrictListField(forms.Field):
+    def to_python(self, value):
+        if value in self.empty_values:
+            return []
+        try:
+            return parse_district_values(value)
+        except ValueError:
+            raise ValidationError("This should be a list of districts.")
+
+
 class EmailAlertDistrict(forms.Form):
-    coun_dist = forms.CharField(required=False)
-    nta = forms.CharField(required=False)
-    community_dist = forms.CharField(required=False)
-    assem_dist = forms.CharField(required=False)
-    stsen_dist = forms.CharField(required=False)
-    zipcode = forms.CharField(required=False)
-    census_tract = forms.CharField(required=False)
+    coun_dist = DistrictListField(required=False)
+    nta = DistrictListField(required=False)
+    community_dist = DistrictListField(required=False)
+    assem_dist = DistrictListField(required=False)
+    stsen_dist = DistrictListField(required=False)
+    zipcode = DistrictListField(required=False)
+    census_tract = DistrictListField(required=False)
+
+    def clean(self):
+        data = super().clean()
+        for district_type in DISTRICT_TYPES:
+            if district_type in data:
+                validate_districts(district_type, data[district_type])
+        return data
+
+
+class EmailAlertDistrictBatch(forms.Form):
+    subscribers = forms.JSONField()
+
+    def clean_subscribers(self):
+        subscribers = self.cleaned_data["subscribers"]
+        if not isinstance(subscribers, dict):
+            raise ValidationError("This should map subscriber IDs to their districts.")
+        for subscriber, districts in subscribers.items():
+            if not isinstance(districts, dict):
+                raise ValidationError(
+                    f"The districts of '{subscriber}' should map district types "
+                    f"to lists of districts."
+                )
+            for district_type, values in districts.items():
+                validate_district_types(district_type)
+                try:
+                    districts[district_type] = parse_district_values(values)
+                except ValueError:
+                    raise ValidationError(
+                        f"The {district_type} districts of '{subscriber}' should "
+                        f"be a list of districts."
+                    )
+                validate_districts(district_type, districts[district_type])
+        max_selections = settings.WOW_MAX_BATCH_DISTRICT_SELECTIONS
+        selections = {
+            normalize_district_selection(districts)
+            for districts in subscribers.values()
+        }
+        if len(selections) > max_selections:
+            raise ValidationError(
+                f"Too many different selections of districts. At most "
+                f"{max_selections} can be requested at once."
+            )
+        return subscribers
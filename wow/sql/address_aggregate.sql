@@ -0,0 +1,29 @@
+-- Look up the precomputed aggregate info for the portfolio associated with
+-- the given BBL's registration. Like get_agg_info_from_bbl(), this always
+-- returns exactly one row, even for BBLs that aren't registered with HPD.
+-- Values are cast to the types our API returns them as, so this can also
+-- be rendered as JSON by Postgres.
+SELECT
+	COALESCE(AGG.BLDGS, 0) AS BLDGS,
+	AGG.UNITS,
+	TRUNC(AGG.AGE)::INT AS AGE,
+	AGG.TOPOWNERS,
+	AGG.TOPCORP,
+	AGG.TOPBUSINESSADDR,
+	AGG.TOTALOPENVIOLATIONS,
+	AGG.TOTALVIOLATIONS,
+	AGG.OPENVIOLATIONSPERBLDG::FLOAT8 AS OPENVIOLATIONSPERBLDG,
+	AGG.OPENVIOLATIONSPERRESUNIT::FLOAT8 AS OPENVIOLATIONSPERRESUNIT,
+	TRUNC(AGG.TOTALEVICTIONS)::BIGINT AS TOTALEVICTIONS,
+	AGG.AVGEVICTIONS::FLOAT8 AS AVGEVICTIONS,
+	COALESCE(AGG.TOTALRSGAIN, 0) AS TOTALRSGAIN,
+	COALESCE(AGG.TOTALRSLOSS, 0) AS TOTALRSLOSS,
+	AGG.TOTALRSDIFF,
+	AGG.RSPROPORTION::FLOAT8 AS RSPROPORTION,
+	AGG.RSLOSSADDR,
+	AGG.EVICTIONSADDR,
+	AGG.VIOLATIONSADDR
+FROM (SELECT %(bbl)s::TEXT AS BBL) AS Q
+LEFT JOIN WOW_BLDGS AS B ON B.BBL = Q.BBL
+LEFT JOIN WOW_PORTFOLIO_AGGREGATES AS AGG USING(REGISTRATIONID)
+LIMIT 1;
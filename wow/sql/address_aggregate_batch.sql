@@ -0,0 +1,28 @@
+-- Like address_aggregate.sql, but for every BBL in the given array. Each
+-- requested BBL gets exactly one row, labeled with it in BATCH_BBL.
+SELECT
+	Q.BBL AS BATCH_BBL,
+	COALESCE(AGG.BLDGS, 0) AS BLDGS,
+	AGG.UNITS,
+	TRUNC(AGG.AGE)::INT AS AGE,
+	AGG.TOPOWNERS,
+	AGG.TOPCORP,
+	AGG.TOPBUSINESSADDR,
+	AGG.TOTALOPENVIOLATIONS,
+	AGG.TOTALVIOLATIONS,
+	AGG.OPENVIOLATIONSPERBLDG::FLOAT8 AS OPENVIOLATIONSPERBLDG,
+	AGG.OPENVIOLATIONSPERRESUNIT::FLOAT8 AS OPENVIOLATIONSPERRESUNIT,
+	TRUNC(AGG.TOTALEVICTIONS)::BIGINT AS TOTALEVICTIONS,
+	AGG.AVGEVICTIONS::FLOAT8 AS AVGEVICTIONS,
+	COALESCE(AGG.TOTALRSGAIN, 0) AS TOTALRSGAIN,
+	COALESCE(AGG.TOTALRSLOSS, 0) AS TOTALRSLOSS,
+	AGG.TOTALRSDIFF,
+	AGG.RSPROPORTION::FLOAT8 AS RSPROPORTION,
+	AGG.RSLOSSADDR,
+	AGG.EVICTIONSADDR,
+	AGG.VIOLATIONSADDR
+FROM UNNEST(%(bbls)s::TEXT[]) AS Q(BBL)
+LEFT JOIN LATERAL (
+	SELECT REGISTRATIONID FROM WOW_BLDGS AS B WHERE B.BBL = Q.BBL LIMIT 1
+) AS B ON TRUE
+LEFT JOIN WOW_PORTFOLIO_AGGREGATES AS AGG USING(REGISTRATIONID);
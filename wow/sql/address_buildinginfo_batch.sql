@@ -0,0 +1,73 @@
+-- Like address_buildinginfo.sql, but for every BBL in the given array.
+-- Each row is labeled with the requested BBL it's for in BATCH_BBL.
+WITH DEVS AS (
+	SELECT
+		DISTINCT BBL AS BATCH_BBL,
+		DEVELOPMENT
+	FROM NYCHA_BBLS_24
+	WHERE DEVELOPMENT !~* 'POLICE SERVICE AREA'
+	AND BBL = ANY(%(bbls)s)
+),
+
+DEV_BBLS AS (
+	SELECT DISTINCT ON (D.BATCH_BBL, N.BBL)
+		D.BATCH_BBL,
+		N.DEVELOPMENT,
+		N.BBL,
+		P.UNITSRES, 
+		E.EVICTIONS
+	FROM DEVS D
+	INNER JOIN NYCHA_BBLS_24 N USING(DEVELOPMENT)
+	LEFT JOIN PLUTO_LATEST P ON P.BBL = N.BBL
+	LEFT JOIN (
+		SELECT BBL, COUNT(*) EVICTIONS FROM MARSHAL_EVICTIONS_ALL 
+		WHERE RESIDENTIALCOMMERCIALIND = 'RESIDENTIAL'
+		GROUP BY BBL
+	) E ON E.BBL = N.BBL
+),
+
+NYCHA_STATS AS (
+    SELECT 
+        BATCH_BBL AS BBL,
+        STRING_AGG(DISTINCT DEVELOPMENT, ' / ') NYCHA_DEVELOPMENT,
+        SUM(EVICTIONS) NYCHA_DEV_EVICTIONS,
+        SUM(UNITSRES) NYCHA_DEV_UNITSRES
+    FROM DEV_BBLS
+    GROUP BY BATCH_BBL
+), 
+
+HPD_REG AS (
+	SELECT 
+		BBL,
+		MAX(LASTREGISTRATIONDATE) AS LASTREGISTRATIONDATE,
+		MAX(REGISTRATIONENDDATE) AS REGISTRATIONENDDATE
+	FROM HPD_REGISTRATIONS
+	WHERE BBL = ANY(%(bbls)s)
+	GROUP BY BBL
+)
+
+SELECT 
+	BBL AS BATCH_BBL,
+	ADDRESS FORMATTED_ADDRESS,
+	SPLIT_PART( ADDRESS, ' ' , 1 ) HOUSENUMBER,
+	SUBSTR(ADDRESS, STRPOS(ADDRESS, ' ') + 1) STREETNAME,
+    BLDGCLASS,
+	COALESCE(UNITSRES, 0) as UNITSRES,
+    CASE 
+      WHEN BOROUGH = 'MN' THEN 'MANHATTAN'
+      WHEN BOROUGH = 'BX' THEN 'BRONX' 
+      WHEN BOROUGH = 'BK' THEN 'BROOKLYN' 
+      WHEN BOROUGH = 'QN' THEN 'QUEENS' 
+      WHEN BOROUGH = 'SI' THEN 'STATEN ISLAND' 
+      ELSE '' END BORO,
+	LASTREGISTRATIONDATE,
+	REGISTRATIONENDDATE,
+	LATITUDE,
+	LONGITUDE,
+    NYCHA_DEVELOPMENT,
+    NYCHA_DEV_EVICTIONS,
+    NYCHA_DEV_UNITSRES
+   FROM PLUTO_LATEST
+   LEFT JOIN NYCHA_STATS USING(BBL)
+   LEFT JOIN HPD_REG USING(BBL)
+   WHERE BBL = ANY(%(bbls)s)
@@ -0,0 +1,16 @@
+-- Like address_latestdeed.sql, but finds the most recent deed for every
+-- BBL in the given array.
+SELECT DISTINCT ON (L.BBL)
+    L.BBL AS BATCH_BBL,
+    M.DOCUMENTID, 
+    COALESCE(M.DOCDATE, M.RECORDEDFILED) AS DOCDATE, 
+    M.DOCAMOUNT, 
+    M.DOCTYPE, 
+    L.BBL
+FROM REAL_PROPERTY_MASTER AS M
+LEFT JOIN REAL_PROPERTY_LEGALS AS L 
+    USING(DOCUMENTID)
+WHERE M.DOCTYPE = 'DEED' 
+	AND M.DOCAMOUNT > 1
+	AND L.BBL = ANY(%(bbls)s)
+ORDER BY L.BBL, M.DOCDATE DESC NULLS LAST;
@@ -1,15 +1,17 @@
 -- Select a subset of WOW_BLDGS that only contains
--- BBLs within the same portfolio
+-- BBLs within the same portfolio. Values are cast to
+-- the types our API returns them as, so this can also
+-- be rendered as JSON by Postgres.
 SELECT 
 	WOW_BLDGS.HOUSENUMBER,
 	WOW_BLDGS.STREETNAME,
 	WOW_BLDGS.ZIP,
 	WOW_BLDGS.BORO,
-	WOW_BLDGS.REGISTRATIONID,
+	WOW_BLDGS.REGISTRATIONID::TEXT AS REGISTRATIONID,
 	WOW_BLDGS.LASTREGISTRATIONDATE,
 	WOW_BLDGS.REGISTRATIONENDDATE,
 	WOW_BLDGS.BBL,
-	WOW_BLDGS.BIN,
+	WOW_BLDGS.BIN::TEXT AS BIN,
 	WOW_BLDGS.HPDBUILDINGID,
 	WOW_BLDGS.HPDBUILDINGS,
 	WOW_BLDGS.CORPNAMES,
@@ -35,11 +37,12 @@ SELECT
 	WOW_BLDGS.YEARSTARTED421A,
 	WOW_BLDGS.LASTSALEACRISID,
 	WOW_BLDGS.LASTSALEDATE,
-	WOW_BLDGS.LASTSALEAMOUNT,
+	TRUNC(WOW_BLDGS.LASTSALEAMOUNT)::BIGINT AS LASTSALEAMOUNT,
 	WOW_BLDGS.EVICTIONFILINGS
 FROM WOW_BLDGS
-WHERE BBL = ANY(
-	SELECT UNNEST(BBLS)
-	FROM WOW_PORTFOLIOS
-	WHERE %(bbl)s = ANY(BBLS)
+WHERE BBL IN (
+	SELECT MEMBERS.BBL
+	FROM WOW_BBL_PORTFOLIO AS PORTFOLIO
+	INNER JOIN WOW_BBL_PORTFOLIO AS MEMBERS USING(PORTFOLIO_ID)
+	WHERE PORTFOLIO.BBL = %(bbl)s
 );
\ No newline at end of file
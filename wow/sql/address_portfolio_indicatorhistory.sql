@@ -0,0 +1,78 @@
+WITH TIME_SERIES AS (
+      SELECT TO_CHAR(I::DATE , 'YYYY-MM') AS MONTH 
+      FROM GENERATE_SERIES('2007-01-01', CURRENT_DATE - INTERVAL '1 MONTH', '1 MONTH'::INTERVAL) I
+    ),
+
+    -- All the BBLs in the portfolio of the given BBL, or just the BBL
+    -- itself if it isn't in one.
+    PORTFOLIO_BBLS AS (
+      SELECT MEMBERS.BBL
+      FROM WOW_BBL_PORTFOLIO AS PORTFOLIO
+      INNER JOIN WOW_BBL_PORTFOLIO AS MEMBERS USING(PORTFOLIO_ID)
+      WHERE PORTFOLIO.BBL = %(bbl)s
+      UNION
+      SELECT %(bbl)s::CHAR(10) AS BBL
+    ),
+
+    INDICATORS AS (
+      SELECT
+        I.MONTH,
+        SUM(I.HPDVIOLATIONS_CLASS_A) AS HPDVIOLATIONS_CLASS_A,
+        SUM(I.HPDVIOLATIONS_CLASS_B) AS HPDVIOLATIONS_CLASS_B,
+        SUM(I.HPDVIOLATIONS_CLASS_C) AS HPDVIOLATIONS_CLASS_C,
+        SUM(I.HPDVIOLATIONS_CLASS_I) AS HPDVIOLATIONS_CLASS_I,
+        SUM(I.HPDVIOLATIONS_TOTAL) AS HPDVIOLATIONS_TOTAL,
+        SUM(I.HPDCOMPLAINTS_EMERGENCY) AS HPDCOMPLAINTS_EMERGENCY,
+        SUM(I.HPDCOMPLAINTS_NONEMERGENCY) AS HPDCOMPLAINTS_NONEMERGENCY,
+        SUM(I.HPDCOMPLAINTS_TOTAL) AS HPDCOMPLAINTS_TOTAL,
+        SUM(I.DOBPERMITS_TOTAL) AS DOBPERMITS_TOTAL,
+        SUM(I.DOBVIOLATIONS_REGULAR) AS DOBVIOLATIONS_REGULAR,
+        SUM(I.DOBVIOLATIONS_ECB) AS DOBVIOLATIONS_ECB,
+        SUM(I.DOBVIOLATIONS_TOTAL) AS DOBVIOLATIONS_TOTAL,
+        -- Like the single building timeline, we don't include eviction
+        -- filings for buildings with fewer than 11 residential units.
+        SUM(I.EVICTIONFILINGS_TOTAL) FILTER (
+          WHERE NOT COALESCE(PLUTO.UNITSRES < 11, FALSE)
+        ) AS EVICTIONFILINGS_TOTAL,
+        SUM(I.RENTSTABILIZEDUNITS_TOTAL) AS RENTSTABILIZEDUNITS_TOTAL
+      FROM PORTFOLIO_BBLS AS P
+      INNER JOIN WOW_INDICATOR_MONTHLY AS I USING(BBL)
+      LEFT JOIN (
+        SELECT BBL, COALESCE(UNITSRES, 0) AS UNITSRES FROM PLUTO_LATEST
+      ) AS PLUTO USING(BBL)
+      WHERE I.MONTH >= '2007-01'
+      GROUP BY I.MONTH
+    ),
+
+    -- Whether any building in the portfolio is big enough for us to
+    -- show its eviction filings.
+    HAS_EVICTIONFILINGS AS (
+      SELECT BOOL_OR(NOT COALESCE(PLUTO.UNITSRES < 11, FALSE)) AS VALUE
+      FROM PORTFOLIO_BBLS AS P
+      LEFT JOIN (
+        SELECT BBL, COALESCE(UNITSRES, 0) AS UNITSRES FROM PLUTO_LATEST
+      ) AS PLUTO USING(BBL)
+    )
+
+  SELECT 
+      T.MONTH,
+      COALESCE(HPDVIOLATIONS_CLASS_A, 0) AS HPDVIOLATIONS_CLASS_A,
+      COALESCE(HPDVIOLATIONS_CLASS_B, 0) AS HPDVIOLATIONS_CLASS_B,
+      COALESCE(HPDVIOLATIONS_CLASS_C, 0) AS HPDVIOLATIONS_CLASS_C,
+      COALESCE(HPDVIOLATIONS_CLASS_I, 0) AS HPDVIOLATIONS_CLASS_I,
+      COALESCE(HPDVIOLATIONS_TOTAL, 0) AS HPDVIOLATIONS_TOTAL,
+      COALESCE(HPDCOMPLAINTS_EMERGENCY, 0) AS HPDCOMPLAINTS_EMERGENCY,
+      COALESCE(HPDCOMPLAINTS_NONEMERGENCY, 0) AS HPDCOMPLAINTS_NONEMERGENCY,
+      COALESCE(HPDCOMPLAINTS_TOTAL, 0) AS HPDCOMPLAINTS_TOTAL,
+      COALESCE(DOBPERMITS_TOTAL, 0) AS DOBPERMITS_TOTAL,
+      COALESCE(DOBVIOLATIONS_REGULAR, 0) AS DOBVIOLATIONS_REGULAR,
+      COALESCE(DOBVIOLATIONS_ECB, 0) AS DOBVIOLATIONS_ECB,
+      COALESCE(DOBVIOLATIONS_TOTAL, 0) AS DOBVIOLATIONS_TOTAL,
+      CASE 
+        WHEN (SELECT VALUE FROM HAS_EVICTIONFILINGS) THEN COALESCE(EVICTIONFILINGS_TOTAL, 0)
+        ELSE NULL
+      END AS EVICTIONFILINGS_TOTAL,
+      COALESCE(RENTSTABILIZEDUNITS_TOTAL, 0) AS RENTSTABILIZEDUNITS_TOTAL
+  FROM TIME_SERIES T
+  LEFT JOIN INDICATORS I ON T.MONTH = I.MONTH
+  ORDER BY T.MONTH ASC
@@ -1,6 +1,6 @@
 -- For a given bbl, find the size of its
 -- associated portfolio
-SELECT ARRAY_LENGTH(BBLS,1) AS PORTFOLIO_SIZE
-FROM WOW_PORTFOLIOS
-WHERE %(bbl)s = ANY(BBLS)
+SELECT PORTFOLIO_SIZE
+FROM WOW_BBL_PORTFOLIO
+WHERE BBL = %(bbl)s
 LIMIT 1;
@@ -0,0 +1,8 @@
+-- For every bbl in the given array, find the size of its
+-- associated portfolio
+SELECT DISTINCT ON (BBL)
+    BBL AS BATCH_BBL,
+    PORTFOLIO_SIZE
+FROM WOW_BBL_PORTFOLIO
+WHERE BBL = ANY(%(bbls)s)
+ORDER BY BBL;
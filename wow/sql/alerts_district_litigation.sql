@@ -23,7 +23,7 @@ WHERE bbl IS NOT NULL
 		x.coun_dist = ANY(%(coun_dist)s)
 		or x.nta = ANY(%(nta)s)
 		or x.census_tract = ANY(%(census_tract)s)
-		or x.community_dist = ANY(%(community_dist)s::int[])
+		or x.community_dist = ANY(%(community_dist)s::TEXT[]::INT[])
 		or x.assem_dist = ANY(%(assem_dist)s)
 		or x.stsen_dist = ANY(%(stsen_dist)s)
 		or x.zipcode = ANY(%(zipcode)s)
@@ -0,0 +1,43 @@
+-- Like alerts_district_litigation.sql, but for the union of the districts of
+-- many subscribers. Since each subscriber gets the 10 most recent cases in
+-- their own districts, and a count of all of them, every case is returned,
+-- along with the districts of its building.
+WITH last_updated AS (
+	SELECT 
+		(VALUE::date - interval '1' DAY) AS last_updated
+	FROM dataset_tracker
+	WHERE KEY = 'hpd_litigations'
+)
+SELECT 
+	bbl,
+	x.housenumber,
+	x.streetname,
+	x.boro,
+	l.caseopendate,
+	l.casetype,
+	l.respondent,
+	d.last_updated,
+	x.coun_dist,
+	x.nta,
+	x.census_tract,
+	x.community_dist,
+	x.assem_dist,
+	x.stsen_dist,
+	x.zipcode
+FROM last_updated AS d, 
+	wow_indicators AS x
+LEFT JOIN hpd_litigations as l using(bbl)
+WHERE bbl IS NOT NULL
+	and (
+		x.coun_dist = ANY(%(coun_dist)s)
+		or x.nta = ANY(%(nta)s)
+		or x.census_tract = ANY(%(census_tract)s)
+		or x.community_dist = ANY(%(community_dist)s::TEXT[]::INT[])
+		or x.assem_dist = ANY(%(assem_dist)s)
+		or x.stsen_dist = ANY(%(stsen_dist)s)
+		or x.zipcode = ANY(%(zipcode)s)
+	)
+	and l.casetype IN ('Tenant Action', 'Tenant Action/Harrassment', 'Heat and Hot Water')
+	and l.caseopendate > (d.last_updated - interval '30' day)
+	and l.caseopendate < CURRENT_DATE
+ORDER BY l.caseopendate DESC;
@@ -22,7 +22,7 @@ WHERE bbl IS NOT NULL
 		coun_dist = ANY(%(coun_dist)s)
 		or nta = ANY(%(nta)s)
 		or census_tract = ANY(%(census_tract)s)
-		or community_dist = ANY(%(community_dist)s::int[])
+		or community_dist = ANY(%(community_dist)s::TEXT[]::INT[])
 		or assem_dist = ANY(%(assem_dist)s)
 		or stsen_dist = ANY(%(stsen_dist)s)
 		or zipcode = ANY(%(zipcode)s)
@@ -0,0 +1,41 @@
+-- Like alerts_district_sale.sql, but for the union of the districts of many
+-- subscribers. Since each subscriber gets the 10 most recent sales in their
+-- own districts, and a count of all of them, every sale is returned, along
+-- with the districts of its building.
+WITH last_updated AS (
+	SELECT 
+		(VALUE::date - interval '1' DAY) AS last_updated
+	FROM dataset_tracker
+	WHERE KEY = 'acris'
+)
+SELECT 
+	bbl,
+	housenumber,
+	streetname,
+	boro,
+	lastsaleacrisid,
+	lastsaleamount,
+	lastsaledate,
+	d.last_updated,
+	coun_dist,
+	nta,
+	census_tract,
+	community_dist,
+	assem_dist,
+	stsen_dist,
+	zipcode
+FROM last_updated AS d,
+	wow_indicators
+WHERE bbl IS NOT NULL
+	and (
+		coun_dist = ANY(%(coun_dist)s)
+		or nta = ANY(%(nta)s)
+		or census_tract = ANY(%(census_tract)s)
+		or community_dist = ANY(%(community_dist)s::TEXT[]::INT[])
+		or assem_dist = ANY(%(assem_dist)s)
+		or stsen_dist = ANY(%(stsen_dist)s)
+		or zipcode = ANY(%(zipcode)s)
+	)
+	and lastsaledate > (d.last_updated - interval '30' day)
+	and lastsaleamount >= 10000
+ORDER BY lastsaledate DESC;
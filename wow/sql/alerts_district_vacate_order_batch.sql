@@ -0,0 +1,40 @@
+-- Like alerts_district_vacate_order.sql, but for the union of the districts
+-- of many subscribers. The districts of each building are included, so that
+-- its rows can be given to each subscriber whose districts it's in.
+SELECT 
+	bbl,
+	housenumber,
+	streetname,
+	boro,
+	unitsres,
+	hpd_vacate_date,
+	hpd_vacate_type,
+	hpd_vacate_units_affected,
+	hpd_vacate_reason,
+	hpd_link,
+	dob_vacate_bin,
+	dob_vacate_date,
+	dob_vacate_type,
+	dob_vacate_complaint_number,
+	COALESCE(dob_vacate_date, hpd_vacate_date) AS vacate_date,
+	coun_dist,
+	nta,
+	census_tract,
+	community_dist,
+	assem_dist,
+	stsen_dist,
+	zipcode
+FROM wow_indicators
+WHERE bbl IS NOT NULL
+	and (
+		coun_dist = ANY(%(coun_dist)s)
+		or nta = ANY(%(nta)s)
+		or census_tract = ANY(%(census_tract)s)
+		or community_dist = ANY(%(community_dist)s::TEXT[]::INT[])
+		or assem_dist = ANY(%(assem_dist)s)
+		or stsen_dist = ANY(%(stsen_dist)s)
+		or zipcode = ANY(%(zipcode)s)
+	)
+	and (dob_vacate_date is not null
+	or hpd_vacate_date is not null)
+ORDER BY bbl;
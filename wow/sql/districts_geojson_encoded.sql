@@ -0,0 +1,15 @@
+-- The pre-rendered district geojson response body of the given version,
+-- in the best content encoding the client accepts.
+SELECT
+    CASE
+        WHEN %(accepts_br)s AND br IS NOT NULL THEN 'br'
+        WHEN %(accepts_gzip)s AND gzip IS NOT NULL THEN 'gzip'
+        ELSE 'identity'
+    END AS encoding,
+    CASE
+        WHEN %(accepts_br)s AND br IS NOT NULL THEN br
+        WHEN %(accepts_gzip)s AND gzip IS NOT NULL THEN gzip
+        ELSE identity
+    END AS content
+FROM wow_districts_geojson_encoded
+WHERE district_type = %(district_type)s AND content_hash = %(content_hash)s
@@ -0,0 +1,3 @@
+SELECT content_hash
+FROM wow_districts_geojson_encoded
+WHERE district_type = %(district_type)s AND content_hash IS NOT NULL
@@ -0,0 +1,15 @@
+-- The vector tile of the shapes of the given type of district at the given
+-- zoom level and tile coordinates.
+WITH bounds AS (
+    SELECT ST_TileEnvelope(%(z)s::INT, %(x)s::INT, %(y)s::INT) AS geom
+), features AS (
+    SELECT
+        d.typevalue AS "typeValue",
+        d.areavalue AS "areaValue",
+        d.arealabel AS "areaLabel",
+        ST_AsMVTGeom(d.geom_3857, bounds.geom) AS geom
+    FROM wow_districts_geom AS d, bounds
+    WHERE d.typevalue = %(district_type)s AND d.geom_3857 && bounds.geom
+)
+SELECT ST_AsMVT(features, 'districts') AS tile
+FROM features
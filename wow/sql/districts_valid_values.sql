@@ -0,0 +1,8 @@
+-- The values of all the districts of each type that Area Alerts subscribers
+-- can select.
+SELECT
+	typevalue,
+	array_agg(DISTINCT areavalue) AS areavalues
+FROM wow_districts_geom
+WHERE areavalue IS NOT NULL
+GROUP BY typevalue
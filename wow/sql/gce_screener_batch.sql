@@ -0,0 +1,20 @@
+SELECT
+    bbl AS batch_bbl,
+    bbl,
+    unitsres,
+    wow_portfolio_units,
+    wow_portfolio_bbls,
+    bldgclass,
+    yearbuilt,
+    co_issued,
+    co_bin,
+    post_hstpa_rs_units,
+    is_nycha,
+    is_subsidized,
+    subsidy_name,
+    end_421a,
+    end_j51,
+    acris_docs,
+    related_properties
+FROM gce_screener
+WHERE bbl = ANY(%(bbls)s)
@@ -0,0 +1,122 @@
+from datetime import datetime, timezone
+from unittest.mock import patch
+from django.http import JsonResponse
+from django.test import RequestFactory
+import pytest
+
+from wow import apiutil
+from wow.cache import BuildInfo
+
+
+BUILD_INFO = BuildInfo("v1", datetime(2024, 1, 2, tzinfo=timezone.utc))
+
+DATASET_UPDATES = {
+    "hpd_registrations": datetime(2024, 1, 1, tzinfo=timezone.utc),
+    "acris": datetime(2024, 1, 3, tzinfo=timezone.utc),
+}
+
+
+class TestApi:
+    @pytest.fixture(autouse=True)
+    def setup_fixture(self, settings):
+        settings.WOW_API_CACHE_MAX_AGE = 300
+        self.calls = []
+        with patch.object(
+            apiutil, "get_build_info", return_value=BUILD_INFO
+        ) as get_build_info, patch.object(
+            apiutil, "get_dataset_updates", return_value=DATASET_UPDATES
+        ):
+            self.get_build_info = get_build_info
+            yield
+
+    def make_view(self, **options):
+        def view(request):
+            self.calls.append(request)
+            return JsonResponse({"result": []})
+
+        return apiutil.api(**options)(view) if options else apiutil.api(view)
+
+    def test_it_sets_validators_and_cache_control(self):
+        res = self.make_view()(RequestFactory().get("/"))
+        assert res.status_code == 200
+        assert res["ETag"].startswith('W/"')
+        assert res["Last-Modified"] == "Tue, 02 Jan 2024 00:00:00 GMT"
+        assert res["Cache-Control"] == "public, max-age=300"
+
+    def test_it_returns_304_without_calling_the_view(self):
+        view = self.make_view(max_age=60)
+        etag = view(RequestFactory().get("/"))["ETag"]
+        res = view(RequestFactory().get("/", HTTP_IF_NONE_MATCH=etag))
+        assert res.status_code == 304
+        assert res["ETag"] == etag
+        assert res["Cache-Control"] == "public, max-age=60"
+        assert res["Access-Control-Allow-Origin"] == "*"
+        assert len(self.calls) == 1
+
+    def test_it_returns_304_if_not_modified_since(self):
+        res = self.make_view()(
+            RequestFactory().get(
+                "/", HTTP_IF_MODIFIED_SINCE="Tue, 02 Jan 2024 00:00:00 GMT"
+            )
+        )
+        assert res.status_code == 304
+        assert self.calls == []
+
+    def test_etags_change_with_the_build(self):
+        view = self.make_view()
+        etag = view(RequestFactory().get("/"))["ETag"]
+        self.get_build_info.return_value = BUILD_INFO._replace(version="v2")
+        res = view(RequestFactory().get("/", HTTP_IF_NONE_MATCH=etag))
+        assert res.status_code == 200
+        assert res["ETag"] != etag
+
+    def test_it_uses_dataset_updates(self):
+        res = self.make_view(datasets=["acris"])(RequestFactory().get("/"))
+        assert res["Last-Modified"] == "Wed, 03 Jan 2024 00:00:00 GMT"
+        assert res["ETag"] != self.make_view()(RequestFactory().get("/"))["ETag"]
+
+    def test_etags_change_when_datasets_are_updated(self):
+        view = self.make_view(datasets=["acris"])
+        etag = view(RequestFactory().get("/"))["ETag"]
+        updates = {
+            **DATASET_UPDATES,
+            "acris": datetime(2024, 1, 4, tzinfo=timezone.utc),
+        }
+        with patch.object(apiutil, "get_dataset_updates", return_value=updates):
+            res = view(RequestFactory().get("/", HTTP_IF_NONE_MATCH=etag))
+        assert res.status_code == 200
+        assert res["ETag"] != etag
+        assert res["Last-Modified"] == "Thu, 04 Jan 2024 00:00:00 GMT"
+
+    def test_it_works_without_build_info(self):
+        self.get_build_info.return_value = None
+        res = self.make_view()(RequestFactory().get("/", HTTP_IF_NONE_MATCH="*"))
+        assert res.status_code == 200
+        assert "ETag" not in res
+        assert res["Cache-Control"] == "public, max-age=300"
+
+    def test_it_marks_immutable_responses(self):
+        res = self.make_view(max_age=100, immutable=True)(RequestFactory().get("/"))
+        assert res["Cache-Control"] == "public, max-age=100, immutable"
+
+    def test_it_does_not_cache_uncacheable_endpoints(self):
+        res = self.make_view(cacheable=False)(RequestFactory().get("/"))
+        assert res.status_code == 200
+        assert "ETag" not in res
+        assert res["Cache-Control"] == "private, no-store"
+
+    def test_it_does_not_cache_posts(self):
+        res = self.make_view()(RequestFactory().post("/", HTTP_IF_NONE_MATCH="*"))
+        assert res.status_code == 200
+        assert "ETag" not in res
+        assert "Cache-Control" not in res
+
+    def test_it_does_not_cache_errors(self):
+        @apiutil.api
+        def view(request):
+            raise apiutil.AuthorizationError("nope")
+
+        res = view(RequestFactory().get("/"))
+        assert res.status_code == 401
+        assert "ETag" not in res
+        assert "Cache-Control" not in res
@@ -0,0 +1,121 @@
+from datetime import datetime, timezone
+from unittest.mock import patch
+import pytest
+
+from wow import cache
+
+
+class TestLruResponseCache:
+    def test_it_returns_none_on_miss(self):
+        lru = cache.LruResponseCache(max_bytes=100)
+        assert lru.get("boop") is None
+        assert lru.misses == 1
+
+    def test_it_returns_cached_values(self):
+        lru = cache.LruResponseCache(max_bytes=100)
+        lru.set("boop", b"hi")
+        assert lru.get("boop") == b"hi"
+        assert lru.hits == 1
+        assert lru.size == len("boop") + len(b"hi")
+
+    def test_it_evicts_least_recently_used_entries(self):
+        lru = cache.LruResponseCache(max_bytes=25)
+        lru.set("a", b"1" * 9)
+        lru.set("b", b"2" * 9)
+        lru.get("a")
+        lru.set("c", b"3" * 9)
+        assert lru.get("a") == b"1" * 9
+        assert lru.get("b") is None
+        assert lru.get("c") == b"3" * 9
+        assert lru.size <= 25
+
+    def test_it_does_not_cache_values_bigger_than_the_cap(self):
+        lru = cache.LruResponseCache(max_bytes=10)
+        lru.set("a", b"1" * 20)
+        assert len(lru) == 0
+        assert lru.size == 0
+
+    def test_replacing_a_value_updates_size(self):
+        lru = cache.LruResponseCache(max_bytes=100)
+        lru.set("a", b"1" * 20)
+        lru.set("a", b"1" * 5)
+        assert lru.size == 6
+
+
+class TestGetResponseCacheKey:
+    @pytest.fixture(autouse=True)
+    def setup_fixture(self):
+        with patch.object(cache, "get_build_version", return_value="v1") as m:
+            self.get_build_version = m
+            yield
+
+    def test_it_normalizes_param_order(self):
+        assert cache.get_response_cache_key(
+            "boop", {"a": 1, "b": 2}
+        ) == cache.get_response_cache_key("boop", {"b": 2, "a": 1})
+
+    def test_it_varies_by_endpoint_params_and_version(self):
+        key = cache.get_response_cache_key("boop", {"a": 1})
+        assert key != cache.get_response_cache_key("bap", {"a": 1})
+        assert key != cache.get_response_cache_key("boop", {"a": 2})
+        self.get_build_version.return_value = "v2"
+        assert key != cache.get_response_cache_key("boop", {"a": 1})
+
+    def test_it_varies_by_dataset_updates(self):
+        updates = {"acris": datetime(2024, 1, 1, tzinfo=timezone.utc)}
+        with patch.object(cache, "get_dataset_updates", return_value=updates):
+            key = cache.get_response_cache_key("boop", {"a": 1}, ["acris"])
+            assert key != cache.get_response_cache_key("boop", {"a": 1})
+            updates["acris"] = datetime(2024, 1, 2, tzinfo=timezone.utc)
+            assert key != cache.get_response_cache_key("boop", {"a": 1}, ["acris"])
+
+    def test_it_returns_none_without_a_build_version(self):
+        self.get_build_version.return_value = None
+        assert cache.get_response_cache_key("boop", {"a": 1}) is None
+
+    def test_it_returns_none_when_disabled(self, settings):
+        settings.WOW_RESPONSE_CACHE_MAX_BYTES = 0
+        assert cache.get_response_cache_key("boop", {"a": 1}) is None
+
+
+class TestCachedJsonResponse:
+    def test_it_only_gets_data_once(self, settings):
+        settings.WOW_RESPONSE_CACHE_ALIAS = None
+        calls = []
+
+        def get_data():
+            calls.append(1)
+            return {"result": [1, 2, 3]}
+
+        with patch.object(cache, "get_build_version", return_value="v1"), patch.object(
+            cache, "_response_cache", cache.ResponseCache(max_bytes=1000)
+        ):
+            first = cache.cached_json_response("boop", {"bbl": "1"}, get_data)
+            second = cache.cached_json_response("boop", {"bbl": "1"}, get_data)
+
+        assert first.content == second.content == b'{"result": [1, 2, 3]}'
+        assert second["Content-Type"] == "application/json"
+        assert len(calls) == 1
+
+
+class TestFetchBuildVersion:
+    def test_it_returns_latest_build_version(self, db):
+        assert cache.fetch_build_version() is not None
+
+
+class TestPeriodicallyFetchedValue:
+    def test_it_refetches_after_its_ttl(self, settings):
+        settings.WOW_BUILD_VERSION_TTL = 0
+        values = iter([1, 2])
+        value = cache.PeriodicallyFetchedValue(lambda: next(values))
+        assert value.get() == 1
+        assert value.get() == 2
+
+    def test_it_caches_values_until_reset(self, settings):
+        settings.WOW_BUILD_VERSION_TTL = 60
+        values = iter([1, 2])
+        value = cache.PeriodicallyFetchedValue(lambda: next(values))
+        assert value.get() == 1
+        assert value.get() == 1
+        value.reset()
+        assert value.get() == 2
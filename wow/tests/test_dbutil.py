@@ -1,3 +1,5 @@
+import pytest
+
 from wow import dbutil
 
 
@@ -5,3 +7,170 @@ class TestExecSql:
     def test_jsonb_is_retrieved_as_json(self, db):
         result = dbutil.exec_sql("""select '{"a":"b"}'::jsonb as value""")
         assert result == [{"value": {"a": "b"}}]
+
+
+def test_does_table_exist_works(db):
+    assert dbutil.does_table_exist("wow_bldgs")
+    assert not dbutil.does_table_exist("boop")
+
+
+class TestWowConnection:
+    def test_it_is_initialized(self, db, settings):
+        result = dbutil.exec_sql(
+            "SELECT current_setting('application_name') AS application_name, "
+            "current_setting('statement_timeout') AS statement_timeout"
+        )
+        assert result[0]["application_name"] == settings.WOW_DB_APPLICATION_NAME
+        assert result[0]["statement_timeout"] != "0"
+
+    def test_checkouts_are_counted(self, db):
+        checkouts = dbutil.get_connection_stats()["checkouts"]
+        dbutil.exec_sql("SELECT 1")
+        stats = dbutil.get_connection_stats()
+        assert stats["checkouts"] == checkouts + 1
+        assert stats["connects"] >= 1
+
+
+def test_connection_stats_are_logged_periodically(settings, caplog, monkeypatch):
+    settings.WOW_DB_STATS_LOG_INTERVAL = 60
+    monkeypatch.setattr(dbutil, "_connection_stats_logged_at", 1000.0)
+    with caplog.at_level("INFO", logger="wow.dbutil"):
+        dbutil.log_connection_stats_periodically(1030.0)
+        assert caplog.messages == []
+        dbutil.log_connection_stats_periodically(1060.0)
+        dbutil.log_connection_stats_periodically(1070.0)
+    assert len(caplog.messages) == 1
+    assert "WoW database connection stats: {'checkouts':" in caplog.messages[0]
+
+
+class TestIterDbFuncBatches:
+    def test_it_yields_batches_of_dicts(self, db):
+        batches = list(dbutil.iter_db_func_batches("generate_series", [1, 5], 2))
+        assert [len(batch) for batch in batches] == [2, 2, 1]
+        assert batches[0] == [{"generate_series": 1}, {"generate_series": 2}]
+
+    def test_its_cursor_is_not_holdable(self, db):
+        with dbutil.get_wow_server_side_cursor() as cursor:
+            cursor.execute("SELECT * FROM generate_series(1, 5)")
+            [row] = dbutil.exec_sql(
+                "SELECT is_holdable FROM pg_cursors WHERE name = %(name)s",
+                {"name": cursor.name},
+            )
+        assert row["is_holdable"] is False
+
+    def test_it_yields_nothing_for_empty_results(self, db):
+        assert list(dbutil.iter_db_func_batches("generate_series", [1, 0])) == []
+
+
+class TestRunDbTasksConcurrently:
+    def test_it_returns_results_and_timings(self):
+        results, timings = dbutil.run_db_tasks_concurrently(
+            {"a": lambda: 1, "b": lambda: "boop"}
+        )
+        assert results == {"a": 1, "b": "boop"}
+        assert set(timings.keys()) == {"a", "b"}
+        assert all(timing >= 0 for timing in timings.values())
+
+    def test_it_reraises_exceptions(self):
+        def kaboom():
+            raise ValueError("kaboom")
+
+        with pytest.raises(ValueError, match="kaboom"):
+            dbutil.run_db_tasks_concurrently({"a": lambda: 1, "b": kaboom})
+
+
+class TestRowMapper:
+    def test_it_applies_converters(self):
+        mapper = dbutil.RowMapper(["a", "b", "c"], {"a": str, "c": int})
+        assert mapper.map_row((1, 2.5, "3")) == {"a": "1", "b": 2.5, "c": 3}
+
+    def test_it_ignores_converters_for_missing_columns(self):
+        mapper = dbutil.RowMapper(["a"], {"boop": str})
+        assert mapper.map_rows([(1,), (2,)]) == [{"a": 1}, {"a": 2}]
+
+    def test_it_is_created_from_cursor_description(self):
+        mapper = dbutil.RowMapper.from_description([("a", 23), ("b", 25)])
+        assert mapper.columns == ("a", "b")
+
+
+class TestNamedQuery:
+    def test_it_converts_named_params_to_positional_params(self):
+        query = dbutil.NamedQuery.from_sql(
+            "boop",
+            "SELECT * FROM foo WHERE bbl = %(bbl)s OR %(bbl)s = ANY(%(bbls)s);\n",
+        )
+        assert query.param_names == ["bbl", "bbls"]
+        assert query.prepared_sql == "SELECT * FROM foo WHERE bbl = $1 OR $1 = ANY($2)"
+        assert query.statement_name == "wow_boop"
+        assert query.is_preparable
+
+    def test_it_unescapes_percent_signs(self):
+        query = dbutil.NamedQuery.from_sql("boop", "SELECT 'a' LIKE '%%a'")
+        assert query.prepared_sql == "SELECT 'a' LIKE '%a'"
+
+    def test_multiple_statements_are_not_preparable(self):
+        query = dbutil.NamedQuery.from_sql(
+            "boop", "CREATE TEMPORARY TABLE x AS (SELECT 1); SELECT * FROM x;"
+        )
+        assert not query.is_preparable
+
+    def test_as_json_wraps_the_query(self):
+        query = dbutil.NamedQuery.from_sql(
+            "boop", "SELECT * FROM foo WHERE bbl = %(bbl)s -- hi\n;"
+        ).as_json()
+        assert query.name == "boop__json"
+        assert query.param_names == ["bbl"]
+        assert query.prepared_sql == (
+            "SELECT COALESCE(json_agg(q), '[]'::json)::text AS json FROM (\n"
+            "SELECT * FROM foo WHERE bbl = $1 -- hi\n"
+            "\n) AS q"
+        )
+
+    def test_all_wow_queries_are_loaded(self):
+        registry = dbutil.get_query_registry()
+        assert "address_buildinginfo" in registry.queries
+        assert registry.get("address_buildinginfo").param_names == ["bbl"]
+        assert registry.get("alerts_district").is_preparable
+
+
+class TestQueryRegistry:
+    def make_registry(self, tmp_path, name):
+        # Prepared statements outlive our registries on the test database
+        # connection, so each test needs its own query name.
+        (tmp_path / f"{name}.sql").write_text("SELECT %(num)s::int * 2 AS value;")
+        return dbutil.QueryRegistry(tmp_path)
+
+    def test_it_prepares_once_per_connection(self, db, tmp_path):
+        registry = self.make_registry(tmp_path, "double_once")
+        assert registry.execute("double_once", {"num": 2}) == [{"value": 4}]
+        assert registry.execute("double_once", {"num": 3}) == [{"value": 6}]
+        stats = registry.get_stats()["double_once"]
+        assert stats["calls"] == 2
+        assert stats["prepares"] == 1
+
+    def test_it_works_without_prepared_statements(self, db, tmp_path, settings):
+        settings.WOW_USE_PREPARED_STATEMENTS = False
+        registry = self.make_registry(tmp_path, "double_unprepared")
+        assert registry.execute("double_unprepared", {"num": 2}) == [{"value": 4}]
+        assert registry.get_stats()["double_unprepared"]["prepares"] == 0
+
+    def test_it_reprepares_deallocated_statements(self, transactional_db, tmp_path):
+        registry = self.make_registry(tmp_path, "double_again")
+        registry.execute("double_again", {"num": 2})
+        with dbutil.get_wow_cursor() as cursor:
+            cursor.execute("DEALLOCATE PREPARE ALL")
+        assert registry.execute("double_again", {"num": 5}) == [{"value": 10}]
+        assert registry.get_stats()["double_again"]["prepares"] == 2
+
+    def test_it_renders_json(self, db, tmp_path):
+        registry = self.make_registry(tmp_path, "double_json")
+        assert registry.execute_json("double_json", {"num": 2}) == b'[{"value":4}]'
+
+    def test_it_discards_temporary_tables(self, db, tmp_path):
+        (tmp_path / "temp_table.sql").write_text(
+            "CREATE TEMPORARY TABLE x AS (SELECT %(num)s::int AS value);\n"
+            "SELECT * FROM x;"
+        )
+        registry = dbutil.QueryRegistry(tmp_path)
+        assert registry.execute("temp_table", {"num": 1}) == [{"value": 1}]
+        assert registry.execute("temp_table", {"num": 2}) == [{"value": 2}]
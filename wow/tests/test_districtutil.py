@@ -0,0 +1,57 @@
+import pytest
+
+from wow.districtutil import (
+    DISTRICT_TYPES,
+    group_rows_by_selection,
+    normalize_district_selection,
+    parse_district_values,
+)
+
+
+def make_row(bbl, **districts):
+    return {
+        "bbl": bbl,
+        **{district_type: None for district_type in DISTRICT_TYPES},
+        **districts,
+    }
+
+
+class TestNormalizeDistrictSelection:
+    def test_equal_selections_are_equal(self):
+        a = normalize_district_selection({"nta": ["b", "a"], "zipcode": ["11201"]})
+        b = normalize_district_selection({"zipcode": ["11201"], "nta": ["a", "b", "a"]})
+        assert a == b
+
+    def test_empty_district_types_are_ignored(self):
+        assert normalize_district_selection({"nta": [], "coun_dist": []}) == ()
+
+
+class TestGroupRowsBySelection:
+    def test_it_works(self):
+        council = normalize_district_selection({"coun_dist": ["33"]})
+        community = normalize_district_selection({"community_dist": ["302"]})
+        both = normalize_district_selection(
+            {"coun_dist": ["33"], "community_dist": ["302"]}
+        )
+        rows = [
+            make_row("1", coun_dist="33", community_dist=302),
+            make_row("2", coun_dist="33"),
+            make_row("3", community_dist=302),
+            make_row("4", coun_dist="1"),
+        ]
+        result = group_rows_by_selection(rows, [council, community, both])
+        assert [row["bbl"] for row in result[council]] == ["1", "2"]
+        assert [row["bbl"] for row in result[community]] == ["1", "3"]
+        assert [row["bbl"] for row in result[both]] == ["1", "2", "3"]
+        assert result[council][0] == {"bbl": "1"}
+
+
+class TestParseDistrictValues:
+    @pytest.mark.parametrize("value", ["[boop", '["1", null]', '[["1"]]', "[true]", 5])
+    def test_it_raises_on_invalid_values(self, value):
+        with pytest.raises(ValueError):
+            parse_district_values(value)
+
+    def test_it_parses_empty_values(self):
+        assert parse_district_values("") == []
+        assert parse_district_values("[]") == []
@@ -0,0 +1,55 @@
+from unittest.mock import patch
+import pytest
+
+from wow import tileutil
+
+
+class TestIterTiles:
+    def test_it_covers_the_bounds(self):
+        tiles = list(tileutil.iter_tiles(tileutil.NYC_BOUNDS, [14]))
+        assert len(tiles) == len(set(tiles))
+        assert tileutil.lonlat_to_tile(-74.0, 40.7, 14) in [(x, y) for _, x, y in tiles]
+
+    def test_it_yields_one_tile_at_zoom_zero(self):
+        assert list(tileutil.iter_tiles(tileutil.NYC_BOUNDS, [0])) == [(0, 0, 0)]
+
+
+class TestGetDistrictTile:
+    @pytest.fixture(autouse=True)
+    def setup_fixture(self, settings, tmp_path):
+        settings.WOW_DISTRICT_TILE_CACHE_DIR = str(tmp_path)
+        self.cache_dir = tmp_path
+        with patch.object(
+            tileutil, "get_build_version", return_value="v1"
+        ) as get_build_version, patch.object(
+            tileutil, "fetch_district_tile", return_value=b"tile"
+        ) as fetch_district_tile:
+            self.get_build_version = get_build_version
+            self.fetch_district_tile = fetch_district_tile
+            yield
+
+    def test_it_caches_tiles_on_disk(self):
+        assert tileutil.get_district_tile("nta", (10, 301, 385)) == b"tile"
+        assert tileutil.get_district_tile("nta", (10, 301, 385)) == b"tile"
+        assert self.fetch_district_tile.call_count == 1
+        path = self.cache_dir / "v1" / "nta" / "10" / "301" / "385.mvt"
+        assert path.read_bytes() == b"tile"
+
+    def test_it_does_not_cache_without_a_build_version(self):
+        self.get_build_version.return_value = None
+        tileutil.get_district_tile("nta", (10, 301, 385))
+        tileutil.get_district_tile("nta", (10, 301, 385))
+        assert self.fetch_district_tile.call_count == 2
+        assert list(self.cache_dir.iterdir()) == []
+
+    def test_it_does_not_cache_when_disabled(self, settings):
+        settings.WOW_DISTRICT_TILE_CACHE_DIR = ""
+        tileutil.get_district_tile("nta", (10, 301, 385))
+        assert list(self.cache_dir.iterdir()) == []
+
+    def test_warming_and_pruning_work(self):
+        (self.cache_dir / "v0").mkdir()
+        count = tileutil.warm_district_tile_cache(["nta"], [9])
+        tileutil.prune_district_tile_cache()
+        assert count == self.fetch_district_tile.call_count == 2
+        assert [path.name for path in self.cache_dir.iterdir()] == ["v1"]
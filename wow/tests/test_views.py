@@ -1,4 +1,7 @@
 import csv
+from datetime import datetime, timezone
+import gzip
+import json
 from typing import Any, Dict, List
 from io import StringIO
 from django.urls import path
@@ -6,9 +9,12 @@ from django.test import Client
 from django.conf import settings
 import pytest
 
+from wow import apiutil, views
 from wow.apiutil import api
+from wow.dbutil import exec_sql
+from wow.districtutil import get_valid_districts
 from project.urls import handler500  # noqa
-from wow.views import _fixup_addr_for_csv
+from wow.views import _fixup_addr_for_csv, render_json_object
 
 
 @api
@@ -72,6 +78,13 @@ class TestAddressAggregate(ApiTest):
         assert res.status_code == 200
         assert len(res.json()["result"]) > 0
 
+    def test_it_returns_empty_aggregate_for_unregistered_bbl(self, db, client):
+        res = client.get("/api/address/aggregate?bbl=9999999999")
+        assert res.status_code == 200
+        [result] = res.json()["result"]
+        assert result["bldgs"] == 0
+        assert result["units"] is None
+
 
 class TestAddressDapAggregate(ApiTest):
     HTTP_400_URLS = [
@@ -128,6 +141,56 @@ class TestAddressIndicatorHistory(ApiTest):
         assert res.json()["result"] is not None
 
 
+class TestAddressPortfolioIndicatorHistory(ApiTest):
+    HTTP_400_URLS = [
+        "/api/address/portfolio/indicatorhistory",
+        "/api/address/portfolio/indicatorhistory?bbl=bop",
+    ]
+
+    def test_it_sums_the_history_of_every_building(self, db, client):
+        # Use a BBL from the largest portfolio, so there's something to sum.
+        [row] = exec_sql(
+            """
+            SELECT bbl FROM wow_bbl_portfolio WHERE portfolio_id = (
+                SELECT portfolio_id FROM wow_bbl_portfolio
+                GROUP BY portfolio_id ORDER BY count(*) DESC, portfolio_id LIMIT 1
+            ) ORDER BY bbl LIMIT 1
+            """
+        )
+        bbl = row["bbl"]
+        bbls = [
+            row["bbl"]
+            for row in exec_sql(
+                "SELECT members.bbl FROM wow_bbl_portfolio AS portfolio "
+                "INNER JOIN wow_bbl_portfolio AS members USING(portfolio_id) "
+                "WHERE portfolio.bbl = %(bbl)s",
+                {"bbl": bbl},
+            )
+        ]
+        assert len(bbls) > 1
+
+        res = client.get(f"/api/address/portfolio/indicatorhistory?bbl={bbl}")
+        assert res.status_code == 200
+        portfolio = res.json()["result"]
+        buildings = [
+            client.get(f"/api/address/indicatorhistory?bbl={b}").json()["result"]
+            for b in bbls
+        ]
+        for building in buildings:
+            assert [r["month"] for r in building] == [r["month"] for r in portfolio]
+        for i, portfolio_row in enumerate(portfolio):
+            for key, value in portfolio_row.items():
+                if key == "month":
+                    continue
+                values = [building[i][key] for building in buildings]
+                if all(v is None for v in values):
+                    # Eviction filings are left out for small buildings.
+                    assert value is None, (portfolio_row["month"], key)
+                else:
+                    expected = sum(v for v in values if v is not None)
+                    assert value == expected, (portfolio_row["month"], key)
+
+
 class TestAddressLatestDeed(ApiTest):
     HTTP_400_URLS = [
         "/api/address/latestdeed",
@@ -140,6 +203,136 @@ class TestAddressLatestDeed(ApiTest):
         assert res.json()["result"] is not None
 
 
+@pytest.mark.parametrize(
+    "url",
+    [
+        "/api/address/latestdeed?bbl=3012380016",
+        "/api/address/latestdeed/batch?bbls=3012380016",
+        "/api/address/bundle?bbl=3012380016",
+    ],
+)
+def test_etags_change_when_acris_is_updated(db, client, monkeypatch, url):
+    updates = {"acris": datetime(2024, 1, 1, tzinfo=timezone.utc)}
+    monkeypatch.setattr(apiutil, "get_dataset_updates", lambda: updates)
+    etag = client.get(url)["ETag"]
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 304
+    updates["acris"] = datetime(2024, 1, 2, tzinfo=timezone.utc)
+    res = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert res.status_code == 200
+    assert res["ETag"] != etag
+
+
+class TestAddressBundle(ApiTest):
+    HTTP_400_URLS = [
+        "/api/address/bundle",
+        "/api/address/bundle?bbl=bop",
+    ]
+
+    def test_it_works(self, db, client):
+        res = client.get("/api/address/bundle?bbl=3012380016")
+        assert res.status_code == 200
+        bundle = res.json()
+        sections = ["aggregate", "buildinginfo", "indicatorhistory"]
+        for section in ["wowza", "latestdeed"] + sections:
+            assert section in bundle
+            assert bundle["timings"][section] >= 0
+        assert bundle["wowza"]["geosearch"] == {"bbl": "3012380016"}
+        for section in sections:
+            standalone = client.get(f"/api/address/{section}?bbl=3012380016")
+            assert bundle[section] == standalone.json()
+
+
+class TestBatchEndpoints(ApiTest):
+    bbls = ["3012380016", "3016780054", "1011100001"]
+
+    HTTP_400_URLS = [
+        "/api/address/buildinginfo/batch",
+        "/api/address/buildinginfo/batch?bbls=bop",
+        "/api/address/buildinginfo/batch?bbls=3012380016,123",
+    ]
+
+    @pytest.mark.parametrize(
+        "endpoint",
+        [
+            "address/aggregate",
+            "address/dap-portfoliosize",
+            "address/buildinginfo",
+            "address/latestdeed",
+            "gce/screener",
+        ],
+    )
+    def test_it_matches_single_bbl_endpoint(self, db, client, endpoint):
+        res = client.get(f"/api/{endpoint}/batch?bbls={','.join(self.bbls)}")
+        assert res.status_code == 200
+        result = res.json()["result"]
+        assert list(result.keys()) == self.bbls
+        for bbl in self.bbls:
+            single = client.get(f"/api/{endpoint}?bbl={bbl}").json()["result"]
+            assert result[bbl] == single
+
+    def test_it_accepts_json_post_body(self, db, client):
+        res = client.post(
+            "/api/address/buildinginfo/batch",
+            {"bbls": ["3012380016", "3012380016"]},
+            content_type="application/json",
+        )
+        assert res.status_code == 200
+        assert list(res.json()["result"].keys()) == ["3012380016"]
+
+    def test_it_rejects_too_many_bbls(self, db, client, settings):
+        settings.WOW_MAX_BATCH_BBLS = 2
+        res = client.get(f"/api/address/buildinginfo/batch?bbls={','.join(self.bbls)}")
+        assert res.status_code == 400
+        assert (
+            "Too many BBLs" in res.json()["validationErrors"]["__all__"][0]["message"]
+        )
+
+
+def test_render_json_object_works():
+    content = render_json_object(a=b"[1, 2]", b=b'{"c":null}')
+    assert json.loads(content) == {"a": [1, 2], "b": {"c": None}}
+
+
+class TestDatabaseRenderedJson:
+    @pytest.mark.parametrize(
+        "url",
+        [
+            "/api/address/wowza?block=01238&lot=0016&borough=3",
+            "/api/address/aggregate?bbl=3012380016",
+            "/api/address/aggregate?bbl=9999999999",
+            "/api/address/indicatorhistory?bbl=3012380016",
+            "/api/address/portfolio/indicatorhistory?bbl=3012380016",
+        ],
+    )
+    def test_it_matches_python_rendered_json(self, db, client, settings, url):
+        settings.WOW_RESPONSE_CACHE_MAX_BYTES = 0
+        expected = client.get(url).json()
+        settings.WOW_RENDER_JSON_IN_DATABASE = True
+        res = client.get(url)
+        assert res.status_code == 200
+        assert res.json() == expected
+
+    def test_it_matches_python_rendered_json_with_null_bins(self, db, client, settings):
+        settings.WOW_RESPONSE_CACHE_MAX_BYTES = 0
+        bbl = "3012380016"
+        url = "/api/address/wowza?block=01238&lot=0016&borough=3"
+        [row] = exec_sql("SELECT bin FROM wow_bldgs WHERE bbl = %(bbl)s", {"bbl": bbl})
+        update_sql = (
+            "UPDATE wow_bldgs SET bin = %(bin)s WHERE bbl = %(bbl)s RETURNING bbl"
+        )
+        exec_sql(update_sql, {"bbl": bbl, "bin": None})
+        try:
+            expected = client.get(url).json()
+            [addr] = [addr for addr in expected["addrs"] if addr["bbl"] == bbl]
+            assert addr["bin"] is None
+            settings.WOW_RENDER_JSON_IN_DATABASE = True
+            res = client.get(url)
+            assert res.status_code == 200
+            assert res.json() == expected
+        finally:
+            exec_sql(update_sql, {"bbl": bbl, "bin": row["bin"]})
+
+
 class TestEmailAlertsBuilding(ApiTest):
     url_base = "/api/alerts/building"
     bbl1 = "1002980020"
@@ -171,6 +364,253 @@ class TestEmailAlertsBuilding(ApiTest):
         assert res.status_code == 401
 
 
+class TestEmailAlertsBuildingFeed(ApiTest):
+    url = "/api/alerts/building/feed"
+    bbls = ["1004520011", "1002980020"]
+
+    HTTP_400_URLS = [
+        url,
+        f"{url}?bbls=bop",
+    ]
+
+    def get_rows(self, client, **data):
+        res = client.post(
+            self.url, data, content_type="application/json", **ALERTS_AUTH_ARG
+        )
+        assert res.status_code == 200
+        assert res["Content-Type"] == "application/x-ndjson"
+        content = b"".join(res.streaming_content).decode("utf-8")
+        return [json.loads(line) for line in content.splitlines()]
+
+    def test_it_matches_building_alerts(self, db, client):
+        rows = self.get_rows(client, bbls=self.bbls)
+        assert [row["bbl"] for row in rows] == sorted(self.bbls)
+        res = client.get(
+            f"/api/alerts/building?bbls={','.join(self.bbls)}", **ALERTS_AUTH_ARG
+        )
+        expected = {row["bbl"]: row for row in res.json()["result"]}
+        assert rows == [expected[row["bbl"]] for row in rows]
+
+    def test_nonzero_only_works(self, db, client):
+        bbls = [
+            row["bbl"]
+            for row in exec_sql(
+                "SELECT DISTINCT bbl FROM wow_indicators WHERE bbl IS NOT NULL"
+            )
+        ]
+
+        def has_activity(row):
+            counts = [
+                value
+                for key, value in row.items()
+                if key.endswith(("__week", "__month"))
+                or key == "lagged_eviction_filings"
+            ]
+            return any((count or 0) > 0 for count in counts)
+
+        all_rows = self.get_rows(client, bbls=bbls)
+        rows = self.get_rows(client, bbls=bbls, nonzero_only=True)
+        assert rows == [row for row in all_rows if has_activity(row)]
+        assert len(rows) < len(all_rows)
+
+    def test_no_auth_401(self, db, client):
+        res = client.post(
+            self.url, {"bbls": self.bbls}, content_type="application/json"
+        )
+        assert res.status_code == 401
+
+
+@pytest.fixture
+def valid_districts(db):
+    return {
+        district_type: sorted(values)
+        for district_type, values in get_valid_districts().items()
+    }
+
+
+class TestEmailAlertsDistrict(ApiTest):
+    url = "/api/alerts/district"
+
+    HTTP_400_URLS = [
+        f"{url}?coun_dist=[boop",
+        f"{url}?coun_dist=9999",
+        f"{url}?zipcode=['00000']",
+    ]
+
+    def get_result(self, client, **districts):
+        res = client.get(self.url, districts, **ALERTS_AUTH_ARG)
+        assert res.status_code == 200
+        return res.json()["result"]
+
+    def test_it_works(self, client, valid_districts):
+        result = self.get_result(client, coun_dist=str(valid_districts["coun_dist"]))
+        ranks = [row["rank_final"] for row in result]
+        assert ranks == sorted(ranks)
+        assert len(result) <= 8
+        for row in result:
+            assert row["area_bbls_all"] >= row["area_bbls_shared_portfolio"]
+
+    def test_all_encodings_are_equivalent(self, client, valid_districts):
+        zipcodes = valid_districts["zipcode"][:20]
+        expected = self.get_result(client, zipcode=str(zipcodes))
+        assert self.get_result(client, zipcode=json.dumps(zipcodes)) == expected
+        assert self.get_result(client, zipcode=",".join(zipcodes)) == expected
+        res = client.post(
+            self.url,
+            {"zipcode": zipcodes},
+            content_type="application/json",
+            **ALERTS_AUTH_ARG,
+        )
+        assert res.json()["result"] == expected
+
+    def test_it_returns_nothing_for_no_districts(self, db, client):
+        assert self.get_result(client) == []
+
+    def test_no_auth_401(self, db, client):
+        res = client.get(self.url)
+        assert res.status_code == 401
+
+
+class TestEmailAlertsDistrictBatch(ApiTest):
+    url = "/api/alerts/district/batch"
+
+    HTTP_400_URLS = [url]
+
+    def test_it_matches_district_endpoints(self, client, valid_districts):
+        subscribers: Dict[str, Dict[str, List[str]]] = {
+            "a": {"coun_dist": valid_districts["coun_dist"]},
+            "b": {"coun_dist": valid_districts["coun_dist"], "zipcode": []},
+            "c": {
+                "zipcode": valid_districts["zipcode"][:2],
+                "community_dist": valid_districts["community_dist"][:1],
+            },
+        }
+        res = client.post(
+            self.url,
+            {"subscribers": subscribers},
+            content_type="application/json",
+            **ALERTS_AUTH_ARG,
+        )
+        assert res.status_code == 200
+        result = res.json()["result"]
+        assert result["a"] == result["b"]
+        for subscriber, districts in subscribers.items():
+            for key, endpoint in [
+                ("buildings", "district"),
+                ("vacate_order", "district/vacate_order"),
+                ("building_sale", "district/building_sale"),
+                ("litigation", "district/litigation"),
+            ]:
+                single = client.post(
+                    f"/api/alerts/{endpoint}",
+                    districts,
+                    content_type="application/json",
+                    **ALERTS_AUTH_ARG,
+                )
+                expected = single.json()["result"]
+                if key == "vacate_order":
+                    expected.sort(key=lambda row: row["bbl"])
+                assert result[subscriber][key] == expected, key
+
+    def test_it_limits_distinct_selections(self, client, valid_districts, settings):
+        settings.WOW_MAX_BATCH_DISTRICT_SELECTIONS = 1
+        zipcodes = valid_districts["zipcode"][:2]
+
+        def post(subscribers):
+            return client.post(
+                self.url,
+                {"subscribers": subscribers},
+                content_type="application/json",
+                **ALERTS_AUTH_ARG,
+            )
+
+        same = {"zipcode": zipcodes[:1]}
+        assert post({"a": same, "b": same}).status_code == 200
+        res = post({"a": same, "b": {"zipcode": zipcodes[1:]}})
+        assert res.status_code == 400
+        assert "Too many" in res.content.decode("utf-8")
+
+    @pytest.mark.parametrize(
+        "districts", [{"boop": ["1"]}, {"zipcode": ["00000"]}, {"nta": "[boop"}]
+    )
+    def test_it_rejects_invalid_districts(self, db, client, districts):
+        res = client.post(
+            self.url,
+            {"subscribers": {"a": districts}},
+            content_type="application/json",
+            **ALERTS_AUTH_ARG,
+        )
+        assert res.status_code == 400
+
+    def test_no_auth_401(self, db, client):
+        res = client.post(
+            self.url, {"subscribers": {}}, content_type="application/json"
+        )
+        assert res.status_code == 401
+
+
+class TestDistrictsGeojson(ApiTest):
+    HTTP_400_URLS = [
+        "/api/alerts/district/geojson",
+        "/api/alerts/district/geojson?district_type=boop",
+        "/api/alerts/district/geojson/boop/0123456789abcdef.json",
+    ]
+
+    def test_it_redirects_to_the_current_encoded_version(self, db, client):
+        res = client.get("/api/alerts/district/geojson?district_type=coun_dist")
+        assert res.status_code == 302
+        assert res["Location"].startswith("/api/alerts/district/geojson/coun_dist/")
+
+        res = client.get(res["Location"], HTTP_ACCEPT_ENCODING="gzip")
+        assert res.status_code == 200
+        assert res["Content-Encoding"] == "gzip"
+        assert "immutable" in res["Cache-Control"]
+        [result] = json.loads(gzip.decompress(res.content))["result"]
+        assert result["value"] == "coun_dist"
+        assert result["districtsData"]["type"] == "FeatureCollection"
+
+    def test_it_serves_unencoded_versions(self, db, client):
+        url = client.get("/api/alerts/district/geojson?district_type=nta")["Location"]
+        res = client.get(url, HTTP_ACCEPT_ENCODING="identity")
+        assert "Content-Encoding" not in res
+        assert res.json()["result"][0]["value"] == "nta"
+
+    def test_it_redirects_outdated_versions(self, db, client):
+        res = client.get("/api/alerts/district/geojson/nta/0123456789abcdef.json")
+        assert res.status_code == 302
+        assert res["Location"] == "/api/alerts/district/geojson?district_type=nta"
+
+    def test_it_works_on_databases_without_encoded_versions(
+        self, db, client, monkeypatch
+    ):
+        monkeypatch.setattr(views, "does_table_exist", lambda name: False)
+        res = client.get("/api/alerts/district/geojson?district_type=nta")
+        assert res.status_code == 200
+        assert res.json()["result"][0]["value"] == "nta"
+
+        res = client.get("/api/alerts/district/geojson/nta/0123456789abcdef.json")
+        assert res.status_code == 302
+
+
+class TestDistrictTile(ApiTest):
+    HTTP_400_URLS = [
+        "/api/alerts/district/tiles/boop/10/301/385.mvt",
+        "/api/alerts/district/tiles/nta/99/301/385.mvt",
+        "/api/alerts/district/tiles/nta/10/1024/385.mvt",
+    ]
+
+    def test_it_works(self, db, client):
+        res = client.get("/api/alerts/district/tiles/coun_dist/10/301/385.mvt")
+        assert res.status_code == 200
+        assert res["Content-Type"] == "application/vnd.mapbox-vector-tile"
+        assert len(res.content) > 0
+
+    def test_it_returns_empty_tiles_outside_nyc(self, db, client):
+        res = client.get("/api/alerts/district/tiles/coun_dist/10/0/0.mvt")
+        assert res.status_code == 200
+        assert res.content == b""
+
+
 class TestAddressExport(ApiTest):
     HTTP_400_URLS = [
         "/api/address/export",
@@ -181,8 +621,9 @@ class TestAddressExport(ApiTest):
         res = client.get("/api/address/export?bbl=3012380016")
         assert res.status_code == 200
         assert res["Content-Type"] == "text/csv"
+        assert res.streaming
 
-        f = StringIO(res.content.decode("utf-8"))
+        f = StringIO(b"".join(res.streaming_content).decode("utf-8"))
         csvreader = csv.DictReader(f)
         assert "bbl" in (csvreader.fieldnames or [])
         assert len(list(csvreader)) > 0
@@ -0,0 +1,155 @@
+import math
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Iterable, Iterator, Optional, Tuple
+from django.conf import settings
+
+from .cache import get_build_version
+from .dbutil import SQL_DIR, exec_db_query
+
+
+# A vector tile's zoom level and x and y coordinates.
+Tile = Tuple[int, int, int]
+
+# The highest zoom level we serve district tiles at. Map clients can
+# "overzoom" tiles at this level to show the districts at higher ones.
+MAX_TILE_ZOOM = 16
+
+# The zoom levels the District Alerts map is used at, whose tiles are
+# cached ahead of time by the `warmdistricttiles` management command.
+WARM_TILE_ZOOMS = range(8, 15)
+
+# The (west, south, east, north) bounds of all our districts, in degrees.
+NYC_BOUNDS = (-74.26, 40.49, -73.69, 40.92)
+
+
+def lonlat_to_tile(lon: float, lat: float, z: int) -> Tuple[int, int]:
+    """
+    Return the x and y coordinates of the web mercator tile containing the
+    given point at the given zoom level, for example:
+
+        >>> lonlat_to_tile(-74.0, 40.7, 10)
+        (301, 385)
+    """
+
+    n = 2**z
+    x = int((lon + 180) / 360 * n)
+    y = int((1 - math.asinh(math.tan(math.radians(lat))) / math.pi) / 2 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def iter_tiles(
+    bounds: Tuple[float, float, float, float], zooms: Iterable[int]
+) -> Iterator[Tile]:
+    """
+    Iterate through the tiles covering the given (west, south, east, north)
+    bounds at each of the given zoom levels, for example:
+
+        >>> list(iter_tiles(NYC_BOUNDS, [9]))
+        [(9, 150, 192), (9, 151, 192)]
+    """
+
+    west, south, east, north = bounds
+    for z in zooms:
+        min_x, min_y = lonlat_to_tile(west, north, z)
+        max_x, max_y = lonlat_to_tile(east, south, z)
+        for x in range(min_x, max_x + 1):
+            for y in range(min_y, max_y + 1):
+                yield (z, x, y)
+
+
+def get_tile_cache_dir() -> Optional[Path]:
+    if not settings.WOW_DISTRICT_TILE_CACHE_DIR:
+        return None
+    return Path(settings.WOW_DISTRICT_TILE_CACHE_DIR)
+
+
+def get_tile_cache_path(
+    district_type: str, tile: Tile, version: Optional[str]
+) -> Optional[Path]:
+    """
+    Return where the given tile of the given database build is cached on
+    disk, or None if it can't be.
+    """
+
+    cache_dir = get_tile_cache_dir()
+    if cache_dir is None or version is None:
+        return None
+    z, x, y = tile
+    return cache_dir / version / district_type / str(z) / str(x) / f"{y}.mvt"
+
+
+def write_file_atomically(path: Path, content: bytes) -> None:
+    """
+    Write the given file such that other processes never see it partially
+    written.
+    """
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    fd, tmp_name = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(content)
+        os.replace(tmp_name, path)
+    except BaseException:
+        os.unlink(tmp_name)
+        raise
+
+
+def fetch_district_tile(district_type: str, tile: Tile) -> bytes:
+    z, x, y = tile
+    rows = exec_db_query(
+        SQL_DIR / "districts_tile.sql",
+        {"district_type": district_type, "z": z, "x": x, "y": y},
+    )
+    return bytes(rows[0]["tile"] or b"")
+
+
+def get_district_tile(district_type: str, tile: Tile) -> bytes:
+    """
+    Return the vector tile of the given type of district's shapes, from
+    the on-disk tile cache if it's enabled and has it.
+    """
+
+    path = get_tile_cache_path(district_type, tile, get_build_version())
+    if path is not None:
+        try:
+            return path.read_bytes()
+        except FileNotFoundError:
+            pass
+    content = fetch_district_tile(district_type, tile)
+    if path is not None:
+        write_file_atomically(path, content)
+    return content
+
+
+def warm_district_tile_cache(
+    district_types: Iterable[str], zooms: Iterable[int] = WARM_TILE_ZOOMS
+) -> int:
+    """
+    Make sure the tile cache has every tile of the given types of districts
+    at the given zoom levels, returning how many tiles there are.
+    """
+
+    count = 0
+    for district_type in district_types:
+        for tile in iter_tiles(NYC_BOUNDS, zooms):
+            get_district_tile(district_type, tile)
+            count += 1
+    return count
+
+
+def prune_district_tile_cache() -> None:
+    """
+    Delete the cached tiles of every database build but the current one.
+    """
+
+    cache_dir = get_tile_cache_dir()
+    if cache_dir is None or not cache_dir.exists():
+        return
+    version = get_build_version()
+    for path in cache_dir.iterdir():
+        if path.is_dir() and path.name != version:
+            shutil.rmtree(path, ignore_errors=True)
@@ -12,6 +12,11 @@ urlpatterns = [
         name="address_query_wowza",
     ),
     path("address/aggregate", views.address_aggregate, name="address_aggregate"),
+    path(
+        "address/aggregate/batch",
+        views.address_aggregate_batch,
+        name="address_aggregate_batch",
+    ),
     path(
         "address/dap-aggregate",
         views.address_dap_aggregate,
@@ -22,19 +27,60 @@ urlpatterns = [
         views.address_dap_portfoliosize,
         name="address_dap_portfoliosize",
     ),
+    path(
+        "address/dap-portfoliosize/batch",
+        views.address_dap_portfoliosize_batch,
+        name="address_dap_portfoliosize_batch",
+    ),
     path(
         "address/buildinginfo", views.address_buildinginfo, name="address_buildinginfo"
     ),
+    path(
+        "address/buildinginfo/batch",
+        views.address_buildinginfo_batch,
+        name="address_buildinginfo_batch",
+    ),
     path(
         "address/indicatorhistory",
         views.address_indicatorhistory,
         name="address_indicatorhistory",
     ),
+    path(
+        "address/portfolio/indicatorhistory",
+        views.address_portfolio_indicatorhistory,
+        name="address_portfolio_indicatorhistory",
+    ),
     path("address/export", views.address_export, name="address_export"),
     path("address/latestdeed", views.address_latestdeed, name="address_latestdeed"),
+    path(
+        "address/latestdeed/batch",
+        views.address_latestdeed_batch,
+        name="address_latestdeed_batch",
+    ),
+    path("address/bundle", views.address_bundle, name="address_bundle"),
     path("alerts/building", views.email_alerts_building, name="email_alerts_building"),
+    path(
+        "alerts/building/feed",
+        views.email_alerts_building_feed,
+        name="email_alerts_building_feed",
+    ),
     path("alerts/district", views.email_alerts_district, name="email_alerts_district"),
+    path(
+        "alerts/district/batch",
+        views.email_alerts_district_batch,
+        name="email_alerts_district_batch",
+    ),
     path("alerts/district/geojson", views.districts_geojson, name="districts_geojson"),
+    path(
+        "alerts/district/geojson/<slug:district_type>/<slug:content_hash>.json",
+        views.districts_geojson_encoded,
+        name="districts_geojson_encoded",
+    ),
+    path(
+        "alerts/district/tiles/<slug:district_type>/<int:z>/<int:x>/<int:y>.mvt",
+        views.district_tile,
+        name="district_tile",
+    ),
     path(
         "alerts/district/vacate_order",
         views.district_vacate_order,
@@ -74,4 +120,5 @@ urlpatterns = [
     ),
     path("dataset/tracker", views.dataset_tracker, name="dataset_tracker"),
     path("gce/screener", views.gce_screener, name="gce_screener"),
+    path("gce/screener/batch", views.gce_screener_batch, name="gce_screener_batch"),
 ]
@@ -1,23 +1,57 @@
-import ast
 import csv
+import functools
+import itertools
+import json
 import logging
 from pathlib import Path
-from typing import Any, Dict
-from django.http import HttpResponse, JsonResponse
-
-from .dbutil import call_db_func, exec_db_query
+from typing import Any, Callable, Dict, List, Mapping
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import (
+    HttpResponse,
+    HttpResponseRedirect,
+    JsonResponse,
+    StreamingHttpResponse,
+)
+from django.urls import reverse
+from django.utils.cache import patch_vary_headers
+
+from .dbutil import (
+    Converter,
+    call_db_func,
+    does_table_exist,
+    exec_db_query,
+    exec_db_query_json,
+    iter_db_func_batches,
+    iter_db_query_batches,
+    run_db_tasks_concurrently,
+)
+from .cache import cached_json_content_response, cached_json_response
 from .datautil import int_or_none, float_or_none
+from .tileutil import get_district_tile
+from .districtutil import (
+    DistrictSelection,
+    get_selection_query_params,
+    group_rows_by_selection,
+    normalize_district_selection,
+)
 from . import csvutil, apiutil
 from .apiutil import (
+    ALL_DATASETS,
     api,
     authorize_for_signature,
     get_validated_form_data,
     authorize_for_alerts,
 )
 from .forms import (
+    AlertsBuildingFeedForm,
+    BatchBBLListForm,
     DatasetLastUpdatedForm,
+    DistrictTileForm,
     DistrictTypeForm,
     EmailAlertDistrict,
+    EmailAlertDistrictBatch,
     PaddedBBLForm,
     PaddedBBLListForm,
     SeparatedBBLForm,
@@ -29,6 +63,54 @@ MY_DIR = Path(__file__).parent.resolve()
 
 SQL_DIR = MY_DIR / "sql"
 
+# How many rows of a portfolio to fetch from the database at a time when
+# streaming a CSV export.
+EXPORT_BATCH_SIZE = 1000
+
+# How long, in seconds, browsers and CDNs may reuse the district shapes
+# and tiles for Area Alerts, which rarely change between database builds.
+DISTRICT_SHAPES_MAX_AGE = 60 * 60
+
+# The media type of Mapbox vector tiles.
+MVT_CONTENT_TYPE = "application/vnd.mapbox-vector-tile"
+
+# How long, in seconds, browsers and CDNs may reuse responses from URLs
+# that identify a single version of their content.
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+
+# The table the database build stores pre-encoded district geojson in. It
+# won't exist on databases built before it was added.
+DISTRICTS_GEOJSON_ENCODED_TABLE = "wow_districts_geojson_encoded"
+
+# The NYCDB datasets that endpoints read tables of directly, rather than
+# through the tables derived from them when the database is built, so that
+# their responses are revalidated whenever those datasets are updated.
+BUILDINGINFO_DATASETS = [
+    "hpd_registrations",
+    "marshal_evictions",
+    "nycha_bbls",
+    "pluto_latest",
+]
+INDICATORHISTORY_DATASETS = ["pluto_latest"]
+LATESTDEED_DATASETS = ["acris"]
+BUNDLE_DATASETS = sorted(
+    set(BUILDINGINFO_DATASETS + INDICATORHISTORY_DATASETS + LATESTDEED_DATASETS)
+)
+GCE_SCREENER_DATASETS = [
+    "acris",
+    "dob_certificate_occupancy",
+    "fc_shd",
+    "hpd_ll44",
+    "nycha_bbls",
+    "pad",
+    "pluto_latest",
+    "rentstab_v2",
+]
+
+# How many rows of building alerts to fetch from the database at a time
+# when streaming the bulk alerts feed.
+ALERTS_FEED_BATCH_SIZE = 1000
+
 logger = logging.getLogger(__name__)
 
 
@@ -48,13 +130,60 @@ def log_unsupported_request_args(request):
         )
 
 
-def clean_addr_dict(addr):
-    return {
-        **addr,
-        "bin": str(addr["bin"]),
-        "lastsaleamount": int_or_none(addr["lastsaleamount"]),
-        "registrationid": str(addr["registrationid"]),
-    }
+# How to convert the columns of the buildings in a portfolio for our API.
+# This isn't needed for address_portfolio.sql, which already casts them
+# to these types so that Postgres can render it as the same JSON.
+ADDR_CONVERTERS: Dict[str, Converter] = {
+    "bin": str,
+    "lastsaleamount": int_or_none,
+    "registrationid": str,
+}
+
+# How to convert the columns of a portfolio's aggregate info for our API.
+AGG_INFO_CONVERTERS: Dict[str, Converter] = {
+    "age": int_or_none,
+    "avgevictions": float_or_none,
+    "openviolationsperbldg": float_or_none,
+    "openviolationsperresunit": float_or_none,
+    "rsproportion": float_or_none,
+    "totalevictions": int_or_none,
+}
+
+# How to convert the columns of a building's info for our API.
+BUILDING_INFO_CONVERTERS: Dict[str, Converter] = {
+    "nycha_dev_evictions": int_or_none,
+    "nycha_dev_unitsres": int_or_none,
+}
+
+
+def render_json_object(**members: bytes) -> bytes:
+    """
+    Return a serialized JSON object whose members are the given
+    already-serialized JSON values, e.g. ones rendered by Postgres.
+    """
+
+    return (
+        b"{"
+        + b", ".join(
+            json.dumps(name).encode("utf-8") + b": " + value
+            for name, value in members.items()
+        )
+        + b"}"
+    )
+
+
+def get_query_result_content(
+    sql_file: Path, params: Dict[str, Any], get_data: Callable[[], Dict[str, Any]]
+) -> bytes:
+    """
+    Return the body of a JSON response whose "result" is the rows of the
+    given query, rendered by Postgres if WOW_RENDER_JSON_IN_DATABASE is
+    enabled, or built by `get_data()` otherwise.
+    """
+
+    if settings.WOW_RENDER_JSON_IN_DATABASE:
+        return render_json_object(result=exec_db_query_json(sql_file, params))
+    return JsonResponse(get_data()).content
 
 
 def get_bbl_from_request(request):
@@ -66,33 +195,42 @@ def get_bbl_from_request(request):
 @api
 def address_query(request):
     bbl = get_bbl_from_request(request)
-    addrs = call_db_func("get_assoc_addrs_from_bbl", [bbl])
-    cleaned_addrs = map(clean_addr_dict, addrs)
 
-    return JsonResponse(
-        {
+    def get_data():
+        addrs = call_db_func("get_assoc_addrs_from_bbl", [bbl], ADDR_CONVERTERS)
+        return {
             "geosearch": {
                 "bbl": bbl,
             },
-            "addrs": list(cleaned_addrs),
+            "addrs": addrs,
         }
-    )
+
+    return cached_json_response("address_query", {"bbl": bbl}, get_data)
+
+
+def get_address_wowza_data(bbl: str) -> Dict[str, Any]:
+    # Note: HPD unregistered properties will return an empty addrs array from the SQL query
+    addrs = exec_db_query(SQL_DIR / "address_portfolio.sql", {"bbl": bbl})
+    return {
+        "geosearch": {"bbl": bbl},
+        "addrs": addrs,
+    }
+
+
+def get_address_wowza_content(bbl: str) -> bytes:
+    if settings.WOW_RENDER_JSON_IN_DATABASE:
+        return render_json_object(
+            geosearch=json.dumps({"bbl": bbl}).encode("utf-8"),
+            addrs=exec_db_query_json(SQL_DIR / "address_portfolio.sql", {"bbl": bbl}),
+        )
+    return JsonResponse(get_address_wowza_data(bbl)).content
 
 
 @api
 def address_query_wowza(request):
     bbl = get_bbl_from_request(request)
-    addrs = exec_db_query(SQL_DIR / "address_portfolio.sql", {"bbl": bbl})
-    cleaned_addrs = []
-    # Note: HPD unregistered properties will return an empty addrs array from the SQL query
-    if addrs:
-        cleaned_addrs = list(map(clean_addr_dict, addrs))
-
-    return JsonResponse(
-        {
-            "geosearch": {"bbl": bbl},
-            "addrs": cleaned_addrs,
-        }
+    return cached_json_content_response(
+        "address_query_wowza", {"bbl": bbl}, lambda: get_address_wowza_content(bbl)
     )
 
 
@@ -132,54 +270,193 @@ def address_dap_portfoliosize(request):
     return JsonResponse({"result": (result[0] if result else None)})
 
 
+@api
+def address_dap_portfoliosize_batch(request):
+    """
+    This API endpoint receives requests with a list of 10-digit BBLs and
+    responds with what the dap-portfoliosize endpoint would return as
+    the result for each of them, keyed by BBL.
+
+    This endpoint is used specifically by the DAP Portal, so we should
+    make sure we don't change its behavior without notifying them.
+    """
+
+    bbls = get_request_bbls(request)
+    results = get_bbl_batch_results(SQL_DIR / "address_portfoliosize_batch.sql", bbls)
+    return JsonResponse(
+        {"result": {bbl: (rows[0] if rows else None) for bbl, rows in results.items()}}
+    )
+
+
 def get_request_bbl(request) -> str:
     return get_validated_form_data(PaddedBBLForm, request.GET)["bbl"]
 
 
-def clean_agg_info_dict(agg_info):
-    return {
-        **agg_info,
-        "age": int_or_none(agg_info["age"]),
-        "avgevictions": float_or_none(agg_info["avgevictions"]),
-        "openviolationsperbldg": float_or_none(agg_info["openviolationsperbldg"]),
-        "openviolationsperresunit": float_or_none(agg_info["openviolationsperresunit"]),
-        "rsproportion": float_or_none(agg_info["rsproportion"]),
-        "totalevictions": int_or_none(agg_info["totalevictions"]),
-    }
+def get_request_bbls(request) -> List[str]:
+    """
+    Return the distinct BBLs requested of a batch endpoint, which are
+    either a comma-separated "bbls" query parameter or, for POST
+    requests, a "bbls" list in a JSON body.
+    """
+
+    data: Any = request.GET
+    if request.method == "POST":
+        data = parse_json_object(request.body)
+    bbls = get_validated_form_data(BatchBBLListForm, data)["bbls"]
+    return list(dict.fromkeys(bbls))
+
+
+def parse_json_object(content: bytes) -> Dict[str, Any]:
+    """
+    Parse the given request body as a JSON object, returning an empty
+    one if it's anything else, so form validation can report what's
+    missing.
+    """
+
+    try:
+        data = json.loads(content)
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def get_bbl_batch_results(
+    sql_file: Path, bbls: List[str], converters: Mapping[str, Converter] = {}
+) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Run a query for many BBLs at once and return its rows grouped by the
+    requested BBL they're for, which the query must return in a
+    "batch_bbl" column. Every requested BBL is included, even if it has
+    no rows.
+    """
+
+    results: Dict[str, List[Dict[str, Any]]] = {bbl: [] for bbl in bbls}
+    for row in exec_db_query(sql_file, {"bbls": bbls}, converters):
+        results[row.pop("batch_bbl")].append(row)
+    return results
+
+
+def get_address_aggregate_data(bbl: str) -> Dict[str, Any]:
+    result = exec_db_query(
+        SQL_DIR / "address_aggregate.sql", {"bbl": bbl}, AGG_INFO_CONVERTERS
+    )
+    return {"result": result}
 
 
 @api
 def address_aggregate(request):
     bbl = get_request_bbl(request)
-    result = call_db_func("get_agg_info_from_bbl", [bbl])
-    cleaned_result = map(clean_agg_info_dict, result)
-    return JsonResponse({"result": list(cleaned_result)})
+    return cached_json_content_response(
+        "address_aggregate",
+        {"bbl": bbl},
+        lambda: get_query_result_content(
+            SQL_DIR / "address_aggregate.sql",
+            {"bbl": bbl},
+            lambda: get_address_aggregate_data(bbl),
+        ),
+    )
 
 
-def clean_building_info_dict(building_info):
-    return {
-        **building_info,
-        "nycha_dev_evictions": int_or_none(building_info["nycha_dev_evictions"]),
-        "nycha_dev_unitsres": int_or_none(building_info["nycha_dev_unitsres"]),
-    }
+@api
+def address_aggregate_batch(request):
+    """
+    This API endpoint receives requests with a list of 10-digit BBLs and
+    responds with what the aggregate endpoint would return as the
+    result for each of them, keyed by BBL.
 
+    Like all our batch endpoints, it takes the BBLs either as a
+    comma-separated "bbls" query parameter, or as a "bbls" list in the
+    JSON body of a POST request.
+    """
 
-@api
+    bbls = get_request_bbls(request)
+    result = get_bbl_batch_results(
+        SQL_DIR / "address_aggregate_batch.sql", bbls, AGG_INFO_CONVERTERS
+    )
+    return JsonResponse({"result": result})
+
+
+def get_address_buildinginfo_data(bbl: str) -> Dict[str, Any]:
+    result = exec_db_query(
+        SQL_DIR / "address_buildinginfo.sql", {"bbl": bbl}, BUILDING_INFO_CONVERTERS
+    )
+    return {"result": result}
+
+
+@api(datasets=BUILDINGINFO_DATASETS)
 def address_buildinginfo(request):
     bbl = get_request_bbl(request)
-    result = exec_db_query(SQL_DIR / "address_buildinginfo.sql", {"bbl": bbl})
-    cleaned_result = map(clean_building_info_dict, result)
-    return JsonResponse({"result": list(cleaned_result)})
+    return cached_json_response(
+        "address_buildinginfo",
+        {"bbl": bbl},
+        lambda: get_address_buildinginfo_data(bbl),
+        BUILDINGINFO_DATASETS,
+    )
 
 
-@api
+@api(datasets=BUILDINGINFO_DATASETS)
+def address_buildinginfo_batch(request):
+    """
+    This API endpoint receives requests with a list of 10-digit BBLs and
+    responds with what the buildinginfo endpoint would return as the
+    result for each of them, keyed by BBL.
+    """
+
+    bbls = get_request_bbls(request)
+    result = get_bbl_batch_results(
+        SQL_DIR / "address_buildinginfo_batch.sql", bbls, BUILDING_INFO_CONVERTERS
+    )
+    return JsonResponse({"result": result})
+
+
+def get_address_indicatorhistory_data(bbl: str) -> Dict[str, Any]:
+    result = exec_db_query(SQL_DIR / "address_indicatorhistory.sql", {"bbl": bbl})
+    return {"result": list(result)}
+
+
+@api(datasets=INDICATORHISTORY_DATASETS)
 def address_indicatorhistory(request):
     bbl = get_request_bbl(request)
-    result = exec_db_query(SQL_DIR / "address_indicatorhistory.sql", {"bbl": bbl})
-    return JsonResponse({"result": list(result)})
+    return cached_json_content_response(
+        "address_indicatorhistory",
+        {"bbl": bbl},
+        lambda: get_query_result_content(
+            SQL_DIR / "address_indicatorhistory.sql",
+            {"bbl": bbl},
+            lambda: get_address_indicatorhistory_data(bbl),
+        ),
+        INDICATORHISTORY_DATASETS,
+    )
 
 
-@api
+@api(datasets=INDICATORHISTORY_DATASETS)
+def address_portfolio_indicatorhistory(request):
+    """
+    This API endpoint receives requests with a 10-digit BBL and responds
+    with the monthly indicator history summed across every building in
+    the BBL's portfolio.
+    """
+
+    bbl = get_request_bbl(request)
+    sql_file = SQL_DIR / "address_portfolio_indicatorhistory.sql"
+
+    def get_data():
+        return {"result": list(exec_db_query(sql_file, {"bbl": bbl}))}
+
+    return cached_json_content_response(
+        "address_portfolio_indicatorhistory",
+        {"bbl": bbl},
+        lambda: get_query_result_content(sql_file, {"bbl": bbl}, get_data),
+        INDICATORHISTORY_DATASETS,
+    )
+
+
+def get_address_latestdeed_data(bbl: str) -> Dict[str, Any]:
+    result = exec_db_query(SQL_DIR / "address_latestdeed.sql", {"bbl": bbl})
+    return {"result": list(result)}
+
+
+@api(datasets=LATESTDEED_DATASETS)
 def address_latestdeed(request):
     """
     This API endpoint receives requests with a 10-digit BBL and
@@ -192,11 +469,51 @@ def address_latestdeed(request):
     notifying them.
     """
     bbl = get_request_bbl(request)
-    result = exec_db_query(SQL_DIR / "address_latestdeed.sql", {"bbl": bbl})
-    return JsonResponse({"result": list(result)})
+    return JsonResponse(get_address_latestdeed_data(bbl))
 
 
-@api
+@api(datasets=LATESTDEED_DATASETS)
+def address_latestdeed_batch(request):
+    """
+    This API endpoint receives requests with a list of 10-digit BBLs and
+    responds with what the latestdeed endpoint would return as the
+    result for each of them, keyed by BBL.
+
+    This endpoint is used exclusively by Unlock NYC, so we should make
+    sure we don't change its behavior without notifying them.
+    """
+
+    bbls = get_request_bbls(request)
+    result = get_bbl_batch_results(SQL_DIR / "address_latestdeed_batch.sql", bbls)
+    return JsonResponse({"result": result})
+
+
+@api(datasets=BUNDLE_DATASETS)
+def address_bundle(request):
+    """
+    This API endpoint receives requests with a 10-digit BBL and responds
+    with everything a building page needs, i.e. the responses of the
+    wowza, aggregate, buildinginfo, indicatorhistory and latestdeed
+    endpoints, keyed by endpoint name.
+
+    The queries for each of these are run concurrently, and the number
+    of seconds each of them took is included in "timings".
+    """
+
+    bbl = get_request_bbl(request)
+    sections, timings = run_db_tasks_concurrently(
+        {
+            "wowza": lambda: get_address_wowza_data(bbl),
+            "aggregate": lambda: get_address_aggregate_data(bbl),
+            "buildinginfo": lambda: get_address_buildinginfo_data(bbl),
+            "indicatorhistory": lambda: get_address_indicatorhistory_data(bbl),
+            "latestdeed": lambda: get_address_latestdeed_data(bbl),
+        }
+    )
+    return JsonResponse({"bbl": bbl, **sections, "timings": timings})
+
+
+@api(cacheable=False)
 def email_alerts_building(request):
     """
     This API endpoint provides all the data required to produce a Building Alert
@@ -228,7 +545,49 @@ def email_alerts_building(request):
     return JsonResponse({"result": list(result)})
 
 
-@api
+@api(cacheable=False)
+def email_alerts_building_feed(request):
+    """
+    This API endpoint provides the same data as the building alerts endpoint
+    for any number of buildings at once, so that the data for a whole weekly
+    send can be fetched in a single request. The BBLs are given as a "bbls"
+    list in a JSON POST body (or as a comma-separated "bbls" query parameter).
+    If "nonzero_only" is true, buildings without anything to report are
+    left out.
+
+    Results are streamed in BBL order as newline-delimited JSON, i.e. one
+    JSON object per line, straight from a server-side cursor, so neither we
+    nor the client ever need to hold all of them in memory.
+    """
+    authorize_for_alerts(request)
+    data: Any = request.GET
+    if request.method == "POST":
+        # Reading the body as a stream, rather than via `request.body`,
+        # lifts Django's limit on its size, which we only want to do for
+        # authorized clients.
+        data = parse_json_object(request.read())
+    form_data = get_validated_form_data(AlertsBuildingFeedForm, data)
+    batches = iter_db_query_batches(
+        SQL_DIR / "alerts_building_feed.sql",
+        {
+            "bbls": list(dict.fromkeys(form_data["bbls"])),
+            "nonzero_only": form_data["nonzero_only"],
+        },
+        batch_size=ALERTS_FEED_BATCH_SIZE,
+    )
+
+    def iter_ndjson_chunks():
+        for batch in batches:
+            yield "".join(
+                json.dumps(row, cls=DjangoJSONEncoder) + "\n" for row in batch
+            )
+
+    return StreamingHttpResponse(
+        iter_ndjson_chunks(), content_type="application/x-ndjson"
+    )
+
+
+@api(cacheable=False)
 def signature_building(request):
     """
     This API endpoint receives requests with a 10-digit BBL. It responds with a
@@ -240,7 +599,7 @@ def signature_building(request):
     return JsonResponse({"result": list(result)})
 
 
-@api
+@api(cacheable=False)
 def signature_building_charts(request):
     """
     This API endpoint receives requests with a 10-digit BBL. It responds with a
@@ -253,7 +612,7 @@ def signature_building_charts(request):
     return JsonResponse({"result": list(result)})
 
 
-@api
+@api(cacheable=False)
 def signature_collection(request):
     """
     This API endpoint receives requests with a collection name (landlord,
@@ -271,7 +630,7 @@ def signature_collection(request):
     return JsonResponse({"result": list(result)})
 
 
-@api
+@api(cacheable=False)
 def signature_collection_charts(request):
     """
     This API endpoint receives requests with a collection name (landlord,
@@ -288,7 +647,7 @@ def signature_collection_charts(request):
     return JsonResponse({"result": list(result)})
 
 
-@api
+@api(cacheable=False)
 def signature_landlords(request):
     """
     This API endpoint returns data for all landlords in the signature program,
@@ -300,7 +659,7 @@ def signature_landlords(request):
     return JsonResponse({"result": list(result)})
 
 
-@api
+@api(cacheable=False)
 def signature_portfolios(request):
     """
     This API endpoint returns data on signature/loan-pool portfolios for home page cards.
@@ -310,7 +669,7 @@ def signature_portfolios(request):
     return JsonResponse({"result": list(result)})
 
 
-@api
+@api(cacheable=False)
 def signature_map(request):
     """
     This API endpoint returns data on all properties in the signature portfolio
@@ -321,7 +680,7 @@ def signature_map(request):
     return JsonResponse({"result": list(result)})
 
 
-@api
+@api(datasets=[ALL_DATASETS])
 def dataset_last_updated(request):
     """
     This API endpoint returns data on all properties in the signature portfolio
@@ -337,7 +696,7 @@ def dataset_last_updated(request):
     return JsonResponse({"result": list(result)})
 
 
-@api
+@api(cacheable=False)
 def dataset_tracker(request):
     """
     This API endpoint returns data on all datasets loaded in the database via
@@ -348,7 +707,7 @@ def dataset_tracker(request):
     return JsonResponse({"result": list(result)})
 
 
-@api
+@api(datasets=GCE_SCREENER_DATASETS)
 def gce_screener(request):
     """
     This API endpoint receives requests with a 10-digit BBL. It responds with a
@@ -356,85 +715,260 @@ def gce_screener(request):
     Good Cause Eviction protections to use on our standalone screener tool.
     """
     bbl = get_request_bbl(request)
-    result = exec_db_query(SQL_DIR / "gce_screener.sql", {"bbl": bbl})
-    return JsonResponse({"result": list(result)})
 
+    def get_data():
+        result = exec_db_query(SQL_DIR / "gce_screener.sql", {"bbl": bbl})
+        return {"result": list(result)}
 
-@api
+    return cached_json_response(
+        "gce_screener", {"bbl": bbl}, get_data, GCE_SCREENER_DATASETS
+    )
+
+
+@api(datasets=GCE_SCREENER_DATASETS)
+def gce_screener_batch(request):
+    """
+    This API endpoint receives requests with a list of 10-digit BBLs and
+    responds with what the GCE screener endpoint would return as the
+    result for each of them, keyed by BBL.
+    """
+
+    bbls = get_request_bbls(request)
+    result = get_bbl_batch_results(SQL_DIR / "gce_screener_batch.sql", bbls)
+    return JsonResponse({"result": result})
+
+
+@api(max_age=DISTRICT_SHAPES_MAX_AGE)
 def districts_geojson(request):
     """
     This API endpoint for WOW District Alerts receives requests with a type of
     district ("typevalue"). It responds with a two geojson feature collections,
     one for the district shapes and one with points for label placement.
+
+    Once the database build has encoded them, it redirects to the
+    `districts_geojson_encoded` URL of the current version of them instead.
     """
     args = get_validated_form_data(DistrictTypeForm, request.GET)
+    district_type = args["district_type"]
+    rows: List[Dict[str, Any]] = []
+    if does_table_exist(DISTRICTS_GEOJSON_ENCODED_TABLE):
+        rows = exec_db_query(
+            SQL_DIR / "districts_geojson_hash.sql", {"district_type": district_type}
+        )
+    if rows:
+        return HttpResponseRedirect(
+            reverse(
+                "wow:districts_geojson_encoded",
+                kwargs={
+                    "district_type": district_type,
+                    "content_hash": rows[0]["content_hash"],
+                },
+            )
+        )
     result = exec_db_query(
-        SQL_DIR / "districts_geojson.sql", {"district_type": args["district_type"]}
+        SQL_DIR / "districts_geojson.sql", {"district_type": district_type}
     )
     return JsonResponse({"result": list(result)})
 
 
-def get_district_query_params(args: Dict[str, Any]):
-    def safe_literal_eval(val):
-        try:
-            parsed = ast.literal_eval(val)
-            return parsed if isinstance(parsed, list) else []
-        except (ValueError, SyntaxError):
-            return ""
-
-    query_params = {
-        "coun_dist": safe_literal_eval(args["coun_dist"]),
-        "nta": safe_literal_eval(args["nta"]),
-        "community_dist": safe_literal_eval(args["community_dist"]),
-        "assem_dist": safe_literal_eval(args["assem_dist"]),
-        "stsen_dist": safe_literal_eval(args["stsen_dist"]),
-        "zipcode": safe_literal_eval(args["zipcode"]),
-        "census_tract": safe_literal_eval(args["census_tract"]),
-    }
+def redirect_to_districts_geojson(district_type: str) -> HttpResponseRedirect:
+    return HttpResponseRedirect(
+        reverse("wow:districts_geojson")
+        + "?"
+        + urlencode({"district_type": district_type})
+    )
 
-    return query_params
 
+@api(max_age=IMMUTABLE_MAX_AGE, immutable=True)
+def districts_geojson_encoded(request, district_type: str, content_hash: str):
+    """
+    This API endpoint responds with what `districts_geojson` does for the
+    given type of district, at the version with the given content hash,
+    already encoded with the best compression the client accepts. Requests
+    for outdated versions are redirected to the current one.
+    """
+    get_validated_form_data(DistrictTypeForm, {"district_type": district_type})
+    encodings = apiutil.parse_accept_encoding(
+        request.headers.get("Accept-Encoding", "")
+    )
+    if not does_table_exist(DISTRICTS_GEOJSON_ENCODED_TABLE):
+        return redirect_to_districts_geojson(district_type)
+    rows = exec_db_query(
+        SQL_DIR / "districts_geojson_encoded.sql",
+        {
+            "district_type": district_type,
+            "content_hash": content_hash,
+            "accepts_br": "br" in encodings,
+            "accepts_gzip": "gzip" in encodings,
+        },
+    )
+    if not rows:
+        return redirect_to_districts_geojson(district_type)
+    response = HttpResponse(bytes(rows[0]["content"]), content_type="application/json")
+    if rows[0]["encoding"] != "identity":
+        response["Content-Encoding"] = rows[0]["encoding"]
+    patch_vary_headers(response, ["Accept-Encoding"])
+    return response
 
-@api
+
+@api(max_age=DISTRICT_SHAPES_MAX_AGE)
+def district_tile(request, district_type: str, z: int, x: int, y: int):
+    """
+    This API endpoint for WOW District Alerts responds with a Mapbox vector
+    tile of the shapes of the given type of district, at the given zoom
+    level and tile coordinates, so the map only has to download the
+    districts it shows at the detail it shows them.
+    """
+    args = get_validated_form_data(
+        DistrictTileForm, {"district_type": district_type, "z": z, "x": x, "y": y}
+    )
+    content = get_district_tile(
+        args["district_type"], (args["z"], args["x"], args["y"])
+    )
+    return HttpResponse(content, content_type=MVT_CONTENT_TYPE)
+
+
+def get_district_query_params(request) -> Dict[str, List[str]]:
+    """
+    Return the validated districts requested of a district alerts endpoint,
+    either as query parameters or, for POST requests, in a JSON body.
+    """
+
+    data: Any = request.GET
+    if request.method == "POST":
+        data = parse_json_object(request.body)
+    return get_validated_form_data(EmailAlertDistrict, data)
+
+
+@api(cacheable=False)
 def email_alerts_district(request):
     authorize_for_alerts(request)
-    args = get_validated_form_data(EmailAlertDistrict, request.GET)
-    query_params = get_district_query_params(args)
+    query_params = get_district_query_params(request)
     query_sql = SQL_DIR / "alerts_district.sql"
     result = exec_db_query(query_sql, query_params)
     return JsonResponse({"result": list(result)})
 
 
-@api
+@api(cacheable=False)
 def district_vacate_order(request):
     authorize_for_alerts(request)
-    args = get_validated_form_data(EmailAlertDistrict, request.GET)
-    query_params = get_district_query_params(args)
+    query_params = get_district_query_params(request)
     query_sql = SQL_DIR / "alerts_district_vacate_order.sql"
     result = exec_db_query(query_sql, query_params)
     return JsonResponse({"result": list(result)})
 
 
-@api
+@api(cacheable=False)
 def district_building_sale(request):
     authorize_for_alerts(request)
-    args = get_validated_form_data(EmailAlertDistrict, request.GET)
-    query_params = get_district_query_params(args)
+    query_params = get_district_query_params(request)
     query_sql = SQL_DIR / "alerts_district_sale.sql"
     result = exec_db_query(query_sql, query_params)
     return JsonResponse({"result": list(result)})
 
 
-@api
+@api(cacheable=False)
 def district_litigation(request):
     authorize_for_alerts(request)
-    args = get_validated_form_data(EmailAlertDistrict, request.GET)
-    query_params = get_district_query_params(args)
+    query_params = get_district_query_params(request)
     query_sql = SQL_DIR / "alerts_district_litigation.sql"
     result = exec_db_query(query_sql, query_params)
     return JsonResponse({"result": list(result)})
 
 
+# How many of the most recent building sales and HPD litigation cases are
+# included in each subscriber's Area Alerts.
+DISTRICT_ALERTS_RECENT_LIMIT = 10
+
+
+def get_recent_district_rows(
+    rows: List[Dict[str, Any]], total_key: str
+) -> List[Dict[str, Any]]:
+    """
+    Like our district sale and litigation queries, return the most recent
+    of the given rows, each with a count of all of them.
+    """
+
+    return [
+        {**row, total_key: len(rows)} for row in rows[:DISTRICT_ALERTS_RECENT_LIMIT]
+    ]
+
+
+@api(cacheable=False)
+def email_alerts_district_batch(request):
+    """
+    This API endpoint provides the data of the district alerts, vacate order,
+    building sale and litigation endpoints for many Area Alerts subscribers at
+    once. It receives a JSON POST body with a "subscribers" object mapping
+    subscriber IDs to their districts, which map district types to lists of
+    districts, for example:
+
+        {"subscribers": {"123": {"coun_dist": ["33"], "zipcode": ["11201"]}}}
+
+    It responds with the data for each subscriber, keyed by subscriber ID.
+
+    The vacate orders, sales and litigation cases for all subscribers are
+    fetched with one query each. The buildings are ranked with one query
+    for each distinct selection of districts, which subscribers with the
+    same districts share, so this scales with the number of distinct
+    selections rather than the number of subscribers. That number is
+    limited by the WOW_MAX_BATCH_DISTRICT_SELECTIONS setting.
+    """
+    authorize_for_alerts(request)
+    data = parse_json_object(request.body) if request.method == "POST" else {}
+    subscribers = get_validated_form_data(EmailAlertDistrictBatch, data)["subscribers"]
+    subscriber_selections = {
+        subscriber: normalize_district_selection(districts)
+        for subscriber, districts in subscribers.items()
+    }
+    selections = list(dict.fromkeys(subscriber_selections.values()))
+    params = get_selection_query_params(selections)
+
+    tasks: Dict[str, Callable[[], Any]] = {
+        name: functools.partial(exec_db_query, SQL_DIR / f"{name}.sql", params)
+        for name in [
+            "alerts_district_vacate_order_batch",
+            "alerts_district_sale_batch",
+            "alerts_district_litigation_batch",
+        ]
+    }
+    for i, selection in enumerate(selections):
+        tasks[f"buildings_{i}"] = functools.partial(
+            exec_db_query,
+            SQL_DIR / "alerts_district.sql",
+            get_selection_query_params([selection]),
+        )
+    results, _ = run_db_tasks_concurrently(tasks)
+
+    buildings: Dict[DistrictSelection, List[Dict[str, Any]]] = {
+        selection: results[f"buildings_{i}"] for i, selection in enumerate(selections)
+    }
+    vacate_orders = group_rows_by_selection(
+        results["alerts_district_vacate_order_batch"], selections
+    )
+    sales = group_rows_by_selection(results["alerts_district_sale_batch"], selections)
+    litigations = group_rows_by_selection(
+        results["alerts_district_litigation_batch"], selections
+    )
+    return JsonResponse(
+        {
+            "result": {
+                subscriber: {
+                    "buildings": buildings[selection],
+                    "vacate_order": vacate_orders[selection],
+                    "building_sale": get_recent_district_rows(
+                        sales[selection], "total_sales"
+                    ),
+                    "litigation": get_recent_district_rows(
+                        litigations[selection], "total_litigations"
+                    ),
+                }
+                for subscriber, selection in subscriber_selections.items()
+            }
+        }
+    )
+
+
 def _fixup_addr_for_csv(addr: Dict[str, Any]):
     addr["ownernames"] = csvutil.stringify_owners(addr["ownernames"] or [])
     addr["recentcomplaintsbytype"] = csvutil.stringify_complaints(
@@ -444,28 +978,48 @@ def _fixup_addr_for_csv(addr: Dict[str, Any]):
     csvutil.stringify_lists(addr)
 
 
+class Echo:
+    """
+    An object that implements just the write method of the file-like
+    interface, so that a csv writer's output can be streamed.
+
+    https://docs.djangoproject.com/en/3.2/howto/outputting-csv/#streaming-large-csv-files
+    """
+
+    def write(self, value):
+        return value
+
+
 @api
 def address_export(request):
     log_unsupported_request_args(request)
     bbl = get_request_bbl(request)
-    addrs = call_db_func("get_assoc_addrs_from_bbl", [bbl])
+    batches = iter_db_func_batches(
+        "get_assoc_addrs_from_bbl", [bbl], batch_size=EXPORT_BATCH_SIZE
+    )
+
+    # We fetch the first batch before responding, so we can return a 404
+    # if there's nothing to export.
+    first_batch = next(batches, None)
 
-    if not addrs:
+    if not first_batch:
         return HttpResponse(status=404)
 
-    first_row = addrs[0]
+    writer = csv.DictWriter(Echo(), list(first_batch[0].keys()))
+    all_batches = itertools.chain([first_batch], batches)
 
-    for addr in addrs:
-        _fixup_addr_for_csv(addr)
+    def iter_csv_chunks():
+        yield writer.writeheader()
+        for batch in all_batches:
+            lines = []
+            for addr in batch:
+                _fixup_addr_for_csv(addr)
+                lines.append(writer.writerow(addr))
+            yield "".join(lines)
 
-    # https://docs.djangoproject.com/en/3.0/howto/outputting-csv/
-    response = HttpResponse(content_type="text/csv")
+    response = StreamingHttpResponse(iter_csv_chunks(), content_type="text/csv")
     response["Content-Disposition"] = f'attachment; filename="wow-addresses-{bbl}.csv"'
 
-    writer = csv.DictWriter(response, list(first_row.keys()))
-    writer.writeheader()
-    writer.writerows(addrs)
-
     return response
 
 